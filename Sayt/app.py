@@ -1,11 +1,44 @@
-from flask import Flask, render_template, request, redirect
+from flask import Flask, render_template, request, redirect, make_response
+import os
 import sqlite3
+import sys
+
+# Модули менеджера задач лежат в корне проекта
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from task_manager import TaskManager, log_error
+from task_ics import IcsFeed
+from task_dates import parse_date
+from task_subtasks import journal_path
 
 app = Flask(__name__)
 
+# Путь к базе данных (можно переопределить, например, для нагрузочных тестов)
+DATABASE = 'tasks.db'
+# Файл задач менеджера, из которого строится ICS-лента
+TODO_FILE = os.environ.get('TODO_FILE', os.path.join(BASE_DIR, 'todo.txt'))
+
+# Состояние событий ленты (DTSTAMP, SEQUENCE) переживает перезапуск сервера
+ICS_STATE_FILE = os.environ.get('ICS_STATE_FILE', TODO_FILE + '.feed.ics.state.json')
+
+ics_feed = IcsFeed(parse_date,
+                   on_error=lambda task: log_error(f"Неверный формат даты для задачи: {task['text']}"),
+                   state_path=ICS_STATE_FILE)
+
+# Базы, в которых таблица уже создана
+_initialized = set()
+
+# Соединение с базой; таблица создаётся при первом обращении, а не при импорте,
+# чтобы импорт модуля (например, из нагрузочного теста) не трогал tasks.db
+def connect():
+    if DATABASE not in _initialized:
+        init_db()
+    return sqlite3.connect(DATABASE)
+
 # Функция для получения задач из базы данных
 def get_tasks():
-    conn = sqlite3.connect('tasks.db')
+    conn = connect()
     c = conn.cursor()
     c.execute('SELECT rowid, task FROM tasks')
     tasks = c.fetchall()
@@ -14,7 +47,7 @@ def get_tasks():
 
 # Функция для добавления задачи в базу данных
 def add_task(task):
-    conn = sqlite3.connect('tasks.db')
+    conn = connect()
     c = conn.cursor()
     c.execute('INSERT INTO tasks (task) VALUES (?)', (task,))
     conn.commit()
@@ -22,7 +55,7 @@ def add_task(task):
 
 # Функция для удаления задачи
 def delete_task(task_id):
-    conn = sqlite3.connect('tasks.db')
+    conn = connect()
     c = conn.cursor()
     c.execute('DELETE FROM tasks WHERE rowid = ?', (task_id,))
     conn.commit()
@@ -30,7 +63,7 @@ def delete_task(task_id):
 
 # Функция для редактирования задачи
 def edit_task(task_id, new_task):
-    conn = sqlite3.connect('tasks.db')
+    conn = connect()
     c = conn.cursor()
     c.execute('UPDATE tasks SET task = ? WHERE rowid = ?', (new_task, task_id))
     conn.commit()
@@ -38,7 +71,7 @@ def edit_task(task_id, new_task):
 
 # Создание таблицы, если она не существует
 def init_db():
-    conn = sqlite3.connect('tasks.db')
+    conn = sqlite3.connect(DATABASE)
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS tasks (
@@ -47,9 +80,7 @@ def init_db():
     ''')
     conn.commit()
     conn.close()
-
-# Инициализируем базу данных
-init_db()
+    _initialized.add(DATABASE)
 
 @app.route('/')
 def home():
@@ -81,5 +112,36 @@ def edit(task_id):
     task_to_edit = next(t for t in task if t[0] == task_id)
     return render_template('edit.html', task=task_to_edit)
 
+# Версия данных — по метаданным файла и журнала подзадач, без их чтения
+# (отметки подзадач дописываются только в журнал, файл задач не меняется)
+def todo_version():
+    try:
+        st = os.stat(TODO_FILE)
+    except OSError:
+        return None
+    try:
+        journal = os.stat(journal_path(TODO_FILE))
+        journal = (journal.st_ino, journal.st_mtime_ns, journal.st_size)
+    except OSError:
+        journal = None
+    return (st.st_ino, st.st_mtime_ns, st.st_size, journal)
+
+@app.route('/tasks.ics')
+def tasks_ics():
+    version = todo_version()
+    if version != ics_feed.version:
+        tasks = TaskManager(filename=TODO_FILE).tasks if version is not None else []
+        ics_feed.refresh(tasks, version)
+    category = request.args.get('category') or None
+    tag = request.args.get('tag') or None
+    body, etag = ics_feed.render(category, tag)
+    response = make_response(body)
+    response.mimetype = 'text/calendar'
+    response.charset = 'utf-8'
+    response.set_etag(etag)
+    response.last_modified = ics_feed.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,288 @@
+"""Нагрузочный тест для веб-приложения списка дел.
+
+Гоняет смешанную нагрузку (чтение/запись) по маршрутам /todo, /edit/<id> и
+/delete/<id> через тестовый клиент Flask или через запущенный сервер и
+выводит задержки p50/p95/p99, гистограмму и пропускную способность.
+
+Примеры:
+    python loadtest.py --requests 2000 --concurrency 8 --dataset 10000
+    python loadtest.py --url http://127.0.0.1:5000 --requests 500
+    python loadtest.py --db bench.db --reset   # своя база (непустая перезаписывается только с --reset)
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Доли операций в смешанной нагрузке по умолчанию
+DEFAULT_MIX = {
+    "list": 60,       # GET /todo
+    "add": 15,        # POST /todo
+    "edit_form": 10,  # GET /edit/<id>
+    "edit": 10,       # POST /edit/<id>
+    "delete": 5,      # GET /delete/<id>
+}
+
+# Границы корзин гистограммы (мс)
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def seed_database(path, size, reset=False):
+    """Создаёт базу данных с заданным количеством задач.
+
+    Непустую базу перезаписывает только с reset=True, иначе бросает ValueError.
+    """
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute('CREATE TABLE IF NOT EXISTS tasks (task TEXT)')
+    existing = c.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+    if existing and not reset:
+        conn.close()
+        raise ValueError(f"в базе {path} уже есть задачи ({existing}); чтобы удалить их, добавь --reset")
+    c.execute('DELETE FROM tasks')
+    c.executemany('INSERT INTO tasks (task) VALUES (?)',
+                  ((f"Задача {i}",) for i in range(size)))
+    conn.commit()
+    conn.close()
+
+
+def parse_mix(text):
+    """Разбирает строку вида 'list=60,add=15,...' в словарь долей."""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Неизвестная операция: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+def percentile(sorted_values, p):
+    """Возвращает перцентиль p (0-100) из отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class IdPool:
+    """Потокобезопасный пул известных rowid для операций над задачами."""
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.max_id = size
+
+    def pick(self, rng):
+        with self.lock:
+            return rng.randint(1, max(self.max_id, 1))
+
+    def added(self):
+        with self.lock:
+            self.max_id += 1
+
+
+class TestClientTarget:
+    """Отправляет запросы через тестовый клиент Flask (без сети)."""
+
+    def __init__(self, db_path):
+        import app as webapp
+        webapp.DATABASE = db_path
+        webapp.init_db()
+        self.app = webapp.app
+        self.local = threading.local()
+
+    def _client(self):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        return client
+
+    def get(self, path):
+        return self._client().get(path).status_code
+
+    def post(self, path, data):
+        return self._client().post(path, data=data).status_code
+
+
+class HttpTarget:
+    """Отправляет запросы на запущенный сервер."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        # Редиректы после POST не нужны для замера, отключаем их
+        self.opener = urllib.request.build_opener(_NoRedirect)
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        body = urllib.parse.urlencode(data).encode("utf-8")
+        return self._open(urllib.request.Request(self.base_url + path, data=body))
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+    def http_error_302(self, req, fp, code, msg, headers):
+        return fp
+
+    http_error_301 = http_error_303 = http_error_307 = http_error_302
+
+
+def run_operation(target, op, ids, rng):
+    """Выполняет одну операцию и возвращает HTTP-код."""
+    if op == "list":
+        return target.get("/todo")
+    if op == "add":
+        status = target.post("/todo", {"task": f"Новая задача {rng.random():.6f}"})
+        ids.added()
+        return status
+    task_id = ids.pick(rng)
+    if op == "edit_form":
+        return target.get(f"/edit/{task_id}")
+    if op == "edit":
+        return target.post(f"/edit/{task_id}", {"task": f"Изменено {rng.random():.6f}"})
+    if op == "delete":
+        return target.get(f"/delete/{task_id}")
+    raise ValueError(f"Неизвестная операция: {op}")
+
+
+def run_load(target, total_requests, concurrency, mix, dataset_size, seed=None):
+    """Запускает нагрузку и возвращает (задержки по операциям, коды ответов, время)."""
+    ops = list(mix)
+    weights = [mix[op] for op in ops]
+    ids = IdPool(dataset_size)
+    latencies = defaultdict(list)
+    statuses = defaultdict(int)
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker(worker_id):
+        rng = random.Random(None if seed is None else seed + worker_id)
+        local_latencies = defaultdict(list)
+        local_statuses = defaultdict(int)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            op = rng.choices(ops, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = run_operation(target, op, ids, rng)
+            except Exception:
+                status = "exception"
+            local_latencies[op].append((time.perf_counter() - start) * 1000)
+            local_statuses[status] += 1
+        with lock:
+            for op, values in local_latencies.items():
+                latencies[op].extend(values)
+            for status, count in local_statuses.items():
+                statuses[status] += count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    return latencies, statuses, elapsed
+
+
+def histogram(values):
+    """Считает количество значений в каждой корзине HISTOGRAM_BOUNDS."""
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for value in values:
+        for i, bound in enumerate(HISTOGRAM_BOUNDS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+def print_report(latencies, statuses, elapsed):
+    """Выводит сводку по задержкам, гистограмму и пропускную способность."""
+    all_values = sorted(v for values in latencies.values() for v in values)
+    total = len(all_values)
+    print(f"\nЗапросов: {total}, время: {elapsed:.2f} с, "
+          f"пропускная способность: {total / elapsed if elapsed else 0:.1f} запр/с")
+    print(f"{'операция':<10} {'кол-во':>7} {'p50,мс':>8} {'p95,мс':>8} {'p99,мс':>8} {'макс,мс':>8}")
+    for op in sorted(latencies):
+        values = sorted(latencies[op])
+        print(f"{op:<10} {len(values):>7} {percentile(values, 50):>8.2f} "
+              f"{percentile(values, 95):>8.2f} {percentile(values, 99):>8.2f} {values[-1]:>8.2f}")
+    print(f"{'всего':<10} {total:>7} {percentile(all_values, 50):>8.2f} "
+          f"{percentile(all_values, 95):>8.2f} {percentile(all_values, 99):>8.2f} "
+          f"{all_values[-1] if all_values else 0:>8.2f}")
+
+    print("\nГистограмма задержек:")
+    counts = histogram(all_values)
+    widest = max(counts) or 1
+    labels = [f"<= {b} мс" for b in HISTOGRAM_BOUNDS] + [f"> {HISTOGRAM_BOUNDS[-1]} мс"]
+    for label, count in zip(labels, counts):
+        if count:
+            print(f"{label:>12} {count:>7} {'#' * max(1, 40 * count // widest)}")
+
+    print("\nКоды ответов: " + ", ".join(f"{k}: {v}" for k, v in sorted(statuses.items(), key=str)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест веб-приложения списка дел")
+    parser.add_argument("--requests", type=int, default=1000, help="общее число запросов")
+    parser.add_argument("--concurrency", type=int, default=4, help="число параллельных клиентов")
+    parser.add_argument("--dataset", type=int, default=1000, help="число задач в базе перед запуском")
+    parser.add_argument("--mix", default="", help="доли операций, например list=60,add=15,edit_form=10,edit=10,delete=5")
+    parser.add_argument("--url", default="", help="адрес запущенного сервера (по умолчанию тестовый клиент)")
+    parser.add_argument("--db", default="", help="файл базы для тестового клиента (по умолчанию временный)")
+    parser.add_argument("--reset", action="store_true", help="удалить задачи из непустой базы --db перед запуском")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора для воспроизводимости")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    if args.url:
+        # Данные на сервере не трогаем, пул id строится по размеру, указанному пользователем
+        target = HttpTarget(args.url)
+        tmp_dir = None
+    else:
+        tmp_dir = None if args.db else tempfile.TemporaryDirectory()
+        db_path = args.db or os.path.join(tmp_dir.name, "loadtest.db")
+        try:
+            seed_database(db_path, args.dataset, reset=args.reset)
+        except ValueError as e:
+            parser.error(str(e))
+        target = TestClientTarget(db_path)
+
+    print(f"Нагрузка: {args.requests} запросов, {args.concurrency} клиентов, "
+          f"{args.dataset} задач, смесь: {mix}")
+    try:
+        latencies, statuses, elapsed = run_load(target, args.requests, args.concurrency, mix, args.dataset, args.seed)
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    print_report(latencies, statuses, elapsed)
+
+
+if __name__ == '__main__':
+    main()
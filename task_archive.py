@@ -0,0 +1,213 @@
+"""Чтение архива задач через mmap без загрузки его в память целиком.
+
+Рядом с архивом хранится индекс смещений строк <архив>.idx:
+
+    заголовок (struct): сигнатура, версия, inode архива, сколько байт проиндексировано
+    далее:              смещения начала строк, по 8 байт (little-endian)
+
+Индекс тоже читается через mmap, поэтому подсчёт задач и переход к странице
+не требуют чтения архива. Архив только дописывается, и индекс при этом
+дополняется с места, где остановился; при перезаписи архива (другой inode
+или файл стал короче) индекс строится заново.
+
+Необязательный триграммный индекс <архив>.tri (marshal: триграмма -> номера
+строк) ускоряет поиск подстроки: проверяются только строки-кандидаты.
+Ищется текст задачи и тексты её подзадач (не ключи и не отметки из JSON).
+"""
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from task_subtasks import iter_nodes
+
+MAGIC = b"TMAIDX"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<6sHQQ")  # сигнатура, версия, inode, проиндексированный размер
+_OFFSET = struct.Struct("<Q")
+TRIGRAM_MAGIC = "TMATRI2"
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def trigram_path(path):
+    return path + ".tri"
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _search_fields(line):
+    """Текст задачи и тексты подзадач из строки архива в нижнем регистре."""
+    parts = line.split("|", 8)
+    if len(parts) < 3:
+        return ""
+    texts = [parts[2]]
+    if len(parts) > 7 and parts[7]:
+        try:
+            texts.extend(node["text"] for node in iter_nodes(json.loads(parts[7])) if isinstance(node.get("text"), str))
+        except (ValueError, TypeError, AttributeError):
+            pass  # повреждённые подзадачи: ищем только по тексту задачи
+    return "\n".join(texts).lower()
+
+
+def _map(f):
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ArchiveReader:
+    """Доступ к строкам архива по номеру, постраничный просмотр и поиск.
+
+    Используется как контекстный менеджер; записи разбираются только для выдачи.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = self._mm = self._index_file = self._index = None
+        self._count = 0
+        self._source = None
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        self._file = open(path, "rb")
+        self._mm = _map(self._file)
+        self._open_index()
+
+    def close(self):
+        for resource in (self._index, self._index_file, self._mm, self._file):
+            if resource is not None:
+                resource.close()
+        self._file = self._mm = self._index_file = self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _open_index(self):
+        """Открывает индекс смещений, дополняя или перестраивая его при необходимости."""
+        st = os.fstat(self._file.fileno())
+        size = len(self._mm)
+        ipath = index_path(self.path)
+        indexed = 0
+        mode = "wb"
+        try:
+            with open(ipath, "rb") as f:
+                header = f.read(_HEADER.size)
+            magic, version, inode, indexed = _HEADER.unpack(header)
+            # Дописанный архив: тот же файл, не короче, и проиндексированная часть кончается переводом строки
+            if (magic, version, inode) == (MAGIC, FORMAT_VERSION, st.st_ino) and indexed <= size \
+                    and (indexed == 0 or self._mm[indexed - 1:indexed] == b"\n"):
+                mode = "r+b"
+            else:
+                indexed = 0
+        except (OSError, struct.error):
+            indexed = 0
+        if mode == "wb" or indexed < size:
+            self._extend_index(ipath, mode, indexed, size, st.st_ino)
+        self._index_file = open(ipath, "rb")
+        self._index = _map(self._index_file)
+        self._count = (len(self._index) - _HEADER.size) // _OFFSET.size
+        _, _, inode, indexed = _HEADER.unpack_from(self._index)
+        self._source = (inode, indexed)
+
+    def _extend_index(self, ipath, mode, start, size, inode):
+        """Дописывает в индекс смещения строк архива с байта start."""
+        mm = self._mm
+        offsets = array("Q")
+        pos = start
+        while pos < size:
+            offsets.append(pos)
+            end = mm.find(b"\n", pos)
+            if end < 0:
+                # Незавершённая последняя строка: учтём её целиком при следующем дополнении
+                offsets.pop()
+                break
+            pos = end + 1
+        if offsets.itemsize != _OFFSET.size:
+            raise RuntimeError("array('Q') должен быть 8-байтовым")
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        with open(ipath, mode) as f:
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, inode, pos))
+            f.seek(0, os.SEEK_END)
+            f.write(offsets.tobytes())
+
+    def _offset(self, i):
+        return _OFFSET.unpack_from(self._index, _HEADER.size + i * _OFFSET.size)[0]
+
+    def line(self, i):
+        """Строка архива номер i (с нуля) без перевода строки."""
+        start = self._offset(i)
+        end = self._mm.find(b"\n", start)
+        return self._mm[start:end if end >= 0 else len(self._mm)].decode("utf-8", errors="replace")
+
+    def lines(self, start=0, stop=None):
+        stop = self._count if stop is None else min(stop, self._count)
+        for i in range(start, stop):
+            yield i, self.line(i)
+
+    def search(self, text):
+        """Номера строк, в тексте или подзадачах которых есть подстрока text (без учёта регистра)."""
+        needle = text.lower()
+        candidates = self._trigram_candidates(needle)
+        if candidates is None:
+            matches = (i for i, line in self.lines() if needle in _search_fields(line))
+        else:
+            matches = (i for i in candidates if needle in _search_fields(self.line(i)))
+        return list(matches)
+
+    def _trigram_candidates(self, needle):
+        """Кандидаты из триграммного индекса или None, если им нельзя воспользоваться."""
+        grams = trigrams(needle)
+        if not grams:
+            return None
+        index = self._load_trigrams()
+        if index is None:
+            return None
+        result = None
+        for gram in sorted(grams, key=lambda g: len(index.get(g, b""))):
+            postings = index.get(gram)
+            if postings is None:
+                return []
+            numbers = array("I")
+            numbers.frombytes(postings)
+            result = set(numbers) if result is None else result.intersection(numbers)
+            if not result:
+                return []
+        return sorted(result)
+
+    def _load_trigrams(self):
+        try:
+            with open(trigram_path(self.path), "rb") as f:
+                magic, source, postings = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        # Триграммный индекс годится, только если построен по тому же содержимому архива
+        return postings if magic == TRIGRAM_MAGIC and tuple(source) == self._source else None
+
+    def build_trigrams(self):
+        """Строит триграммный индекс по тексту и подзадачам; возвращает число триграмм."""
+        postings = {}
+        for i, line in self.lines():
+            for gram in trigrams(_search_fields(line)):
+                numbers = postings.get(gram)
+                if numbers is None:
+                    numbers = postings[gram] = array("I")
+                numbers.append(i)
+        data = (TRIGRAM_MAGIC, self._source, {gram: numbers.tobytes() for gram, numbers in postings.items()})
+        tmp = trigram_path(self.path) + ".tmp"
+        with open(tmp, "wb") as f:
+            marshal.dump(data, f)
+        os.replace(tmp, trigram_path(self.path))
+        return len(postings)
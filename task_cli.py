@@ -0,0 +1,420 @@
+"""Неинтерактивный интерфейс командной строки для менеджера задач.
+
+Примеры:
+    python task_manager.py add "Купить хлеб" --category Личное --deadline 2025-04-09
+    python task_manager.py done "Купить хлеб"
+    python task_manager.py list --category Работа --json
+    python task_manager.py list --page 2 --page-size 50   # или --top 10 — самые срочные
+    python task_manager.py agenda --days 7            # с развёрнутыми повторениями
+    python task_manager.py archive --search отчёт --page 1
+    python task_manager.py trends --period month --by category
+    python task_manager.py notify --daemon --channels console,desktop
+    python task_manager.py deps "Отчёт" --on "Собрать данные"   # или deps --ready / --plan
+    python task_manager.py subtask "Отчёт" --add "Таблицы" --parent 3f2a9c1b
+    python task_manager.py --batch ops.jsonl        # или --batch - для stdin
+    python task_manager.py bulk --tag отпуск --shift-days 7 --add-tags перенесено
+
+Пакетный файл содержит JSON-строки вида:
+    {"op": "add", "text": "Задача", "category": "Работа", "priority": "высокий"}
+    {"op": "edit", "text": "Задача", "new_text": "Новая задача", "deadline": "2025-05-01"}
+    {"op": "done", "text": "Задача"}   (также "undone", "mark" с полем "done", "delete")
+Все операции применяются в одном процессе: одна загрузка и одно сохранение в конце.
+"""
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+
+from task_manager import TaskManager, FILENAME, ARCHIVE_FILENAME, IMPORT_BATCH_SIZE, PRIORITIES, get_page_size, paginate
+from task_io import EXPORT_FORMATS, COMPRESSIONS
+from task_render import Output, set_color
+from task_archive import ArchiveReader
+from task_history import PERIODS, DIMENSIONS
+from task_subtasks import iter_numbered
+
+EDITABLE_FIELDS = ("category", "priority", "deadline", "tags", "repeat", "subtasks")
+# Типы полей операции: значение другого типа — ошибка строки пакета, а не исключение
+FIELD_TYPES = {"category": str, "priority": str, "deadline": str, "tags": list, "repeat": str, "subtasks": list,
+               "new_text": str}
+
+
+def _split_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def _find(manager, text):
+    task = manager.find_task(text)
+    if task is None:
+        raise ValueError(f"задача не найдена: {text}")
+    return task
+
+
+def apply_operation(manager, op):
+    """Применяет одну операцию (словарь) без сохранения файла."""
+    if not isinstance(op, dict):
+        raise ValueError("операция должна быть JSON-объектом")
+    name = op.get("op")
+    text = op.get("text")
+    if not isinstance(text, str):
+        raise ValueError("не указано поле 'text'")
+    for key, expected in FIELD_TYPES.items():
+        if op.get(key) is not None and not isinstance(op[key], expected):
+            raise ValueError(f"поле '{key}' должно быть {'строкой' if expected is str else 'списком'}")
+    if name == "add":
+        fields = {key: op[key] for key in EDITABLE_FIELDS if key in op}
+        manager.create_task(text, save=False, **fields)
+    elif name == "edit":
+        changes = {key: op[key] for key in EDITABLE_FIELDS if key in op}
+        if "new_text" in op:
+            changes["text"] = op["new_text"]
+        if "done" in op:
+            changes["done"] = bool(op["done"])
+        manager.update_task(_find(manager, text), save=False, **changes)
+    elif name in ("done", "undone", "mark"):
+        done = bool(op.get("done", True)) if name == "mark" else name == "done"
+        manager.set_done(_find(manager, text), done, save=False)
+    elif name == "delete":
+        manager.remove_task(_find(manager, text), save=False)
+    else:
+        raise ValueError(f"неизвестная операция: {name}")
+
+
+def run_batch(manager, lines, stop_on_error=False, err=None):
+    """Применяет JSON-строки операций; возвращает (применено, ошибок)."""
+    err = err or sys.stderr
+    applied = errors = 0
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            apply_operation(manager, json.loads(line))
+            applied += 1
+        except ValueError as e:  # json.JSONDecodeError — тоже ValueError
+            errors += 1
+            print(f"строка {number}: {e}", file=err)
+            if stop_on_error:
+                break
+    return applied, errors
+
+
+def _task_to_line(task):
+    mark = "[x]" if task["done"] else "[ ]"
+    deadline = f", до {task['deadline']}" if task["deadline"] else ""
+    tags = f", теги: {', '.join(task['tags'])}" if task["tags"] else ""
+    return f"{mark} {task['text']} ({task['category']}, {task['priority']}{deadline}{tags})"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="task_manager.py", description="Менеджер задач: неинтерактивный режим")
+    parser.add_argument("--file", default=FILENAME, help="файл задач (по умолчанию todo.txt)")
+    parser.add_argument("--archive", default=ARCHIVE_FILENAME, help="файл архива (по умолчанию archive.txt)")
+    parser.add_argument("--batch", metavar="ФАЙЛ", help="применить JSON-строки операций из файла ('-' — stdin)")
+    parser.add_argument("--no-color", action="store_true", help="не раскрашивать вывод (по умолчанию цвет только в терминале)")
+    parser.add_argument("--stop-on-error", action="store_true", help="остановить пакет на первой ошибке и ничего не сохранять")
+    sub = parser.add_subparsers(dest="command")
+
+    def add_fields(p, edit=False):
+        p.add_argument("--category")
+        p.add_argument("--priority", choices=PRIORITIES)
+        p.add_argument("--deadline", help="ГГГГ-ММ-ДД")
+        p.add_argument("--tags", help="теги через запятую")
+        p.add_argument("--repeat", help="ежедневно, еженедельно, ежемесячно, каждые N дней, FREQ=...;BYDAY=... или нет")
+        p.add_argument("--subtasks", help="подзадачи через запятую")
+        if edit:
+            p.add_argument("--text", dest="new_text", help="новый текст задачи")
+
+    p = sub.add_parser("add", help="добавить задачу")
+    p.add_argument("text")
+    add_fields(p)
+
+    p = sub.add_parser("edit", help="изменить задачу")
+    p.add_argument("text")
+    add_fields(p, edit=True)
+
+    for name, help_text in (("done", "отметить выполненными"), ("undone", "снять отметку"), ("delete", "удалить")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("texts", nargs="+", metavar="text")
+
+    p = sub.add_parser("ics", help="инкрементальный экспорт в iCalendar")
+    p.add_argument("-o", "--output", default="tasks.ics")
+    p.add_argument("--delta", metavar="ФАЙЛ", help="записать только добавленные/изменённые/отменённые события")
+
+    p = sub.add_parser("import", help="потоковый импорт из JSON-массива или JSON-строк")
+    p.add_argument("path")
+    p.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="размер пачки для записи в файл")
+
+    def add_filters(p):
+        p.add_argument("--category")
+        p.add_argument("--priority", choices=PRIORITIES)
+        p.add_argument("--tag")
+        p.add_argument("--overdue", action="store_true")
+        p.add_argument("--urgent", action="store_true")
+        p.add_argument("--search")
+
+    p = sub.add_parser("export", help="потоковый экспорт в JSON (только подходящие под фильтры задачи)")
+    p.add_argument("-o", "--output", default="tasks.json", help="файл (.gz/.zst включают сжатие)")
+    p.add_argument("--format", choices=EXPORT_FORMATS, default="json")
+    p.add_argument("--compress", choices=("auto", "none") + COMPRESSIONS, default="auto")
+    add_filters(p)
+
+    p = sub.add_parser("bulk", help="массово изменить задачи по фильтрам или id (одно сохранение)")
+    add_filters(p)
+    p.add_argument("--ids", help="id задач через запятую")
+    p.add_argument("--all", action="store_true", help="применить ко всем задачам")
+    action = p.add_mutually_exclusive_group()
+    action.add_argument("--done", dest="set_done", action="store_const", const=True)
+    action.add_argument("--undone", dest="set_done", action="store_const", const=False)
+    action.add_argument("--delete", action="store_true")
+    p.add_argument("--set-category")
+    p.add_argument("--set-priority", choices=PRIORITIES)
+    p.add_argument("--add-tags", help="добавить теги (через запятую)")
+    p.add_argument("--remove-tags", help="убрать теги (через запятую)")
+    p.add_argument("--shift-days", type=int, default=0, help="сдвинуть дедлайны на N дней (можно отрицательное)")
+
+    p = sub.add_parser("archive", help="просмотр и поиск по архиву без загрузки его в память")
+    p.add_argument("--search", help="подстрока в тексте или подзадачах")
+    p.add_argument("--count", action="store_true", help="только число задач")
+    p.add_argument("--page", type=int, default=1)
+    p.add_argument("--page-size", type=int, default=None)
+    p.add_argument("--build-trigrams", action="store_true", help="построить триграммный индекс для быстрого поиска")
+
+    p = sub.add_parser("trends", help="динамика выполнения по сводным таблицам истории")
+    p.add_argument("--period", choices=PERIODS, default="week")
+    p.add_argument("--by", choices=DIMENSIONS, default="all", help="срез: категория, приоритет или тег")
+    p.add_argument("--value", help="значение среза (по умолчанию — все известные)")
+    p.add_argument("--last", type=int, default=8, help="сколько последних интервалов показать")
+    p.add_argument("--json", action="store_true", help="вывод в формате JSON-строк")
+    p.add_argument("--rebuild", action="store_true", help="перестроить сводные таблицы по журналу выполнений")
+
+    p = sub.add_parser("notify", help="уведомления о дедлайнах (с --daemon — работать как служба)")
+    p.add_argument("--daemon", action="store_true", help="не завершаться: спать до ближайшего порога")
+    p.add_argument("--channels", help="каналы через запятую: console, log, desktop (по умолчанию из config.ini)")
+    p.add_argument("--refresh", type=float, default=60.0, metavar="SEC",
+                   help="как часто подтягивать изменения файла другими процессами (в режиме службы)")
+
+    p = sub.add_parser("subtask", help="дерево подзадач задачи: показать, добавить, отметить")
+    p.add_argument("text")
+    p.add_argument("--add", metavar="TEXT", help="добавить подзадачу")
+    p.add_argument("--parent", metavar="ID", help="id подзадачи, в которую добавить (по умолчанию — верхний уровень)")
+    p.add_argument("--done", metavar="ID", help="отметить подзадачу (с вложенными) выполненной")
+    p.add_argument("--undone", metavar="ID", help="снять отметку с подзадачи")
+
+    p = sub.add_parser("deps", help="зависимости задач: добавить, убрать, что можно начинать, критический путь")
+    p.add_argument("text", nargs="?", help="задача, которая ждёт (для критического пути — его конец)")
+    p.add_argument("--on", metavar="TEXT", help="задача, которую нужно выполнить раньше")
+    p.add_argument("--remove", action="store_true", help="убрать зависимость от --on, а не добавить")
+    p.add_argument("--ready", action="store_true", help="список задач, которые можно начинать")
+    p.add_argument("--plan", action="store_true", help="невыполненные задачи в порядке выполнения")
+
+    p = sub.add_parser("agenda", help="повторения и дедлайны на ближайшие дни")
+    p.add_argument("--days", type=int, default=14)
+
+    p = sub.add_parser("list", help="показать задачи")
+    add_filters(p)
+    p.add_argument("--json", action="store_true", help="вывод в формате JSON-строк")
+    p.add_argument("--page", type=int, default=None, help="показать только эту страницу")
+    p.add_argument("--page-size", type=int, default=None, help="задач на странице (по умолчанию из config.ini)")
+    p.add_argument("--top", type=int, metavar="K", help="только K самых срочных невыполненных задач")
+    return parser
+
+
+def _filters(args):
+    return {
+        "category": args.category, "priority": args.priority, "tag": args.tag,
+        "only_overdue": args.overdue, "only_urgent": args.urgent, "search_text": args.search,
+    }
+
+
+def _command_operations(args):
+    """Превращает аргументы подкоманды в список операций пакетного формата."""
+    if args.command in ("add", "edit"):
+        op = {"op": args.command, "text": args.text}
+        for key in ("category", "priority", "deadline", "repeat"):
+            if getattr(args, key) is not None:
+                op[key] = getattr(args, key)
+        if args.tags is not None:
+            op["tags"] = _split_list(args.tags)
+        if args.subtasks is not None:
+            op["subtasks"] = _split_list(args.subtasks)
+        if args.command == "edit" and args.new_text:
+            op["new_text"] = args.new_text
+        return [op]
+    return [{"op": args.command, "text": text} for text in args.texts]
+
+
+def run(argv=None, out=None, err=None):
+    """Точка входа неинтерактивного режима; возвращает код завершения."""
+    out = out or sys.stdout
+    err = err or sys.stderr
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.no_color:
+        set_color(False)
+    if not args.batch and not args.command:
+        parser.print_help(out)
+        return 2
+    manager = TaskManager(filename=args.file, archive_filename=args.archive)
+
+    if args.command == "list":
+        if args.top:
+            tasks = manager.most_urgent(args.top, **_filters(args))
+        elif args.page:
+            tasks, _ = paginate(manager.iter_filtered(**_filters(args), tasks=manager.ordered_tasks()),
+                                args.page, args.page_size or get_page_size())
+        else:
+            tasks = manager.iter_filtered(**_filters(args))
+        # Весь список собирается в буфер и пишется крупными блоками
+        with Output(out) as buffer:
+            if args.json:
+                encode = json.JSONEncoder(ensure_ascii=False).encode
+                for task in tasks:
+                    buffer.line(encode(task))
+            else:
+                today = date.today().isoformat()
+                for task in tasks:
+                    line = _task_to_line(task)
+                    if buffer.color and not task["done"] and task["deadline"] and task["deadline"] < today:
+                        buffer.red(line)
+                    else:
+                        buffer.line(line)
+        return 0
+
+    if args.command == "archive":
+        with ArchiveReader(manager.archive_filename) as archive:
+            if args.build_trigrams:
+                print(f"Триграмм в индексе: {archive.build_trigrams()}", file=out)
+            numbers = archive.search(args.search) if args.search else range(len(archive))
+            if args.count:
+                print(len(numbers), file=out)
+                return 0
+            page_size = args.page_size or get_page_size()
+            with Output(out) as buffer:
+                for i, task in manager.archive_page(archive, numbers, args.page, page_size):
+                    buffer.line(f"{i}. {_task_to_line(task)}")
+        return 0
+
+    if args.command == "trends":
+        if args.rebuild:
+            print(f"Учтено выполнений: {manager.history.rebuild()}", file=out)
+        values = [""] if args.by == "all" else [args.value] if args.value else manager.history.values(args.by)
+        with Output(out) as buffer:
+            for value in values:
+                if args.json:
+                    for row in manager.history.report(args.period, args.by, value, args.last):
+                        buffer.line(json.dumps(dict(row, value=value), ensure_ascii=False))
+                else:
+                    manager.render_trends(buffer, args.period, args.by, value, args.last)
+        return 0
+
+    if args.command == "notify":
+        from task_notify import make_notifiers
+        notifiers = make_notifiers(_split_list(args.channels)) if args.channels else None
+        scheduler = manager.start_notifications(notifiers)
+        if not args.daemon:
+            scheduler.fire()
+            return 0
+        try:
+            scheduler.run(refresh_interval=args.refresh)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == "subtask":
+        try:
+            task = _find(manager, args.text)
+            if args.add:
+                manager.add_subtask(task, args.add, args.parent)
+            if args.done or args.undone:
+                manager.set_subtask_done(task, args.done or args.undone, done=bool(args.done))
+        except ValueError as e:
+            print(f"Ошибка: {e}", file=err)
+            return 1
+        tree = manager.subtask_tree(task)
+        with Output(out) as buffer:
+            buffer.line(f"{task['text']}: выполнено {tree.done}/{tree.total} ({tree.progress():.0%})")
+            for number, depth, node in iter_numbered(task["subtasks"]):
+                line = f"{'   ' * depth}{number}. {'[x]' if node['done'] else '[ ]'} {node['text']} [{node['id']}]"
+                if node.get("subtasks"):
+                    line += f" — {tree.progress(node['id']):.0%}"
+                buffer.line(line)
+        return 0
+
+    if args.command == "deps":
+        task = None
+        try:
+            if args.text:
+                task = _find(manager, args.text)
+            if args.on:
+                if task is None:
+                    raise ValueError("укажи задачу, которая ждёт")
+                blocker = _find(manager, args.on)
+                if args.remove:
+                    manager.remove_dependency(task, blocker)
+                else:
+                    manager.add_dependency(task, blocker)
+        except ValueError as e:
+            print(f"Ошибка: {e}", file=err)
+            return 1
+        with Output(out) as buffer:
+            if args.ready or args.plan:
+                for i, ready in enumerate(manager.ready_tasks() if args.ready else manager.schedule(), 1):
+                    deadline = f" (до {ready['deadline']})" if ready["deadline"] else ""
+                    buffer.line(f"{i}. {ready['text']}{deadline}")
+            else:
+                manager.render_dependencies(buffer, task)
+        return 0
+
+    if args.command == "agenda":
+        start = date.today()
+        with Output(out) as buffer:
+            for day, task in manager.occurrences(start, start + timedelta(days=args.days)):
+                buffer.line(f"{day.isoformat()}  {task['text']} ({task['category']}, {task['priority']})")
+        return 0
+
+    if args.command == "export":
+        compression = None if args.compress == "none" else args.compress
+        try:
+            manager.export_to_json(args.output, args.format, compression, **_filters(args))
+        except ValueError as e:
+            print(f"Ошибка: {e}", file=err)
+            return 1
+        return 0
+
+    if args.command == "ics":
+        manager.export_to_ics(args.output, args.delta)
+        return 0
+
+    if args.command == "bulk":
+        query = {key: value for key, value in _filters(args).items() if value}
+        if not (query or args.ids or args.all):
+            print("Ошибка: укажи фильтры, --ids или --all", file=err)
+            return 2
+        count = manager.bulk_update(query, _split_list(args.ids) if args.ids else None, done=args.set_done,
+                                    delete=args.delete, category=args.set_category, priority=args.set_priority,
+                                    add_tags=_split_list(args.add_tags), remove_tags=_split_list(args.remove_tags),
+                                    shift_days=args.shift_days)
+        print(f"Изменено задач: {count}", file=out)
+        return 0
+
+    if args.command == "import":
+        stats = manager.import_from_json(args.path, batch_size=args.batch_size)
+        return 0 if stats is not None and not stats["invalid"] else 1
+
+    if args.batch:
+        if args.batch == "-":
+            applied, errors = run_batch(manager, sys.stdin, args.stop_on_error, err)
+        else:
+            with open(args.batch, "r", encoding="utf-8") as f:
+                applied, errors = run_batch(manager, f, args.stop_on_error, err)
+    else:
+        lines = [json.dumps(op, ensure_ascii=False) for op in _command_operations(args)]
+        applied, errors = run_batch(manager, lines, args.stop_on_error, err)
+
+    if errors and args.stop_on_error:
+        print(f"Остановлено на ошибке, изменения не сохранены (применено: {applied}).", file=err)
+        return 1
+    if applied:
+        manager.save()
+    print(f"Применено операций: {applied}, ошибок: {errors}", file=out)
+    return 1 if errors else 0
@@ -0,0 +1,57 @@
+"""Быстрый разбор дат в нескольких форматах.
+
+Одно регулярное выражение распознаёт все поддерживаемые форматы и сразу
+собирает date из целых чисел — без перебора strptime с исключениями.
+Результаты кэшируются: дедлайны в файлах сильно повторяются.
+
+Поддерживаемые форматы:
+    2025-04-09, 2025/04/09, 2025.04.09  (год первым)
+    09.04.2025, 09-04-2025, 09/04/2025  (день первым)
+"""
+import re
+from datetime import date
+from functools import lru_cache
+
+ISO_FORMAT = "%Y-%m-%d"
+EXAMPLES = "Примеры: 2025-04-09, 09.04.2025, 09-04-2025, 2025/04/09"
+
+_DATE_RE = re.compile(
+    r"\s*(?:(?P<y1>\d{4})(?P<s1>[-./])(?P<m1>\d{1,2})(?P=s1)(?P<d1>\d{1,2})"
+    r"|(?P<d2>\d{1,2})(?P<s2>[-./])(?P<m2>\d{1,2})(?P=s2)(?P<y2>\d{4}))\s*\Z"
+)
+
+
+@lru_cache(maxsize=65536)
+def _parse(text):
+    match = _DATE_RE.match(text)
+    if match is None:
+        return None
+    y1 = match.group("y1")
+    if y1 is not None:
+        year, month, day = int(y1), int(match.group("m1")), int(match.group("d1"))
+    else:
+        year, month, day = int(match.group("y2")), int(match.group("m2")), int(match.group("d2"))
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_date(text):
+    """Разбирает дату в любом поддерживаемом формате; при ошибке бросает ValueError."""
+    parsed = _parse(text) if isinstance(text, str) else None
+    if parsed is None:
+        raise ValueError(f"Неверный формат даты! {EXAMPLES}")
+    return parsed
+
+
+def try_parse_date(text):
+    """Как parse_date, но возвращает None вместо исключения."""
+    return _parse(text) if isinstance(text, str) and text else None
+
+
+def normalize_date(text):
+    """Приводит дату к виду ГГГГ-ММ-ДД; пустая строка остаётся пустой."""
+    if not text or not text.strip():
+        return ""
+    return parse_date(text).isoformat()
@@ -0,0 +1,203 @@
+"""Граф зависимостей между задачами: «задачу A блокирует задача B».
+
+Задача хранит id блокирующих её задач в поле blocked_by (в файле — десятое
+поле через запятую, только если список не пуст). DependencyGraph держит
+списки смежности в обе стороны (blockers и dependents) и для каждой задачи
+число её невыполненных блокирующих, поэтому «можно начинать» и «сколько
+задач заблокировано» отвечаются без обхода графа. Отметка задачи меняет
+счётчики только её прямых зависимых, удаление — только её рёбер.
+
+Цикл проверяется при добавлении ребра: обходятся лишь задачи, от которых
+уже зависит блокирующая. Ссылки на неизвестные id (удалённые или
+архивированные задачи) не блокируют.
+"""
+import heapq
+from datetime import date
+
+from task_dates import try_parse_date
+
+NO_DEADLINE = date.max.toordinal()  # задачи без дедлайна — после любых дат
+
+
+def deadline_key(task):
+    deadline = try_parse_date(task["deadline"]) if task["deadline"] else None
+    return deadline.toordinal() if deadline else NO_DEADLINE
+
+
+class DependencyGraph:
+    """Индекс зависимостей по задачам tasks (у каждой задачи должен быть id)."""
+
+    def __init__(self, tasks=()):
+        self.tasks = {}  # id -> задача
+        self.done = {}  # id -> выполнена ли задача на момент последнего обновления
+        self.blockers = {}  # id -> id блокирующих задач
+        self.dependents = {}  # id -> id задач, которые она блокирует (в том числе ещё не загруженных)
+        self.open_blockers = {}  # id -> число невыполненных блокирующих (только ненулевые)
+        self.blocked = set()  # невыполненные задачи, у которых есть невыполненные блокирующие
+        for task in tasks:
+            self.add(task)
+
+    def _recount(self, task_id, delta):
+        count = self.open_blockers.get(task_id, 0) + delta
+        if count:
+            self.open_blockers[task_id] = count
+        else:
+            self.open_blockers.pop(task_id, None)
+        self._reclassify(task_id)
+
+    def _reclassify(self, task_id):
+        if task_id in self.open_blockers and self.done.get(task_id) is False:
+            self.blocked.add(task_id)
+        else:
+            self.blocked.discard(task_id)
+
+    def add(self, task):
+        task_id = task["id"]
+        self.tasks[task_id] = task
+        self.done[task_id] = task["done"]
+        blockers = set(task.get("blocked_by") or ()) - {task_id}
+        if blockers:
+            self.blockers[task_id] = blockers
+        open_count = 0
+        for blocker in blockers:
+            self.dependents.setdefault(blocker, set()).add(task_id)
+            open_count += self.done.get(blocker) is False
+        if open_count:
+            self.open_blockers[task_id] = open_count
+        self._reclassify(task_id)
+        if not task["done"]:
+            # Задача появилась после зависящих от неё (порядок загрузки, синхронизация)
+            for dependent in self.dependents.get(task_id, ()):
+                self._recount(dependent, 1)
+
+    def remove(self, task):
+        task_id = task["id"]
+        if task_id not in self.tasks:
+            return
+        if not self.done[task_id]:
+            for dependent in self.dependents.get(task_id, ()):
+                self._recount(dependent, -1)
+        for blocker in self.blockers.pop(task_id, ()):
+            dependents = self.dependents.get(blocker)
+            if dependents is not None:
+                dependents.discard(task_id)
+                if not dependents:
+                    del self.dependents[blocker]
+        del self.tasks[task_id], self.done[task_id]
+        self.open_blockers.pop(task_id, None)
+        self.blocked.discard(task_id)
+
+    def update(self, task):
+        """Учитывает изменение статуса или списка блокирующих; возвращает задачи, которые стали свободны."""
+        task_id = task["id"]
+        if task_id not in self.tasks:
+            self.add(task)
+            return []
+        if set(task.get("blocked_by") or ()) - {task_id} != self.blockers.get(task_id, set()):
+            self.remove(task)
+            self.add(task)
+            return []
+        done = task["done"]
+        if done == self.done[task_id]:
+            return []
+        self.done[task_id] = done
+        self._reclassify(task_id)
+        released = []
+        for dependent in self.dependents.get(task_id, ()):
+            self._recount(dependent, -1 if done else 1)
+            if done and dependent in self.tasks and dependent not in self.open_blockers and not self.done[dependent]:
+                released.append(self.tasks[dependent])
+        return released
+
+    def cycle(self, task_id, blocker_id):
+        """Путь blocker_id -> ... -> task_id, если ребро «task_id ждёт blocker_id» замкнёт цикл, иначе None."""
+        if task_id == blocker_id:
+            return [task_id]
+        # Обходим только то, от чего уже зависит блокирующая задача
+        came_from = {blocker_id: None}
+        stack = [blocker_id]
+        while stack:
+            node = stack.pop()
+            for upstream in self.blockers.get(node, ()):
+                if upstream in came_from:
+                    continue
+                came_from[upstream] = node
+                if upstream == task_id:
+                    path = [task_id]
+                    while came_from[path[-1]] is not None:
+                        path.append(came_from[path[-1]])
+                    return path[::-1]
+                stack.append(upstream)
+        return None
+
+    def is_blocked(self, task_id):
+        return task_id in self.blocked
+
+    def open_blockers_of(self, task_id):
+        """Невыполненные задачи, которые блокируют task_id."""
+        return [self.tasks[b] for b in self.blockers.get(task_id, ()) if self.done.get(b) is False]
+
+    def chain(self, task_id):
+        """Самая длинная цепочка невыполненных блокирующих задач, ведущая к task_id (в порядке выполнения).
+
+        Из равных по длине ветвей выбирается та, где дедлайн раньше.
+        """
+        best = {}  # id -> (длина цепочки, ключ дедлайна, предыдущая задача цепочки)
+        active = set()
+        stack = [task_id]
+        while stack:
+            node = stack[-1]
+            if node in best:
+                stack.pop()
+                continue
+            upstream = [b for b in self.blockers.get(node, ()) if self.done.get(b) is False and b not in active]
+            pending = [b for b in upstream if b not in best]
+            if pending and node not in active:
+                active.add(node)
+                stack.extend(pending)
+                continue
+            stack.pop()
+            active.discard(node)
+            previous = max((b for b in upstream if b in best),
+                           key=lambda b: (best[b][0], -best[b][1]), default=None)
+            length = best[previous][0] + 1 if previous is not None else 1
+            best[node] = (length, deadline_key(self.tasks[node]), previous)
+        path = [task_id]
+        while best[path[-1]][2] is not None:
+            path.append(best[path[-1]][2])
+        return [self.tasks[node] for node in reversed(path)]
+
+    def critical_path(self, task_id=None):
+        """Цепочка задач, которую нужно пройти до task_id.
+
+        Без task_id берётся заблокированная задача с ближайшим дедлайном (а из них — с самой длинной цепочкой).
+        Возвращает [] если заблокированных задач нет.
+        """
+        if task_id is None:
+            if not self.blocked:
+                return []
+            nearest = min(deadline_key(self.tasks[b]) for b in self.blocked)
+            chains = [self.chain(b) for b in self.blocked if deadline_key(self.tasks[b]) == nearest]
+            return max(chains, key=len)
+        return self.chain(task_id)
+
+    def schedule(self):
+        """Невыполненные задачи в порядке, допустимом зависимостями; из свободных — сначала с ближайшим дедлайном.
+
+        Задачи из цикла (его можно создать только правкой файла вручную) в план не попадают.
+        """
+        waiting = {task_id: self.open_blockers[task_id] for task_id in self.blocked}
+        heap = [(deadline_key(task), n, task_id) for n, (task_id, task) in enumerate(self.tasks.items())
+                if not task["done"] and task_id not in waiting]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            _, n, task_id = heapq.heappop(heap)
+            order.append(self.tasks[task_id])
+            for dependent in self.dependents.get(task_id, ()):
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if not waiting[dependent]:
+                        del waiting[dependent]
+                        heapq.heappush(heap, (deadline_key(self.tasks[dependent]), n, dependent))
+        return order
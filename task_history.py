@@ -0,0 +1,257 @@
+"""История выполнения задач и сводные таблицы для отчётов о продуктивности.
+
+Каждое выполнение дописывается строкой JSON в журнал <файл>.history. Журнал —
+сырые данные: отчёты его не читают, он нужен только для перестройки сводок
+(rebuild). Одновременно обновляются сводные таблицы <файл>.rollup.json: для
+каждого периода (день, неделя, месяц), среза (все задачи, категория,
+приоритет, тег) и интервала хранится
+
+    [выполнено, сумма сроков выполнения в днях, задач с известным сроком, выполнено после дедлайна]
+
+поэтому отчёт о динамике — это несколько обращений к словарю. Срок
+выполнения считается от даты добавления задачи, которая запоминается при
+создании и забывается при выполнении. Выполнение, снятое до архивации,
+вычитается из сводок.
+
+Изменения копятся в памяти и записываются одним разом под блокировкой
+файла задач (flush вызывается из TaskManager.save).
+"""
+import json
+from datetime import date, datetime, timedelta
+
+from task_lock import file_version, write_atomic
+
+PERIODS = ("day", "week", "month")
+DIMENSIONS = ("all", "category", "priority", "tag")
+FORMAT_VERSION = 1
+
+
+def history_path(path):
+    return path + ".history"
+
+
+def rollup_path(path):
+    return path + ".rollup.json"
+
+
+def bucket(period, day):
+    """Интервал периода, в который попадает дата: 2025-04-09, 2025-W15 или 2025-04."""
+    if period == "day":
+        return day.isoformat()
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return f"{day.year}-{day.month:02d}"
+    raise ValueError(f"неизвестный период: {period}")
+
+
+def recent_buckets(period, today, last):
+    """Последние last интервалов периода, от старого к текущему."""
+    if period == "day":
+        days = [today - timedelta(days=i) for i in range(last)]
+    elif period == "week":
+        days = [today - timedelta(weeks=i) for i in range(last)]
+    else:
+        months = [today.year * 12 + today.month - 1 - i for i in range(last)]
+        days = [date(m // 12, m % 12 + 1, 1) for m in months]
+    return [bucket(period, day) for day in reversed(days)]
+
+
+def completion_event(task, when):
+    """Запись журнала о выполнении задачи (дата создания добавляется при записи)."""
+    return {
+        "at": when.isoformat(timespec="seconds"),
+        "id": task.get("id", ""),
+        "category": task["category"],
+        "priority": task["priority"],
+        "tags": list(task["tags"]),
+        "deadline": task["deadline"],
+        "created": None,
+    }
+
+
+def _slices(event):
+    yield "all", ""
+    yield "category", event["category"]
+    yield "priority", event["priority"]
+    for tag in event["tags"]:
+        yield "tag", tag
+
+
+def _empty_state():
+    return {"version": FORMAT_VERSION, "open": {}, "pending": {}, "values": {}, "rollups": {}}
+
+
+def apply_event(state, event, sign=1):
+    """Прибавляет (sign=1) или вычитает (sign=-1) выполнение в сводных таблицах."""
+    finished = datetime.fromisoformat(event["at"]).date()
+    lead = (finished - date.fromisoformat(event["created"])).days if event.get("created") else None
+    late = bool(event["deadline"]) and event["deadline"] < finished.isoformat()
+    delta = (sign, sign * (lead or 0), sign if lead is not None else 0, sign if late else 0)
+    rollups = state["rollups"]
+    values = state["values"]
+    for dimension, value in _slices(event):
+        if dimension != "all":
+            known = values.setdefault(dimension, [])
+            if value not in known:
+                known.append(value)
+        for period in PERIODS:
+            key = f"{period}|{bucket(period, finished)}|{dimension}|{value}"
+            row = rollups.get(key)
+            if row is None:
+                row = rollups[key] = [0, 0, 0, 0]
+            for i, d in enumerate(delta):
+                row[i] += d
+            if not row[0]:
+                del rollups[key]
+
+
+class CompletionHistory:
+    """Журнал выполнений и сводные таблицы для файла задач path."""
+
+    def __init__(self, path, lock):
+        self.path = path
+        self.lock = lock
+        self._ops = []
+        self._state = None
+        self._version = None
+
+    # Изменения копятся в памяти до flush()
+
+    def opened(self, task, when=None):
+        """Запоминает дату добавления задачи (для срока выполнения)."""
+        self._ops.append(("open", task.get("id", ""), (when or date.today()).isoformat()))
+
+    def completed(self, task, final=True, when=None):
+        """Отмечает выполнение задачи; final=False — выполнено очередное повторение, задача остаётся."""
+        self._ops.append(("done", completion_event(task, when or datetime.now()), final))
+
+    def reopened(self, task):
+        """Снимает выполнение задачи, ещё не попавшей в архив."""
+        self._ops.append(("reopen", task.get("id", ""), None))
+
+    def archived(self, tasks, when=None):
+        """Архивирование: выполненные задачи без записи о выполнении учитываются сейчас."""
+        when = when or datetime.now()
+        for task in tasks:
+            self._ops.append(("archive", completion_event(task, when), None))
+
+    def forgotten(self, task):
+        """Задача удалена: её дата добавления и незаархивированное выполнение больше не нужны."""
+        self._ops.append(("drop", task.get("id", ""), None))
+
+    def flush(self):
+        """Записывает накопленные изменения (под блокировкой файла задач)."""
+        if not self._ops:
+            return
+        ops, self._ops = self._ops, []
+        with self.lock:
+            state = self._load()
+            journal = []
+            for op, payload, extra in ops:
+                if op == "open":
+                    state["open"][payload] = extra
+                elif op == "done" or (op == "archive" and payload["id"] not in state["pending"]):
+                    final = extra if op == "done" else True
+                    task_id = payload["id"]
+                    created = state["open"].pop(task_id, None) if final else state["open"].get(task_id)
+                    payload["created"] = created
+                    apply_event(state, payload)
+                    if final and op == "done":
+                        state["pending"][task_id] = payload
+                    journal.append(payload)
+                elif op == "reopen":
+                    event = state["pending"].pop(payload, None)
+                    if event is not None:
+                        apply_event(state, event, -1)
+                        if event["created"]:
+                            state["open"][payload] = event["created"]
+                        journal.append({"reopened": payload, "at": datetime.now().isoformat(timespec="seconds")})
+                if op == "archive":
+                    state["pending"].pop(payload["id"], None)
+                elif op == "drop":
+                    state["open"].pop(payload, None)
+                    state["pending"].pop(payload, None)
+            if journal:
+                with open(history_path(self.path), "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in journal)
+            self._store(state)
+
+    def _load(self):
+        """Состояние сводок; файл перечитывается, только если его изменил кто-то ещё."""
+        path = rollup_path(self.path)
+        version = file_version(path)
+        if self._state is None or version != self._version:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if state.get("version") != FORMAT_VERSION:
+                    raise ValueError("другая версия формата")
+            except (OSError, ValueError):
+                state = _empty_state()
+            self._state, self._version = state, version
+        return self._state
+
+    def _store(self, state):
+        path = rollup_path(self.path)
+        write_atomic(path, [json.dumps(state, ensure_ascii=False)])
+        self._state, self._version = state, file_version(path)
+
+    def rebuild(self):
+        """Перестраивает сводные таблицы по журналу выполнений; возвращает число учтённых выполнений."""
+        self.flush()
+        with self.lock:
+            old = self._load()
+            state = _empty_state()
+            state["open"], state["pending"] = old["open"], old["pending"]
+            pending = {}
+            count = 0
+            try:
+                with open(history_path(self.path), "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                            if "reopened" in entry:
+                                event = pending.pop(entry["reopened"], None)
+                                if event is not None:
+                                    apply_event(state, event, -1)
+                                    count -= 1
+                            else:
+                                apply_event(state, entry)
+                                pending[entry["id"]] = entry
+                                count += 1
+                        except (ValueError, KeyError, TypeError):
+                            continue
+            except FileNotFoundError:
+                pass
+            self._store(state)
+        return count
+
+    def report(self, period="week", dimension="all", value="", last=8, today=None):
+        """Динамика за последние last интервалов: список словарей по интервалам.
+
+        Для каждого интервала — выполнено задач, средний срок выполнения в днях (или None)
+        и доля выполненных после дедлайна.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"период должен быть одним из: {', '.join(PERIODS)}")
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"срез должен быть одним из: {', '.join(DIMENSIONS)}")
+        self.flush()
+        rollups = self._load()["rollups"]
+        rows = []
+        for label in recent_buckets(period, today or date.today(), last):
+            completed, lead_sum, lead_count, late = rollups.get(f"{period}|{label}|{dimension}|{value}", (0, 0, 0, 0))
+            rows.append({
+                "bucket": label,
+                "completed": completed,
+                "lead_time": round(lead_sum / lead_count, 1) if lead_count else None,
+                "overdue_rate": round(late / completed, 2) if completed else 0.0,
+            })
+        return rows
+
+    def values(self, dimension):
+        """Известные значения среза (категории, приоритеты или теги), встречавшиеся в выполнениях."""
+        self.flush()
+        return list(self._load()["values"].get(dimension, []))
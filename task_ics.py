@@ -0,0 +1,259 @@
+"""Экспорт задач в iCalendar с отслеживанием изменений.
+
+Для каждой задачи с дедлайном строится событие VEVENT с постоянным UID
+(по id задачи). Хэш содержимого события хранится в файле состояния рядом с .ics,
+поэтому у неизменившихся событий сохраняются DTSTAMP и SEQUENCE, а файл
+перезаписывается только при реальных изменениях. В режиме дельты пишутся
+только добавленные, изменённые и отменённые (STATUS:CANCELLED) события.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from task_recurrence import parse_rule, ics_rrule
+from task_subtasks import iter_numbered
+
+PRODID = "-//LegendaryTaskManager//Grok3//EN"
+UID_DOMAIN = "legendarytaskmanager"
+
+
+def ics_escape(text):
+    """Экранирует текстовое значение по RFC 5545."""
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def task_uid(task):
+    return f"{task['id']}@{UID_DOMAIN}"
+
+
+def event_body(task, deadline):
+    """Строки события без DTSTAMP/SEQUENCE (от них не зависит хэш)."""
+    description = f"Категория: {task['category']}\nПриоритет: {task['priority']}"
+    if task["tags"]:
+        description += f"\nТеги: {', '.join(task['tags'])}"
+    if task["repeat"]:
+        description += f"\nПовтор: {task['repeat']}"
+    if task["subtasks"]:
+        description += "\nПодзадачи:\n" + "\n".join(
+            f"{'  ' * depth}- {'[x]' if st['done'] else '[ ]'} {st['text']}" for _, depth, st in iter_numbered(task["subtasks"]))
+    day = deadline.strftime("%Y%m%d")
+    lines = [
+        f"DTSTART;VALUE=DATE:{day}",
+        f"DTEND;VALUE=DATE:{day}",
+        f"SUMMARY:{ics_escape(task['text'])}",
+        f"DESCRIPTION:{ics_escape(description)}",
+        "STATUS:COMPLETED" if task["done"] else "STATUS:CONFIRMED",
+    ]
+    if task["repeat"] and not task["done"]:
+        # Повторения разворачивает календарь: передаём правило, а не копии событий
+        try:
+            rule = parse_rule(task["repeat"])
+        except ValueError:
+            rule = None
+        if rule is not None:
+            lines.append(f"RRULE:{ics_rrule(rule, deadline)}")
+            if rule.exdates:
+                lines.append("EXDATE;VALUE=DATE:" + ",".join(d.strftime("%Y%m%d") for d in rule.exdates))
+    return lines
+
+
+def content_hash(lines):
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def utc_stamp(moment=None):
+    return (moment or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(uid, body, dtstamp, sequence):
+    return ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{dtstamp}", f"SEQUENCE:{sequence}", *body, "END:VEVENT"]
+
+
+def render_calendar(event_blocks):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    for block in event_blocks:
+        lines.extend(block)
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def build_events(tasks, parse_deadline, on_error=None):
+    """Возвращает {uid: (строки события, хэш)} для задач с корректным дедлайном."""
+    events = {}
+    for task in tasks:
+        if not task["deadline"]:
+            continue
+        try:
+            deadline = parse_deadline(task["deadline"])
+        except ValueError:
+            if on_error:
+                on_error(task)
+            continue
+        body = event_body(task, deadline)
+        events[task_uid(task)] = (body, content_hash(body))
+    return events
+
+
+class IcsState:
+    """Состояние последнего экспорта: uid -> хэш, DTSTAMP и SEQUENCE события."""
+
+    def __init__(self, path):
+        self.path = path
+        self.events = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.events = json.load(f)
+            except (OSError, ValueError):
+                self.events = {}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.events, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def diff_events(state, events, now_stamp):
+    """Сравнивает события с состоянием; обновляет его и возвращает (добавлены, изменены, отменены)."""
+    added, updated, cancelled = [], [], []
+    for uid, (body, digest) in events.items():
+        known = state.events.get(uid)
+        if known is None:
+            state.events[uid] = {"hash": digest, "dtstamp": now_stamp, "sequence": 0}
+            added.append(uid)
+        elif known["hash"] != digest:
+            known.update(hash=digest, dtstamp=now_stamp, sequence=known["sequence"] + 1)
+            updated.append(uid)
+    for uid in [uid for uid in state.events if uid not in events]:
+        cancelled.append((uid, state.events.pop(uid)))
+    return added, updated, cancelled
+
+
+def export_incremental(tasks, path, parse_deadline, delta_path=None, on_error=None):
+    """Инкрементально экспортирует задачи в path; при delta_path пишет туда только изменения.
+
+    Возвращает словарь счётчиков added/updated/cancelled/unchanged и флаг written.
+    """
+    state = IcsState(path + ".state.json")
+    events = build_events(tasks, parse_deadline, on_error)
+    now_stamp = utc_stamp()
+    added, updated, cancelled = diff_events(state, events, now_stamp)
+    changed = bool(added or updated or cancelled)
+
+    written = False
+    if changed or not os.path.exists(path):
+        blocks = (render_event(uid, body, state.events[uid]["dtstamp"], state.events[uid]["sequence"])
+                  for uid, (body, _) in events.items())
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(render_calendar(blocks))
+        written = True
+
+    if delta_path is not None:
+        blocks = [render_event(uid, events[uid][0], now_stamp, state.events[uid]["sequence"]) for uid in added + updated]
+        for uid, known in cancelled:
+            blocks.append(["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{now_stamp}",
+                           f"SEQUENCE:{known['sequence'] + 1}", "STATUS:CANCELLED", "END:VEVENT"])
+        with open(delta_path, "w", encoding="utf-8", newline="") as f:
+            f.write(render_calendar(blocks))
+
+    if changed:
+        state.save()
+    return {
+        "added": len(added),
+        "updated": len(updated),
+        "cancelled": len(cancelled),
+        "unchanged": len(events) - len(added) - len(updated),
+        "written": written,
+    }
+
+
+class IcsFeed:
+    """Живая ICS-лента: события перестраиваются только для изменившихся задач.
+
+    refresh() принимает задачи и версию данных (например, mtime и размер файла);
+    при той же версии ничего не пересчитывается. Хэш, DTSTAMP и SEQUENCE событий
+    хранятся в файле состояния state_path (как у export_incremental), поэтому
+    после перезапуска сервера неизменившиеся события отдаются байт в байт.
+    Готовые тела календаря кэшируются по (категория, тег); ETag — хэш тела.
+    Методы можно вызывать из нескольких потоков.
+    """
+
+    def __init__(self, parse_deadline, on_error=None, state_path=None):
+        self.parse_deadline = parse_deadline
+        self.on_error = on_error
+        self.state = IcsState(state_path) if state_path else None
+        self.version = None
+        self.last_modified = None
+        self._events = {}
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, tasks, version):
+        """Обновляет события, если версия данных изменилась. Возвращает True при пересчёте."""
+        with self._lock:
+            if version == self.version:
+                return False
+            now = datetime.now(timezone.utc).replace(microsecond=0)
+            stamp = utc_stamp(now)
+            known_events = self.state.events if self.state is not None else self._events
+            events = {}
+            changed = False
+            for task in tasks:
+                if not task["deadline"]:
+                    continue
+                try:
+                    deadline = self.parse_deadline(task["deadline"])
+                except ValueError:
+                    if self.on_error:
+                        self.on_error(task)
+                    continue
+                uid = task_uid(task)
+                body = event_body(task, deadline)
+                digest = content_hash(body)
+                cached = self._events.get(uid)
+                if cached is not None and cached["hash"] == digest:
+                    events[uid] = cached
+                    continue
+                known = known_events.get(uid)
+                if known is not None and known["hash"] == digest:
+                    dtstamp, sequence = known["dtstamp"], known["sequence"]
+                else:
+                    dtstamp, sequence = stamp, known["sequence"] + 1 if known is not None else 0
+                    changed = True
+                events[uid] = {
+                    "hash": digest,
+                    "dtstamp": dtstamp,
+                    "sequence": sequence,
+                    "category": task["category"],
+                    "tags": frozenset(task["tags"]),
+                    "block": render_event(uid, body, dtstamp, sequence),
+                }
+            changed = changed or bool(known_events.keys() - events.keys())  # отменённые события
+            if self.state is not None and changed:
+                self.state.events = {uid: {key: event[key] for key in ("hash", "dtstamp", "sequence")}
+                                     for uid, event in events.items()}
+                self.state.save()
+            self._events = events
+            self._rendered = {}
+            self.version = version
+            if changed or self.last_modified is None:
+                # Без изменений (например, после перезапуска) — время последнего изменения события
+                self.last_modified = now if changed or not events else max(
+                    datetime.strptime(event["dtstamp"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+                    for event in events.values())
+            return True
+
+    def render(self, category=None, tag=None):
+        """Возвращает (тело календаря, ETag) для заданных фильтров."""
+        with self._lock:
+            key = (category, tag)
+            cached = self._rendered.get(key)
+            if cached is None:
+                blocks = [event["block"] for event in self._events.values()
+                          if (not category or event["category"] == category) and (not tag or tag in event["tags"])]
+                body = render_calendar(blocks)
+                cached = self._rendered[key] = (body, hashlib.sha1(body.encode("utf-8")).hexdigest())
+            return cached
@@ -0,0 +1,215 @@
+"""Потоковое чтение задач из JSON без загрузки всего файла в память.
+
+Поддерживаются два формата, определяемые по первому символу:
+    [ {...}, {...} ]   — JSON-массив, разбирается кусками по CHUNK_SIZE символов
+    {...}\\n{...}\\n     — JSON-строки (по одной задаче на строку)
+"""
+import json
+import re
+
+from task_subtasks import normalize_subtasks
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = re.compile(r"\s*")
+_DECODER = json.JSONDecoder()
+_TASK_ID = re.compile(r"[^|,\s]+")
+
+TASK_DEFAULTS = {
+    "done": False,
+    "category": "Без категории",
+    "priority": "средний",
+    "deadline": "",
+    "tags": [],
+    "repeat": "",
+    "subtasks": [],
+}
+
+
+def _first_char(f):
+    """Пропускает пробельные символы и возвращает первый значимый символ ('' в конце файла)."""
+    while True:
+        ch = f.read(1)
+        if not ch or not ch.isspace():
+            return ch
+
+
+def iter_json_lines(f, first_line=""):
+    """Итерирует записи из файла JSON-строк."""
+    if first_line.strip():
+        yield json.loads(first_line)
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """Итерирует элементы JSON-массива, читая файл кусками (открывающая '[' уже прочитана)."""
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def next_char():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                raise ValueError("Неожиданный конец JSON-массива")
+            fill()
+
+    if next_char() == "]":
+        return
+    while True:
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                # Значение могло оборваться на границе куска (например, число) — дочитываем
+                fill()
+                continue
+            break
+        pos = end
+        yield value
+        ch = next_char()
+        pos += 1
+        if ch == "]":
+            return
+        if ch != ",":
+            raise ValueError(f"Ожидалась ',' или ']' в JSON-массиве, получено {ch!r}")
+        next_char()
+
+
+def iter_json_records(f, chunk_size=CHUNK_SIZE):
+    """Определяет формат (массив или JSON-строки) и итерирует записи."""
+    ch = _first_char(f)
+    if not ch:
+        return iter(())
+    if ch == "[":
+        return iter_json_array(f, chunk_size)
+    return iter_json_lines(f, ch + f.readline())
+
+
+def normalize_task(record):
+    """Проверяет запись задачи и дополняет её значениями по умолчанию."""
+    if not isinstance(record, dict) or not isinstance(record.get("text"), str):
+        raise ValueError("Неверный формат задачи")
+    text = record["text"].strip()
+    if not text or "|" in text or "\n" in text:
+        raise ValueError(f"Недопустимый текст задачи: {text!r}")
+    task = {key: record.get(key, default) for key, default in TASK_DEFAULTS.items()}
+    task["text"] = text
+    for key in ("category", "priority", "deadline", "repeat"):
+        if not isinstance(task[key], str) or "|" in task[key] or "\n" in task[key]:
+            raise ValueError(f"Недопустимое значение поля {key}: {task[key]!r}")
+    if isinstance(task["tags"], str):
+        task["tags"] = [tag.strip() for tag in task["tags"].split(",") if tag.strip()]
+    if not isinstance(task["tags"], list) or not isinstance(task["subtasks"], list):
+        raise ValueError("Поля tags и subtasks должны быть списками")
+    for tag in task["tags"]:
+        # Теги пишутся в строку файла через запятую
+        if not isinstance(tag, str) or not tag or set(tag) & set("|,\n"):
+            raise ValueError(f"Недопустимый тег: {tag!r}")
+    task["tags"] = list(task["tags"])
+    task["subtasks"] = normalize_subtasks(task["subtasks"])
+    if record.get("id") is not None:
+        # id пишется в строку файла как есть и сохраняется при импорте, если не занят
+        if not isinstance(record["id"], str) or not _TASK_ID.fullmatch(record["id"]):
+            raise ValueError(f"Недопустимый id задачи: {record['id']!r}")
+        task["id"] = record["id"]
+    if "blocked_by" in record:
+        blocked_by = record["blocked_by"]
+        if not isinstance(blocked_by, list) or not all(isinstance(t, str) and _TASK_ID.fullmatch(t) for t in blocked_by):
+            raise ValueError("Поле blocked_by должно быть списком id задач")
+        task["blocked_by"] = list(blocked_by)
+    # Неизвестные поля записи не копируются: в файле задач для них нет места
+    return {key: task.pop(key) for key in ("done", "category", "text", "priority", "deadline", "tags", "repeat", "subtasks")} | task
+
+
+# Форматы экспорта: pretty — как раньше (indent=2), json — компактный массив
+# (одна задача на строку), jsonl — JSON-строки без обрамляющего массива
+EXPORT_FORMATS = ("json", "jsonl", "pretty")
+COMPRESSIONS = ("gzip", "zstd")
+WRITE_BATCH = 1000
+
+
+def detect_compression(path):
+    """Определяет сжатие по расширению файла (.gz / .zst)."""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst") or path.endswith(".zstd"):
+        return "zstd"
+    return None
+
+
+def open_text_output(path, compression=None):
+    """Открывает файл для записи текста, при необходимости со сжатием gzip/zstd."""
+    if compression is None:
+        return open(path, "w", encoding="utf-8")
+    if compression == "gzip":
+        import gzip
+        # Уровень 6 заметно быстрее 9 при почти том же размере
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Для сжатия zstd нужен пакет zstandard (pip install zstandard)")
+        import io
+        raw = open(path, "wb")
+        writer = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, encoding="utf-8")
+    raise ValueError(f"Неизвестное сжатие: {compression}")
+
+
+def write_json_records(records, f, fmt="json"):
+    """Пишет записи потоком, сбрасывая буфер каждые WRITE_BATCH записей. Возвращает их число."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+    if fmt == "pretty":
+        encode = json.JSONEncoder(ensure_ascii=False, indent=2).encode
+        encoded = ("  " + encode(record).replace("\n", "\n  ") for record in records)
+    else:
+        encoded = map(json.JSONEncoder(ensure_ascii=False).encode, records)
+    separator = "\n" if fmt == "jsonl" else ",\n"
+    prefix = "" if fmt == "jsonl" else "\n"
+    count = 0
+    chunk = []
+    if fmt != "jsonl":
+        f.write("[")
+    for line in encoded:
+        chunk.append(line)
+        count += 1
+        if len(chunk) >= WRITE_BATCH:
+            f.write(prefix + separator.join(chunk))
+            prefix = separator
+            chunk.clear()
+    if chunk:
+        f.write(prefix + separator.join(chunk))
+    if fmt == "jsonl":
+        if count:
+            f.write("\n")
+    else:
+        f.write("\n]" if count else "]")
+    return count
+
+
+def export_json(records, path, fmt="json", compression="auto"):
+    """Экспортирует итерируемые записи в файл; сжатие "auto" выбирается по расширению."""
+    if compression == "auto":
+        compression = detect_compression(path)
+    with open_text_output(path, compression) as f:
+        return write_json_records(records, f, fmt)
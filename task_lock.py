@@ -0,0 +1,134 @@
+"""Согласованный доступ нескольких процессов к файлу задач.
+
+Рядом с файлом задач лежит файл блокировки <файл>.lock. Запись файла задач
+выполняется под эксклюзивной рекомендательной блокировкой (fcntl.flock или
+msvcrt.locking в Windows); в самом .lock хранится счётчик поколений, который
+увеличивается при каждой записи. Процесс запоминает версию файла (inode,
+mtime, размер) и поколение при загрузке и перечитывает файл, только если
+одно из них изменилось; перед записью чужие изменения сливаются со своими.
+"""
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT = 10.0
+
+
+def lock_path(path):
+    return path + ".lock"
+
+
+def file_version(path):
+    """Версия файла: (inode, mtime в нс, размер) или None, если файла нет."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def read_generation(path):
+    """Текущее поколение файла задач (0, если он ещё не записывался под блокировкой)."""
+    try:
+        with open(lock_path(path), "r", encoding="ascii") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+class FileLock:
+    """Эксклюзивная блокировка файла задач; повторный вход в том же объекте допускается."""
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = lock_path(path)
+        self.timeout = timeout
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        if self._depth:
+            self._depth += 1
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        delay = 0.005
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"Файл задач занят другим процессом ({self.path})")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+        self._fd = fd
+        self._depth = 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def bump_generation(self):
+        """Увеличивает счётчик поколений (только под блокировкой); возвращает новое значение."""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        data = os.read(self._fd, 32).strip()
+        generation = (int(data) if data.isdigit() else 0) + 1
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, str(generation).encode("ascii").ljust(20) + b"\n")
+        return generation
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def write_atomic(path, lines):
+    """Пишет строки во временный файл и заменяет им path (читатели не видят полузаписанный файл)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def merge_tasks(disk_tasks, local_tasks, changed, removed, key):
+    """Накладывает локальные изменения на версию файла, записанную другим процессом.
+
+    changed — ключи задач, изменённых или добавленных локально, removed — удалённых.
+    Остальные задачи берутся с диска; порядок — как в файле, новые локальные в конце.
+    """
+    pending = {key(task): task for task in local_tasks if key(task) in changed}
+    merged = []
+    for task in disk_tasks:
+        k = key(task)
+        if k in removed:
+            continue
+        merged.append(pending.pop(k, task))
+    merged.extend(task for task in local_tasks if key(task) in pending)
+    return merged
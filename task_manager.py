@@ -1,126 +1,754 @@
 import os
+import sys
 import json
-import logging
-from datetime import datetime, timedelta
-import configparser
-try:
-    from colorama import init, Fore, Style
-    init()
-    COLORAMA_AVAILABLE = True
-except ImportError:
-    COLORAMA_AVAILABLE = False
-
-# Настройка логирования
-logging.basicConfig(filename="errors.log", level=logging.ERROR, encoding="utf-8")
+import hashlib
+import threading
+import uuid
+from functools import lru_cache
+import re
+import heapq
+from bisect import bisect_left, insort
+from datetime import date, time, timedelta
+from task_metrics import METRICS, configure as configure_metrics, timed, run_profiled
+from task_io import iter_json_records, normalize_task, export_json
+from task_ics import export_incremental
+from task_dates import parse_date, try_parse_date, normalize_date
+from task_render import Output, render_task, set_color
+from task_stats import TaskStats, FIELDS as STATS_FIELDS
+from task_deps import DependencyGraph
+from task_history import CompletionHistory
+from task_subtasks import (SubtaskTree, normalize_subtasks, iter_nodes, iter_numbered, leaf_counts,
+                           reset_subtasks, append_journal, read_journal, journal_path)
+from task_snapshot import load_snapshot, write_snapshot
+from task_archive import ArchiveReader, trigram_path
+from task_lock import FileLock, file_version, read_generation, write_atomic, merge_tasks
+from task_recurrence import parse_rule, format_rule, advance, iter_occurrences, restart, skip as skip_rule, EXAMPLES as RECURRENCE_EXAMPLES
 
 # Конфигурация
 CONFIG_FILE = "config.ini"
+LOG_FILE = "errors.log"
 FILENAME = "todo.txt"
 ARCHIVE_FILENAME = "archive.txt"
+DATE_FORMAT = "%Y-%m-%d"
+PRIORITIES = ["высокий", "средний", "низкий"]
+PRIORITY_RANK = {"высокий": 1, "средний": 2, "низкий": 3}
+NO_DEADLINE = date.max.toordinal()
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_TOP_K = 10
+IMPORT_BATCH_SIZE = 10000
+BULK_REINDEX_THRESHOLD = 1000
+PARALLEL_LOAD_MB = 64  # меньшие файлы быстрее читать в одном процессе
+PARALLEL_QUERY_MIN = 200000  # задач; на меньших списках запуск процессов дороже самого запроса
+TREND_PERIODS = {"day": "день", "week": "неделя", "month": "месяц"}
+TREND_DIMENSIONS = {"category": "категория", "priority": "приоритет", "tag": "тег"}
+
+# Всё, что имеет побочные эффекты (логирование, чтение config.ini),
+# выполняется лениво при первом использовании, а не при импорте модуля.
+_logging_ready = False
 
 def load_config():
     """Загружает конфигурацию из config.ini."""
+    import configparser
     config = configparser.ConfigParser(interpolation=None)  # Отключаем интерполяцию
     config.read(CONFIG_FILE)  # Читаем файл, если он есть
-    config.set("DEFAULT", "date_format", "%Y-%m-%d")  # Устанавливаем через set()
+    config.set("DEFAULT", "date_format", DATE_FORMAT)  # Устанавливаем через set()
+    return config
+
+@lru_cache(maxsize=None)
+def get_config():
+    """Читает config.ini при первом обращении и настраивает метрики."""
+    config = load_config()
+    configure_metrics(config)
     return config
 
-CONFIG = load_config()
-DATE_FORMAT = CONFIG["DEFAULT"]["date_format"]
+def log_error(message):
+    """Пишет ошибку в errors.log, настраивая логирование при первом вызове."""
+    import logging
+    global _logging_ready
+    if not _logging_ready:
+        logging.basicConfig(filename=LOG_FILE, level=logging.ERROR, encoding="utf-8")
+        _logging_ready = True
+    logging.error(message)
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+
+def parse_task_line(line):
+    """Разбирает строку файла задач в словарь; при ошибке формата бросает ValueError."""
+    parts = line.strip().split("|")
+    if len(parts) < 4:
+        raise ValueError("Неверный формат строки")
+    status, category, text, priority = parts[:4]
+    deadline = parts[4] if len(parts) > 4 else ""
+    tags = parts[5].split(",") if len(parts) > 5 and parts[5] else []
+    repeat = parts[6] if len(parts) > 6 else ""
+    subtasks = json.loads(parts[7]) if len(parts) > 7 and parts[7] else []
+    if deadline and not _ISO_DATE.match(deadline):
+        # Даты в других форматах приводим к ГГГГ-ММ-ДД, нераспознанные оставляем как есть
+        parsed = try_parse_date(deadline)
+        deadline = parsed.isoformat() if parsed else deadline
+    task_id = parts[8] if len(parts) > 8 else ""
+    blocked_by = parts[9].split(",") if len(parts) > 9 and parts[9] else []
+    task = {
+        "done": status == "1",
+        "category": category,
+        "text": text,
+        "priority": priority,
+        "deadline": deadline,
+        "tags": tags,
+        "repeat": repeat,
+        "subtasks": subtasks
+    }
+    if task_id:
+        task["id"] = task_id
+    if blocked_by:
+        task["blocked_by"] = blocked_by
+    return task
+
+def new_task_id():
+    """Генерирует постоянный идентификатор задачи."""
+    return uuid.uuid4().hex[:16]
+
+def legacy_task_id(line, seen):
+    """Строит id для строки старого формата по её содержимому (seen — уже выданные id)."""
+    digest = hashlib.sha1(line.strip().encode("utf-8")).hexdigest()
+    task_id, n = digest[:16], 0
+    while task_id in seen:
+        n += 1
+        task_id = hashlib.sha1(f"{digest}:{n}".encode("utf-8")).hexdigest()[:16]
+    seen.add(task_id)
+    return task_id
+
+def format_task_line(task):
+    """Превращает задачу в строку файла задач (с переводом строки)."""
+    status = "1" if task["done"] else "0"
+    tags = ",".join(task["tags"])
+    subtasks = json.dumps(task["subtasks"], ensure_ascii=False)
+    # Зависимости — необязательное десятое поле: строки задач без них не меняются
+    blocked_by = f"|{','.join(task['blocked_by'])}" if task.get("blocked_by") else ""
+    return f"{status}|{task['category']}|{task['text']}|{task['priority']}|{task['deadline']}|{tags}|{task['repeat']}|{subtasks}|{task.get('id', '')}{blocked_by}\n"
+
+def get_page_size():
+    """Размер страницы вывода из config.ini ([display] page_size)."""
+    return max(1, get_config().getint("display", "page_size", fallback=DEFAULT_PAGE_SIZE))
+
+def get_parallel_load_threshold():
+    """Размер файла в байтах, начиная с которого он разбирается в нескольких процессах."""
+    megabytes = get_config().getint("performance", "parallel_load_mb", fallback=PARALLEL_LOAD_MB)
+    return max(0, megabytes) << 20
+
+def get_parallel_query_threshold():
+    """Число задач, начиная с которого фильтры и статистика считаются в нескольких процессах."""
+    return get_config().getint("performance", "parallel_query_min", fallback=PARALLEL_QUERY_MIN)
+
+def make_predicate(today, category=None, priority=None, tag=None, only_overdue=False, only_urgent=False, search_text=None):
+    """Собирает проверку задачи по всем критериям (None, если критериев нет)."""
+    checks = []
+    if category:
+        checks.append(lambda t: t["category"] == category)
+    if priority:
+        checks.append(lambda t: t["priority"] == priority)
+    if tag:
+        checks.append(lambda t: tag in t["tags"])
+    if only_overdue or only_urgent:
+        soon = today + timedelta(days=1)
+
+        def deadline_of(t):
+            return try_parse_date(t["deadline"]) if t["deadline"] else None
+        if only_overdue:
+            checks.append(lambda t: (d := deadline_of(t)) is not None and d < today)
+        if only_urgent:
+            checks.append(lambda t: (d := deadline_of(t)) is not None and today <= d <= soon)
+    if search_text:
+        needle = search_text.lower()
+        checks.append(lambda t: needle in t["text"].lower() or any(needle in st["text"].lower() for st in iter_nodes(t["subtasks"])))
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda t: all(check(t) for check in checks)
+
+def filter_shard(tasks, today, filters):
+    """Номера задач части списка, подходящих под фильтры (выполняется в рабочем процессе)."""
+    predicate = make_predicate(today, **filters)
+    return [i for i, task in enumerate(tasks) if predicate(task)]
+
+def stats_shard(tasks, today):
+    """Частичные суммы статистики по части списка: всего, выполнено, просрочено, срочно, подзадач, выполнено подзадач."""
+    done = overdue = urgent = sub_total = sub_done = 0
+    soon = today + timedelta(days=1)
+    for task in tasks:
+        if task["done"]:
+            done += 1
+        if task["deadline"]:
+            deadline = try_parse_date(task["deadline"])
+            if deadline is not None:
+                if deadline < today:
+                    overdue += 1
+                elif deadline <= soon and not task["done"]:
+                    urgent += 1
+        if task["subtasks"]:
+            leaves_done, leaves = leaf_counts(task["subtasks"])
+            sub_total += leaves
+            sub_done += leaves_done
+    return len(tasks), done, overdue, urgent, sub_total, sub_done
+
+def paginate(items, page, page_size):
+    """Берёт из потока элементов страницу page и считает их общее число за один проход."""
+    start = (page - 1) * page_size
+    stop = start + page_size
+    shown = []
+    total = 0
+    for item in items:
+        if start <= total < stop:
+            shown.append(item)
+        total += 1
+    return shown, total
+
+class TaskOrder:
+    """Отсортированный список ключей (ключ сортировки + порядковый номер) с точечным обновлением.
+
+    Номер задаёт устойчивость (порядок добавления) и ведёт к самой задаче,
+    поэтому вставка и удаление — это bisect по списку кортежей без пересортировки.
+    """
+
+    def __init__(self, tasks, sort_key):
+        self.sort_key = sort_key
+        self.keys = []
+        self.by_seq = {}
+        self.key_of = {}
+        for seq, task in enumerate(tasks):
+            key = sort_key(task) + (seq,)
+            self.keys.append(key)
+            self.by_seq[seq] = task
+            self.key_of[id(task)] = key
+        self.keys.sort()
+        self.next_seq = len(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def insert(self, task, seq=None):
+        if seq is None:
+            seq = self.next_seq
+            self.next_seq += 1
+        key = self.sort_key(task) + (seq,)
+        insort(self.keys, key)
+        self.by_seq[seq] = task
+        self.key_of[id(task)] = key
+
+    def remove(self, task):
+        """Удаляет задачу; возвращает её номер или None, если задачи нет в порядке."""
+        key = self.key_of.pop(id(task), None)
+        if key is None:
+            return None
+        del self.keys[bisect_left(self.keys, key)]
+        del self.by_seq[key[-1]]
+        return key[-1]
+
+    def update(self, task):
+        """Переставляет задачу, если её ключ изменился; False — задачи нет в порядке."""
+        key = self.key_of.get(id(task))
+        if key is None:
+            return False
+        if key[:-1] != self.sort_key(task):
+            self.insert(task, self.remove(task))
+        return True
+
+    def tasks(self):
+        by_seq = self.by_seq
+        return [by_seq[key[-1]] for key in self.keys]
 
 class TaskManager:
     """Класс для управления задачами с поддержкой категорий, приоритетов, дедлайнов, тегов, подзадач и повторений."""
     
-    def __init__(self):
-        self.tasks = self.load_tasks(FILENAME)
-        self.categories = set(task["category"] for task in self.tasks if task["category"])
-        self.show_notifications()
+    def __init__(self, filename=FILENAME, archive_filename=ARCHIVE_FILENAME, background=False):
+        get_config()
+        self.filename = filename
+        self.archive_filename = archive_filename
+        self._tasks = None
+        self._categories = None
+        self._by_text = None
+        self._by_id = None
+        self._order = None
+        self._stats = None
+        self._deps = None
+        self.scheduler = None  # планировщик уведомлений, если запущен (start_notifications)
+        self._ids_assigned = False
+        self._load_lock = threading.Lock()
+        # Согласование с другими процессами: блокировка записи, версия и поколение файла
+        # на момент последней синхронизации и локальные изменения, ещё не записанные в файл
+        self._file_lock = FileLock(filename)
+        self._version = None
+        self._generation = 0
+        self._changed = set()
+        self._removed = set()
+        self._line_ids = None  # строка файла -> id задачи, для поиска изменений (sync_from_disk)
+        self._subtrees = {}  # id задачи -> SubtaskTree (строится при первом обращении)
+        self._journal = None  # (inode, смещение) прочитанной части журнала отметок подзадач
+        # Журнал выполнений и сводки для отчётов; изменения записываются вместе с файлом задач
+        self.history = CompletionHistory(filename, self._file_lock)
+        if background:
+            # Загружаем задачи в фоне, пока пользователь смотрит на меню
+            threading.Thread(target=self._ensure_loaded, daemon=True).start()
 
+    def _ensure_loaded(self):
+        """Загружает задачи из файла при первом обращении."""
+        if self._tasks is None:
+            with self._load_lock:
+                if self._tasks is None:
+                    version, generation = file_version(self.filename), read_generation(self.filename)
+                    tasks = None
+                    if version is not None:
+                        with METRICS.timed("load_snapshot"):
+                            tasks = load_snapshot(self.filename, version)
+                    self._tasks = tasks if tasks is not None else self.load_tasks(self.filename)
+                    self._version, self._generation = version, generation
+                    self._replay_journal()
+        return self._tasks
+
+    @property
+    def tasks(self):
+        tasks = self._tasks
+        return tasks if tasks is not None else self._ensure_loaded()
+
+    @tasks.setter
+    def tasks(self, value):
+        self._tasks = value
+        self._invalidate_indexes()
+        self._stats = None
+        self._deps = None
+        self._subtrees = {}
+        if self.scheduler is not None:
+            self.scheduler.rebuild()
+
+    @property
+    def categories(self):
+        if self._categories is None:
+            self._categories = set(task["category"] for task in self.tasks if task["category"])
+        return self._categories
+
+    @categories.setter
+    def categories(self, value):
+        self._categories = value
+
+    def _invalidate_indexes(self):
+        """Сбрасывает индексы после массовой замены списка задач."""
+        self._by_text = None
+        self._by_id = None
+        self._order = None
+
+    def _sort_key(self, task):
+        """Ключ сортировки списка: (дедлайн, приоритет, выполнена)."""
+        deadline = try_parse_date(task["deadline"])
+        return (deadline.toordinal() if deadline else NO_DEADLINE, PRIORITY_RANK.get(task["priority"], 3), task["done"])
+
+    def _order_index(self):
+        """Материализованный порядок вывода (строится один раз, дальше обновляется точечно)."""
+        if self._order is None or len(self._order) != len(self.tasks):
+            self._order = TaskOrder(self.tasks, self._sort_key)
+        return self._order
+
+    def _index_insert(self, task):
+        """Добавляет задачу в порядок вывода и счётчики статистики."""
+        if self._order is not None:
+            self._order.insert(task)
+        if self._stats is not None:
+            self._stats.add(task)
+        if self._deps is not None:
+            self._deps.add(task)
+        if self.scheduler is not None:
+            self.scheduler.task_changed(task)
+
+    def _index_remove(self, task):
+        if self._order is not None and self._order.remove(task) is None:
+            self._order = None
+        if self._stats is not None:
+            self._stats.remove(task)
+        if self._deps is not None:
+            self._deps.remove(task)
+
+    def _index_update(self, task):
+        """Переставляет задачу и обновляет статистику после изменения дедлайна, приоритета, статуса или подзадач.
+
+        Возвращает задачи, которые перестали быть заблокированными (если граф зависимостей построен).
+        """
+        if self._order is not None and not self._order.update(task):
+            self._order = None
+        if self._stats is not None:
+            self._stats.update(task)
+        if self.scheduler is not None:
+            self.scheduler.task_changed(task)
+        return self._deps.update(task) if self._deps is not None else []
+
+    def _stats_index(self):
+        """Счётчики статистики (строятся один раз, дальше обновляются точечно)."""
+        if self._stats is None:
+            self._stats = TaskStats(self.tasks)
+        return self._stats
+
+    def _dep_index(self):
+        """Граф зависимостей (строится один раз, дальше обновляется точечно)."""
+        if self._deps is None:
+            self._deps = DependencyGraph(self.tasks)
+        return self._deps
+
+    def ordered_tasks(self):
+        """Все задачи в порядке вывода (без сортировки на каждый вызов)."""
+        return self._order_index().tasks()
+
+    def _text_index(self):
+        """Индекс текст -> список задач с таким текстом (строится лениво)."""
+        if self._by_text is None:
+            index = {}
+            for task in self.tasks:
+                index.setdefault(task["text"], []).append(task)
+            self._by_text = index
+        return self._by_text
+
+    def _id_index(self):
+        """Индекс id -> задача (строится лениво)."""
+        if self._by_id is None:
+            self._by_id = {task["id"]: task for task in self.tasks if "id" in task}
+        return self._by_id
+
+    def get_task(self, task_id):
+        """Возвращает задачу по постоянному id или None."""
+        return self._id_index().get(task_id)
+
+    def _append_task(self, task):
+        """Добавляет задачу в список и обновляет индексы."""
+        by_id = self._id_index()
+        if not task.get("id") or task["id"] in by_id:
+            task["id"] = new_task_id()
+        self.tasks.append(task)
+        by_id[task["id"]] = task
+        self._touch(task)
+        self._index_insert(task)
+        if self._by_text is not None:
+            self._by_text.setdefault(task["text"], []).append(task)
+        if task["category"]:
+            self.categories.add(task["category"])
+
+    def _forget_text(self, task):
+        """Удаляет задачу из текстового индекса."""
+        if self._by_text is None:
+            return
+        same = self._by_text.get(task["text"], [])
+        for i, t in enumerate(same):
+            if t is task:
+                del same[i]
+                break
+        if not same:
+            self._by_text.pop(task["text"], None)
+
+    def find_task(self, text):
+        """Ищет задачу по тексту: сначала невыполненную, иначе любую."""
+        same = self._text_index().get(text)
+        if not same:
+            return None
+        return next((t for t in same if not t["done"]), same[0])
+
+    def save(self):
+        """Сохраняет задачи в основной файл, сливая их с изменениями других процессов."""
+        with self._file_lock:
+            if self._tasks is not None and self.disk_changed():
+                self._merge_from_disk()
+            self.save_tasks(self.filename, self.tasks)
+            # Отметки из журнала теперь в самом файле: журнал больше не нужен
+            if os.path.exists(journal_path(self.filename)):
+                os.remove(journal_path(self.filename))
+            self._journal = None
+            self._synced()
+            self.history.flush()
+        self._line_ids = None
+        self._changed.clear()
+        self._removed.clear()
+        self._ids_assigned = False
+
+    def write_snapshot(self):
+        """Пишет двоичный снимок задач для быстрого следующего запуска (при штатном завершении).
+
+        Снимок пишется, только если задачи совпадают с текстовым файлом; возвращает True при записи.
+        """
+        if self._tasks is None:
+            return False
+        if self._ids_assigned:
+            self.save()  # в снимке те же id, что и в файле
+        with self._file_lock:
+            if self._changed or self._removed or self.disk_changed():
+                return False
+            try:
+                write_snapshot(self.filename, self.tasks, self._version)
+            except (OSError, ValueError) as e:
+                log_error(f"Ошибка записи снимка задач: {str(e)}")
+                return False
+        return True
+
+    def disk_changed(self):
+        """Изменил ли файл кто-то другой с момента последней синхронизации (только stat и .lock)."""
+        return file_version(self.filename) != self._version or read_generation(self.filename) != self._generation
+
+    def refresh(self):
+        """Перечитывает файл, если его изменил другой процесс; несохранённые изменения сохраняются.
+
+        Возвращает True, если задачи были перечитаны.
+        """
+        return self.sync_from_disk() is not None
+
+    def sync_from_disk(self):
+        """Применяет к задачам только то, что изменили в файле другие процессы.
+
+        Разбираются лишь строки, которых не было при прошлой синхронизации; задачи
+        меняются на месте, поэтому ссылки на них (например, строки в GUI) остаются
+        верными. Несохранённые локальные изменения не перезаписываются.
+        Возвращает (добавленные, изменённые, удалённые) или None, если файл не менялся.
+        """
+        if self._tasks is None or not self.disk_changed():
+            return None
+        with self._file_lock:
+            version, generation = file_version(self.filename), read_generation(self.filename)
+            try:
+                with open(self.filename, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                lines = []
+        if self._line_ids is None:
+            self._line_ids = {format_task_line(task): task["id"] for task in self.tasks}
+        known = self._line_ids
+        by_id = self._id_index()
+        line_ids, seen, legacy_ids = {}, set(), set()
+        added, updated = [], []
+        for line in lines:
+            task_id = known.get(line)
+            if task_id is None or task_id not in by_id:
+                try:
+                    task = parse_task_line(line)
+                except Exception as e:
+                    log_error(f"Ошибка загрузки строки: {line.strip()}, {str(e)}")
+                    continue
+                task.setdefault("id", legacy_task_id(line, legacy_ids))
+                task_id = task["id"]
+                current = by_id.get(task_id)
+                if task_id in self._removed:
+                    pass
+                elif current is None:
+                    added.append(task)
+                elif task_id not in self._changed and current != task:
+                    self._replace_fields(current, task)
+                    updated.append(current)
+            line_ids[line] = task_id
+            seen.add(task_id)
+        removed = [task for task in self.tasks if task["id"] not in seen and task["id"] not in self._changed]
+        if removed:
+            gone = set(map(id, removed))
+            self.tasks[:] = [task for task in self.tasks if id(task) not in gone]
+            for task in removed:
+                self._forget_text(task)
+                self._index_remove(task)
+                by_id.pop(task["id"], None)
+        for task in added:
+            self.tasks.append(task)
+            by_id[task["id"]] = task
+            self._index_insert(task)
+            if self._by_text is not None:
+                self._by_text.setdefault(task["text"], []).append(task)
+            if task["category"]:
+                self.categories.add(task["category"])
+        self._line_ids = line_ids
+        self._version, self._generation = version, generation
+        # Отметки подзадач из журнала; задачи, перечитанные из файла, получают журнал целиком
+        updated_ids = {task["id"] for task in updated}
+        for task in self._replay_journal(from_start=bool(added or updated)):
+            if task["id"] not in updated_ids:
+                updated_ids.add(task["id"])
+                updated.append(task)
+        return added, updated, removed
+
+    def _replace_fields(self, task, new):
+        """Заменяет поля задачи на месте, поддерживая индексы."""
+        if new["text"] != task["text"]:
+            self._forget_text(task)
+            if self._by_text is not None:
+                self._by_text.setdefault(new["text"], []).append(task)
+        task.clear()
+        task.update(new)
+        self._subtrees.pop(task.get("id"), None)
+        if task["category"]:
+            self.categories.add(task["category"])
+        self._index_update(task)
+
+    def _merge_from_disk(self):
+        """Накладывает локальные изменения на задачи из файла (вызывается под блокировкой)."""
+        disk_tasks = self.load_tasks(self.filename)
+        entries, _, _ = read_journal(self.filename)
+        self._apply_journal(entries, {task["id"]: task for task in disk_tasks}, trees={})
+        self.tasks = merge_tasks(disk_tasks, self.tasks, self._changed, self._removed, key=lambda t: t.get("id"))
+        self._categories = None
+        self._line_ids = None
+
+    def _synced(self):
+        """Отмечает запись файла: новое поколение и версия (вызывается под блокировкой)."""
+        self._generation = self._file_lock.bump_generation()
+        self._version = file_version(self.filename)
+
+    def _append_batch(self, tasks):
+        """Дописывает новые задачи в файл под блокировкой."""
+        with self._file_lock:
+            stale = self.disk_changed()
+            self.append_tasks(self.filename, tasks)
+            if stale:
+                # Файл менял кто-то ещё: версию не обновляем, чтобы refresh() его перечитал
+                self._file_lock.bump_generation()
+            else:
+                self._synced()
+        for task in tasks:
+            self._changed.discard(task["id"])
+
+    def _touch(self, task):
+        """Запоминает задачу как изменённую локально (для слияния при записи)."""
+        self._changed.add(task.get("id"))
+
+    def _forget(self, task):
+        """Запоминает задачу как удалённую локально."""
+        self._changed.discard(task.get("id"))
+        self._removed.add(task.get("id"))
+
+    @timed("load", count_items=True)
     def load_tasks(self, filename):
         """Загружает задачи из текстового файла."""
         tasks = []
+        legacy_ids = set()
+        if os.path.exists(filename) and os.path.getsize(filename) >= get_parallel_load_threshold():
+            return self._load_tasks_parallel(filename)
         if os.path.exists(filename):
             with open(filename, "r", encoding="utf-8") as f:
                 for line in f:
                     try:
-                        parts = line.strip().split("|")
-                        if len(parts) < 4:
-                            raise ValueError("Неверный формат строки")
-                        status, category, text, priority = parts[:4]
-                        deadline = parts[4] if len(parts) > 4 else ""
-                        tags = parts[5].split(",") if len(parts) > 5 and parts[5] else []
-                        repeat = parts[6] if len(parts) > 6 else ""
-                        subtasks = json.loads(parts[7]) if len(parts) > 7 and parts[7] else []
-                        tasks.append({
-                            "done": status == "1",
-                            "category": category,
-                            "text": text,
-                            "priority": priority,
-                            "deadline": deadline,
-                            "tags": tags,
-                            "repeat": repeat,
-                            "subtasks": subtasks
-                        })
+                        task = parse_task_line(line)
+                        if "id" not in task:
+                            # Старые строки без id получают детерминированный id, который
+                            # не меняется между запусками и сохраняется при первой записи
+                            task["id"] = legacy_task_id(line, legacy_ids)
+                            if filename == self.filename:
+                                self._ids_assigned = True
+                        tasks.append(task)
                     except Exception as e:
-                        logging.error(f"Ошибка загрузки строки: {line.strip()}, {str(e)}")
+                        log_error(f"Ошибка загрузки строки: {line.strip()}, {str(e)}")
+        return tasks
+
+    def _load_tasks_parallel(self, filename):
+        """Разбирает большой файл по частям в нескольких процессах и склеивает задачи по порядку."""
+        from task_parallel import parse_file
+        tasks = []
+        legacy_ids = set()
+        workers = get_config().getint("performance", "load_workers", fallback=0)
+        for chunk, legacy, errors in parse_file(filename, parse_task_line, workers):
+            for line, error in errors:
+                log_error(f"Ошибка загрузки строки: {line.strip()}, {error}")
+            for i, line in legacy:
+                chunk[i]["id"] = legacy_task_id(line, legacy_ids)
+            if legacy and filename == self.filename:
+                self._ids_assigned = True
+            tasks.extend(chunk)
         return tasks
 
+    def load_archive(self):
+        """Загружает весь архив задач (большой архив разбирается параллельно)."""
+        return self.load_tasks(self.archive_filename)
+
+    @timed("save")
     def save_tasks(self, filename, tasks):
-        """Сохраняет задачи в текстовый файл."""
-        with open(filename, "w", encoding="utf-8") as f:
-            for task in tasks:
-                status = "1" if task["done"] else "0"
-                tags = ",".join(task["tags"])
-                subtasks = json.dumps(task["subtasks"], ensure_ascii=False)
-                f.write(f"{status}|{task['category']}|{task['text']}|{task['priority']}|{task['deadline']}|{tags}|{task['repeat']}|{subtasks}\n")
+        """Сохраняет задачи в текстовый файл (через временный файл и атомарную замену)."""
+        write_atomic(filename, (format_task_line(task) for task in tasks))
+
+    @timed("append")
+    def append_tasks(self, filename, tasks):
+        """Дописывает задачи в конец файла, не перезаписывая его."""
+        with open(filename, "a", encoding="utf-8") as f:
+            f.writelines(format_task_line(task) for task in tasks)
 
     def is_overdue(self, deadline):
         """Проверяет, просрочена ли задача."""
         if not deadline:
             return False
-        try:
-            deadline_date = datetime.strptime(deadline, DATE_FORMAT).date()
-            today = datetime.now().date()
-            return deadline_date < today
-        except ValueError:
-            return False
+        deadline_date = try_parse_date(deadline)
+        return deadline_date is not None and deadline_date < date.today()
 
     def is_urgent(self, deadline):
         """Проверяет, является ли задача срочной (сегодня/завтра)."""
         if not deadline:
             return False
-        try:
-            deadline_date = datetime.strptime(deadline, DATE_FORMAT).date()
-            today = datetime.now().date()
-            tomorrow = today + timedelta(days=1)
-            return deadline_date in [today, tomorrow]
-        except ValueError:
+        deadline_date = try_parse_date(deadline)
+        if deadline_date is None:
             return False
+        today = date.today()
+        return today <= deadline_date <= today + timedelta(days=1)
+
+    def iter_filtered(self, category=None, priority=None, tag=None, only_overdue=False, only_urgent=False, search_text=None, tasks=None):
+        """Лениво перебирает задачи, подходящие под все критерии (за один проход).
+
+        Большие списки проверяются в нескольких процессах, тогда результат готовится сразу целиком.
+        """
+        filters = {"category": category, "priority": priority, "tag": tag, "only_overdue": only_overdue,
+                   "only_urgent": only_urgent, "search_text": search_text}
+        today = date.today()
+        predicate = make_predicate(today, **filters)
+        tasks = self.tasks if tasks is None else tasks
+        if predicate is None:
+            return iter(tasks)
+        if self._parallel_query(tasks):
+            return iter(self.parallel_filter(tasks, today, filters))
+        return (t for t in tasks if predicate(t))
 
+    def _parallel_query(self, tasks):
+        return len(tasks) >= get_parallel_query_threshold() and (os.cpu_count() or 1) > 1
+
+    def parallel_filter(self, tasks, today, filters, workers=0, min_size=None):
+        """Фильтрует список по частям в нескольких процессах; из процессов возвращаются только номера задач."""
+        from task_parallel import map_shards
+        workers = workers or get_config().getint("performance", "query_workers", fallback=0)
+        with METRICS.timed("parallel_filter"):
+            shards = map_shards(filter_shard, tasks, (today, filters), workers, min_size)
+        return [tasks[start + i] for start, numbers in shards for i in numbers]
+
+    def stats(self):
+        """Сводка по задачам из счётчиков, которые поддерживаются при каждом изменении."""
+        return self._stats_index().snapshot()
+
+    def count_stats(self, workers=0, min_size=None):
+        """Пересчитывает сводку полным проходом; большие списки — по частям в нескольких процессах."""
+        today = date.today()
+        if workers or min_size is not None or self._parallel_query(self.tasks):
+            from task_parallel import map_shards
+            workers = workers or get_config().getint("performance", "query_workers", fallback=0)
+            parts = [part for _, part in map_shards(stats_shard, self.tasks, (today,), workers, min_size)]
+            totals = tuple(map(sum, zip(*parts)))
+        else:
+            totals = stats_shard(self.tasks, today)
+        return dict(zip(STATS_FIELDS, totals))
+
+    @timed("filter", count_items=True)
     def filter_tasks(self, category=None, priority=None, tag=None, only_overdue=False, only_urgent=False, search_text=None):
         """Фильтрует задачи по заданным критериям."""
-        filtered = self.tasks
-        if category:
-            filtered = [t for t in filtered if t["category"] == category]
-        if priority:
-            filtered = [t for t in filtered if t["priority"] == priority]
-        if tag:
-            filtered = [t for t in filtered if tag in t["tags"]]
-        if only_overdue:
-            filtered = [t for t in filtered if self.is_overdue(t["deadline"])]
-        if only_urgent:
-            filtered = [t for t in filtered if self.is_urgent(t["deadline"])]
-        if search_text:
-            search_text = search_text.lower()
-            filtered = [t for t in filtered if search_text in t["text"].lower() or any(search_text in st["text"].lower() for st in t["subtasks"])]
-        return filtered
-
-    def show_tasks(self, category=None, priority=None, tag=None, only_overdue=False, only_urgent=False, search_text=None):
-        """Показывает отфильтрованные задачи."""
-        filtered_tasks = self.filter_tasks(category, priority, tag, only_overdue, only_urgent, search_text)
-        if not filtered_tasks:
+        if not (category or priority or tag or only_overdue or only_urgent or search_text):
+            return self.tasks
+        return list(self.iter_filtered(category, priority, tag, only_overdue, only_urgent, search_text))
+
+    def show_tasks(self, category=None, priority=None, tag=None, only_overdue=False, only_urgent=False, search_text=None, page=1, page_size=None):
+        """Показывает одну страницу отфильтрованных задач; возвращает (страница, всего страниц)."""
+        page_size = page_size or get_page_size()
+        # Фильтруем материализованный порядок — сортировать ничего не нужно
+        with METRICS.timed("order"):
+            ordered = self.ordered_tasks()
+        matches = self.iter_filtered(category, priority, tag, only_overdue, only_urgent, search_text, tasks=ordered)
+        shown, total = paginate(matches, page, page_size)
+        if not total:
             print("Список пуст или нет задач по заданным критериям.")
-            return
+            return 1, 0
+        pages = -(-total // page_size)
+        if page > pages:
+            page = pages
+            shown, total = paginate(self.iter_filtered(category, priority, tag, only_overdue, only_urgent, search_text, tasks=ordered), page, page_size)
         
         title = "Текущие задачи"
         if category:
@@ -135,37 +763,63 @@ class TaskManager:
             title += " (срочные)"
         elif search_text:
             title += f" (поиск: {search_text})"
-        print(f"\n{title}:")
-
-        priority_order = {"высокий": 1, "средний": 2, "низкий": 3}
-        def sort_key(task):
-            deadline = task["deadline"]
-            deadline_score = datetime(9999, 12, 31) if not deadline else datetime.strptime(deadline, DATE_FORMAT)
-            return (deadline_score, priority_order.get(task["priority"], 3), task["done"])
-        sorted_tasks = sorted(filtered_tasks, key=sort_key)
-        
-        for i, task in enumerate(sorted_tasks, 1):
-            mark = "[x]" if task["done"] else "[ ]"
-            overdue = "[Просрочено]" if self.is_overdue(task["deadline"]) else ""
-            urgent = "[Срочно]" if self.is_urgent(task["deadline"]) and not task["done"] else ""
-            deadline = f", до {task['deadline']}" if task["deadline"] else ""
-            tags = f", теги: {', '.join(task['tags'])}" if task["tags"] else ""
-            repeat = f", повтор: {task['repeat']}" if task["repeat"] else ""
-            line = f"{i}. {mark} {task['text']} ({task['category']}, {task['priority']}{deadline}{tags}{repeat}) {overdue}{urgent}"
-            if COLORAMA_AVAILABLE and overdue:
-                line = Fore.RED + line + Style.RESET_ALL
-            print(line)
-            for j, subtask in enumerate(task["subtasks"], 1):
-                sub_mark = "[x]" if subtask["done"] else "[ ]"
-                print(f"   {i}.{j}. {sub_mark} {subtask['text']}")
-
-    def get_task_number(self, prompt):
-        """Получает номер задачи с проверкой."""
-        self.show_tasks()
+        today = date.today()
+        with Output() as out:
+            out.line(f"\n{title}:")
+            for i, task in enumerate(shown, (page - 1) * page_size + 1):
+                render_task(out, i, task, today)
+            if pages > 1:
+                out.line(f"Страница {page} из {pages} (всего задач: {total})")
+        return page, pages
+
+    def most_urgent(self, k, **filters):
+        """Возвращает k самых срочных невыполненных задач (частичный отбор через heapq)."""
+        candidates = (t for t in self.iter_filtered(**filters) if not t["done"])
+        return heapq.nsmallest(k, candidates, key=self._sort_key)
+
+    def show_most_urgent(self, k=None):
+        """Показывает k самых срочных невыполненных задач."""
+        k = k or get_config().getint("display", "top_k", fallback=DEFAULT_TOP_K)
+        top = self.most_urgent(k)
+        if not top:
+            print("Нет невыполненных задач.")
+            return
+        today = date.today()
+        with Output() as out:
+            out.line(f"\nСамые срочные задачи (топ-{k}):")
+            for i, task in enumerate(top, 1):
+                render_task(out, i, task, today)
+
+    def _paged_prompt(self, render, prompt=None):
+        """Листает страницы render(page) -> (страница, всего) и возвращает первый ввод, не являющийся листанием.
+
+        Без prompt только просматривает: для одной страницы ничего не спрашивает.
+        """
+        page = 1
+        while True:
+            page, pages = render(page)
+            if pages > 1:
+                print("n — следующая страница, p — предыдущая" + ("" if prompt else ", Enter — в меню"))
+            elif prompt is None:
+                return None
+            answer = input(prompt or "> ").strip()
+            if pages > 1 and answer.lower() in ("n", "p"):
+                page = min(max(page + (1 if answer.lower() == "n" else -1), 1), pages)
+                continue
+            return answer
+
+    def browse_tasks(self, **filters):
+        """Показывает задачи постранично."""
+        self._paged_prompt(lambda page: self.show_tasks(page=page, **filters))
+
+    def choose_task(self, prompt):
+        """Показывает задачи и возвращает выбранную по номеру из списка (или None)."""
+        answer = self._paged_prompt(lambda page: self.show_tasks(page=page), prompt)
         try:
-            num = int(input(prompt))
-            if 1 <= num <= len(self.tasks):
-                return num - 1
+            num = int(answer)
+            ordered = self.ordered_tasks()
+            if 1 <= num <= len(ordered):
+                return ordered[num - 1]
             print("Неверный номер.")
             return None
         except ValueError:
@@ -180,14 +834,13 @@ class TaskManager:
             return "средний"
         return priority
 
-    def get_deadline(self, prompt="Дедлайн (ГГГГ-ММ-ДД или Enter для без даты): "):
-        """Получает дедлайн с проверкой."""
+    def get_deadline(self, prompt="Дедлайн (ГГГГ-ММ-ДД, ДД.ММ.ГГГГ и т.п. или Enter для без даты): "):
+        """Получает дедлайн с проверкой (любой поддерживаемый формат приводится к ГГГГ-ММ-ДД)."""
         deadline = input(prompt).strip()
         if not deadline:
             return ""
         try:
-            datetime.strptime(deadline, DATE_FORMAT)
-            return deadline
+            return normalize_date(deadline)
         except ValueError:
             print("Неверный формат даты, дедлайн не установлен.")
             return ""
@@ -204,10 +857,14 @@ class TaskManager:
         tags = input(prompt).strip()
         return [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else []
 
-    def get_repeat(self, prompt="Повторение (ежедневно/еженедельно/нет): "):
+    def get_repeat(self, prompt="Повторение (ежедневно/еженедельно/ежемесячно/каждые N дней/RRULE или Enter): "):
         """Получает правило повторения."""
-        repeat = input(prompt).strip().lower()
-        return repeat if repeat in ["ежедневно", "еженедельно", ""] else ""
+        repeat = input(prompt).strip()
+        try:
+            return self._check_repeat(repeat)
+        except ValueError:
+            print(f"Неверное правило, повторение не установлено. Примеры: {RECURRENCE_EXAMPLES}")
+            return ""
 
     def get_subtasks(self, prompt="Подзадачи через запятую (или Enter для без подзадач): "):
         """Получает подзадачи."""
@@ -216,13 +873,220 @@ class TaskManager:
             return []
         return [{"text": text.strip(), "done": False} for text in subtasks_input.split(",") if text.strip()]
 
+    def create_task(self, text, category="Без категории", priority="средний", deadline="", tags=None, repeat="", subtasks=None, save=True):
+        """Создаёт задачу без диалога; при ошибке данных бросает ValueError."""
+        text = self._check_text(text)
+        if text in self._text_index():
+            raise ValueError("такая задача уже есть")
+        task = {
+            "done": False,
+            "category": self._check_field(category, "категория") or "Без категории",
+            "text": text,
+            "priority": self._check_priority(priority),
+            "deadline": self._check_deadline(deadline),
+            "tags": self._check_tags(tags),
+            "repeat": self._check_repeat(repeat),
+            "subtasks": self._check_subtasks(subtasks)
+        }
+        self._append_task(task)
+        self.history.opened(task)
+        if save:
+            self.save()
+        return task
+
+    def set_done(self, task, done=True, save=True):
+        """Отмечает задачу выполненной/невыполненной (с учётом повторения).
+
+        Возвращает задачи, которые после этого можно начинать (если граф зависимостей построен).
+        """
+        before = dict(task) if done != task["done"] else None
+        if done and task["repeat"] and not task["done"]:
+            self._complete_occurrence(task)
+        else:
+            task["done"] = done
+        if before is not None:
+            self._record_completion(before, task)
+        self._touch(task)
+        released = self._index_update(task)
+        if save:
+            self.save()
+        return released
+
+    def add_dependency(self, task, blocker, save=True):
+        """Отмечает, что task нельзя начать, пока не выполнена blocker; цикл — ValueError."""
+        graph = self._dep_index()
+        if blocker["id"] in graph.blockers.get(task["id"], ()):
+            return
+        cycle = graph.cycle(task["id"], blocker["id"])
+        if cycle is not None:
+            path = " → ".join(graph.tasks[task_id]["text"] for task_id in cycle + [cycle[0]])
+            raise ValueError(f"зависимость создаёт цикл: {path}")
+        task["blocked_by"] = task.get("blocked_by", []) + [blocker["id"]]
+        self._touch(task)
+        self._index_update(task)
+        if save:
+            self.save()
+
+    def remove_dependency(self, task, blocker, save=True):
+        """Убирает зависимость task от blocker."""
+        if blocker["id"] not in task.get("blocked_by", ()):
+            raise ValueError("такой зависимости нет")
+        task["blocked_by"] = [task_id for task_id in task["blocked_by"] if task_id != blocker["id"]]
+        if not task["blocked_by"]:
+            del task["blocked_by"]
+        self._touch(task)
+        self._index_update(task)
+        if save:
+            self.save()
+
+    def blockers(self, task):
+        """Невыполненные задачи, которые блокируют task."""
+        return self._dep_index().open_blockers_of(task["id"])
+
+    def is_blocked(self, task):
+        return self._dep_index().is_blocked(task["id"])
+
+    def blocked_count(self):
+        """Сколько невыполненных задач ждут других задач."""
+        return len(self._dep_index().blocked)
+
+    def ready_tasks(self):
+        """Невыполненные задачи, у которых все блокирующие выполнены, в порядке вывода."""
+        blocked = self._dep_index().blocked
+        return [task for task in self.ordered_tasks() if not task["done"] and task["id"] not in blocked]
+
+    def critical_path(self, task=None):
+        """Самая длинная цепочка невыполненных задач до task (по умолчанию — до заблокированной с ближайшим дедлайном)."""
+        return self._dep_index().critical_path(task["id"] if task is not None else None)
+
+    def schedule(self):
+        """Невыполненные задачи в порядке, допустимом зависимостями (топологическая сортировка по дедлайнам)."""
+        return self._dep_index().schedule()
+
+    def _record_completion(self, before, task):
+        """Записывает в историю выполнение (before — задача до отметки) или его отмену."""
+        if not before["done"]:
+            self.history.completed(before, final=task["done"])
+        elif not task["done"]:
+            self.history.reopened(task)
+
+    def update_task(self, task, save=True, **changes):
+        """Изменяет поля задачи без диалога; при ошибке данных бросает ValueError."""
+        unknown = set(changes) - set(task)
+        if unknown:
+            raise ValueError(f"неизвестные поля: {', '.join(sorted(unknown))}")
+        if "text" in changes:
+            new_text = self._check_text(changes["text"])
+            if new_text != task["text"] and new_text in self._text_index():
+                raise ValueError("такая задача уже есть")
+            changes["text"] = new_text
+        if "priority" in changes:
+            changes["priority"] = self._check_priority(changes["priority"])
+        if "deadline" in changes:
+            changes["deadline"] = self._check_deadline(changes["deadline"])
+            if changes["deadline"] != task["deadline"] and task["repeat"] and "repeat" not in changes:
+                # Дедлайн, заданный вручную, — новое начало серии (и новое число месяца)
+                changes["repeat"] = format_rule(restart(parse_rule(task["repeat"])))
+        if "repeat" in changes:
+            changes["repeat"] = self._check_repeat(changes["repeat"])
+        if "subtasks" in changes:
+            changes["subtasks"] = self._check_subtasks(changes["subtasks"])
+        if "category" in changes:
+            changes["category"] = self._check_field(changes["category"], "категория") or "Без категории"
+        if "tags" in changes:
+            changes["tags"] = self._check_tags(changes["tags"])
+        if "text" in changes and changes["text"] != task["text"]:
+            self._forget_text(task)
+            task["text"] = changes.pop("text")
+            if self._by_text is not None:
+                self._by_text.setdefault(task["text"], []).append(task)
+        if changes.get("category"):
+            self.categories.add(changes["category"])
+        done = changes.pop("done", None)
+        task.update(changes)
+        self._touch(task)
+        self._index_update(task)
+        if done is not None:
+            # Отметка — после правки: новый дедлайн повторения считается от указанного
+            self.set_done(task, done, save=False)
+        if save:
+            self.save()
+
+    def remove_task(self, task, save=True):
+        """Удаляет задачу из списка."""
+        for i, t in enumerate(self.tasks):
+            if t is task:
+                del self.tasks[i]
+                break
+        else:
+            raise ValueError("задача не найдена")
+        self._forget(task)
+        self._forget_text(task)
+        self._index_remove(task)
+        self.history.forgotten(task)
+        if self._by_id is not None:
+            self._by_id.pop(task.get("id"), None)
+        if save:
+            self.save()
+
+    def _check_field(self, value, name):
+        """Проверяет строковое поле строки файла: '|' и перевод строки сдвинули бы остальные поля."""
+        if value is None:
+            return ""
+        if not isinstance(value, str):
+            raise ValueError(f"поле «{name}» должно быть строкой")
+        if "|" in value or "\n" in value or "\r" in value:
+            raise ValueError(f"поле «{name}» не может содержать '|' или перевод строки")
+        return value.strip()
+
+    def _check_text(self, text):
+        text = self._check_field(text, "текст")
+        if not text:
+            raise ValueError("задача не может быть пустой")
+        return text
+
+    def _check_tags(self, tags):
+        if isinstance(tags, str) or not isinstance(tags, (list, tuple, type(None))):
+            raise ValueError("теги должны быть списком строк")
+        checked = []
+        for tag in tags or []:
+            tag = self._check_field(tag, "тег")
+            if not tag or "," in tag:
+                raise ValueError(f"недопустимый тег: {tag!r}")
+            checked.append(tag)
+        return checked
+
+    def _check_priority(self, priority):
+        priority = (priority or "средний").strip().lower()
+        if priority not in PRIORITIES:
+            raise ValueError(f"неверный приоритет: {priority}")
+        return priority
+
+    def _check_deadline(self, deadline):
+        try:
+            return normalize_date(deadline)
+        except ValueError:
+            raise ValueError(f"неверный формат даты: {deadline}")
+
+    def _check_subtasks(self, subtasks):
+        try:
+            return normalize_subtasks(subtasks)
+        except ValueError as e:
+            raise ValueError(f"неверные подзадачи: {e}")
+
+    def _check_repeat(self, repeat):
+        try:
+            return format_rule(parse_rule(repeat))
+        except ValueError as e:
+            raise ValueError(f"неверное повторение: {repeat} ({e})")
+
     def add_task(self):
         """Добавляет новую задачу."""
         text = input("Введи задачу: ").strip()
         if not text:
             print("Ошибка: задача не может быть пустой!")
             return
-        if any(task["text"] == text for task in self.tasks):
+        if text in self._text_index():
             print("Ошибка: такая задача уже есть!")
             return
         category = self.get_category()
@@ -231,157 +1095,386 @@ class TaskManager:
         tags = self.get_tags()
         repeat = self.get_repeat()
         subtasks = self.get_subtasks()
-        self.tasks.append({
-            "done": False,
-            "category": category,
-            "text": text,
-            "priority": priority,
-            "deadline": deadline,
-            "tags": tags,
-            "repeat": repeat,
-            "subtasks": subtasks
-        })
-        self.save_tasks(FILENAME, self.tasks)
+        try:
+            self.create_task(text, category, priority, deadline, tags, repeat, subtasks)
+        except ValueError as e:
+            print(f"Ошибка: {e}!")
+            return
         print("Задача добавлена!")
 
     def mark_task(self, done=True):
         """Отмечает или снимает отметку с задачи."""
-        num = self.get_task_number("Номер задачи: ")
-        if num is not None:
-            task = self.tasks[num]
-            task["done"] = done
-            if done and task["repeat"]:
-                self._handle_repeat(task)
-            self.save_tasks(FILENAME, self.tasks)
+        task = self.choose_task("Номер задачи: ")
+        if task is not None:
+            self._dep_index()
+            released = self.set_done(task, done)
             print(f"Задача {'отмечена как выполненная' if done else 'снята с выполнения'}!")
+            self._print_released(released)
 
-    def _handle_repeat(self, task):
-        """Обрабатывает повторяющиеся задачи."""
-        if task["repeat"] == "ежедневно":
-            new_deadline = (datetime.strptime(task["deadline"], DATE_FORMAT) + timedelta(days=1)).strftime(DATE_FORMAT) if task["deadline"] else ""
-        elif task["repeat"] == "еженедельно":
-            new_deadline = (datetime.strptime(task["deadline"], DATE_FORMAT) + timedelta(weeks=1)).strftime(DATE_FORMAT) if task["deadline"] else ""
-        else:
+    def _print_released(self, released):
+        if released:
+            print("Теперь можно начинать: " + ", ".join(task["text"] for task in released))
+
+    def _complete_occurrence(self, task):
+        """Выполняет текущее повторение: дедлайн сдвигается на следующее, копия не создаётся.
+
+        Задача становится выполненной, только когда повторения закончились (COUNT/UNTIL).
+        """
+        try:
+            rule = parse_rule(task["repeat"])
+        except ValueError:
+            rule = None
+        if rule is None:
+            task["done"] = True
             return
-        self.tasks.append({
-            "done": False,
-            "category": task["category"],
-            "text": task["text"],
-            "priority": task["priority"],
-            "deadline": new_deadline,
-            "tags": task["tags"].copy(),
-            "repeat": task["repeat"],
-            "subtasks": [{"text": st["text"], "done": False} for st in task["subtasks"]]
-        })
+        current = try_parse_date(task["deadline"]) if task["deadline"] else None
+        if current is None:
+            # Без даты сдвигать нечего: задача остаётся открытой, без дедлайна, как и раньше
+            task["done"] = False
+            reset_subtasks(task["subtasks"])
+            return
+        following, rule = advance(rule, current)
+        task["repeat"] = format_rule(rule)
+        if following is None:
+            task["done"] = True
+            return
+        task["done"] = False
+        task["deadline"] = following.isoformat()
+        reset_subtasks(task["subtasks"])
+
+    def skip_occurrence(self, task, day=None, save=True):
+        """Пропускает повторение day (по умолчанию текущее) — сохраняется как исключение в правиле."""
+        rule = parse_rule(task["repeat"])
+        if rule is None:
+            raise ValueError("задача не повторяется")
+        current = try_parse_date(task["deadline"]) if task["deadline"] else None
+        if current is None:
+            raise ValueError("у задачи нет даты, от которой считать повторения")
+        day = day or current
+        if day == current:
+            following, rule = advance(rule, current)
+            if following is None:
+                task["done"] = True
+            else:
+                task["deadline"] = following.isoformat()
+        elif day > current:
+            rule = skip_rule(rule, day)
+        task["repeat"] = format_rule(rule)
+        self._touch(task)
+        self._index_update(task)
+        if save:
+            self.save()
+
+    def occurrences(self, start, end):
+        """Лениво перебирает (дата, задача) для всех невыполненных задач с дедлайном в [start, end]."""
+        def series(task):
+            deadline = try_parse_date(task["deadline"])
+            if deadline is None:
+                return
+            rule = None
+            if task["repeat"]:
+                try:
+                    rule = parse_rule(task["repeat"])
+                except ValueError:
+                    pass
+            days = iter_occurrences(rule, deadline, end) if rule else (deadline,) if deadline <= end else ()
+            for day in days:
+                if day >= start:
+                    yield day, task
+
+        streams = [series(task) for task in self.tasks if not task["done"] and task["deadline"]]
+        return heapq.merge(*streams, key=lambda item: item[0])
+
+    def bulk_update(self, query=None, ids=None, done=None, delete=False, category=None, priority=None,
+                    add_tags=None, remove_tags=None, shift_days=0, save=True):
+        """Применяет одно изменение ко всем задачам из запроса или списка id за один проход.
+
+        query — словарь критериев как у filter_tasks ({} — все задачи), ids — постоянные id.
+        Индексы обновляются один раз, файл сохраняется один раз. Возвращает число задач.
+        """
+        if query is None and ids is None:
+            raise ValueError("нужен запрос или список id")
+        if ids is not None:
+            by_id = self._id_index()
+            selected = [by_id[task_id] for task_id in dict.fromkeys(ids) if task_id in by_id]
+            if query:
+                selected = list(self.iter_filtered(**query, tasks=selected))
+        else:
+            selected = list(self.iter_filtered(**query))
+        return self._apply_bulk(selected, done, delete, category, priority, add_tags, remove_tags, shift_days, save)
+
+    def _apply_bulk(self, selected, done=None, delete=False, category=None, priority=None,
+                    add_tags=None, remove_tags=None, shift_days=0, save=True):
+        """Изменяет выбранные задачи (объекты из self.tasks) с одним обновлением индексов."""
+        if not selected:
+            return 0
+        if priority is not None:
+            priority = self._check_priority(priority)
+        category = self._check_field(category, "категория")
+        add_tags = self._check_tags([tag for tag in (add_tags or []) if tag])
+        remove_tags = set(remove_tags or [])
+        shift = timedelta(days=shift_days)
+        # Небольшие изменения переставляем точечно, крупные — перестраиваем лениво
+        reindex = len(selected) > BULK_REINDEX_THRESHOLD
+
+        if delete:
+            doomed = set(map(id, selected))
+            self.tasks[:] = [task for task in self.tasks if id(task) not in doomed]
+            for task in selected:
+                self._forget(task)
+                self.history.forgotten(task)
+            if reindex:
+                self._invalidate_indexes()
+                for task in selected:
+                    if self._stats is not None:
+                        self._stats.remove(task)
+                    if self._deps is not None:
+                        self._deps.remove(task)
+            else:
+                for task in selected:
+                    self._forget_text(task)
+                    self._index_remove(task)
+                    if self._by_id is not None:
+                        self._by_id.pop(task.get("id"), None)
+        else:
+            for task in selected:
+                if done is not None and task["done"] != done:
+                    before = dict(task)
+                    if done and task["repeat"]:
+                        self._complete_occurrence(task)
+                    else:
+                        task["done"] = done
+                    self._record_completion(before, task)
+                if category:
+                    task["category"] = category
+                if priority is not None:
+                    task["priority"] = priority
+                if add_tags or remove_tags:
+                    tags = [tag for tag in task["tags"] if tag not in remove_tags]
+                    tags.extend(tag for tag in add_tags if tag not in tags)
+                    task["tags"] = tags
+                if shift_days and task["deadline"]:
+                    deadline = try_parse_date(task["deadline"])
+                    if deadline is not None:
+                        task["deadline"] = (deadline + shift).isoformat()
+                self._touch(task)
+                if not reindex:
+                    self._index_update(task)
+                else:
+                    if self._stats is not None:
+                        self._stats.update(task)
+                    if self._deps is not None:
+                        self._deps.update(task)
+            if category:
+                self.categories.add(category)
+            if reindex:
+                self._order = None
+        if reindex and self.scheduler is not None:
+            # Точечные task_changed не вызывались: пороги пересчитываются одним проходом
+            self.scheduler.rebuild()
+        if save:
+            self.save()
+        return len(selected)
 
     def mark_multiple_tasks(self):
         """Отмечает несколько задач как выполненные."""
-        self.show_tasks()
-        numbers = input("Введи номера задач через запятую: ").strip()
+        numbers = self._paged_prompt(lambda page: self.show_tasks(page=page), "Введи номера задач через запятую: ")
         try:
             indices = [int(n) - 1 for n in numbers.split(",") if n.strip()]
-            valid_indices = [i for i in indices if 0 <= i < len(self.tasks)]
+            ordered = self.ordered_tasks()
+            valid_indices = [i for i in indices if 0 <= i < len(ordered)]
             if not valid_indices:
                 print("Нет корректных номеров.")
                 return
-            for i in valid_indices:
-                self.tasks[i]["done"] = True
-                if self.tasks[i]["repeat"]:
-                    self._handle_repeat(self.tasks[i])
-            self.save_tasks(FILENAME, self.tasks)
+            selected = [ordered[i] for i in dict.fromkeys(valid_indices)]
+            graph = self._dep_index()
+            waiting = {dependent for task in selected for dependent in graph.dependents.get(task["id"], ())
+                       if graph.is_blocked(dependent)}
+            self._apply_bulk(selected, done=True)
             print(f"Отмечено задач: {len(valid_indices)}")
+            self._print_released([graph.tasks[task_id] for task_id in waiting if task_id in graph.tasks
+                                  and not graph.is_blocked(task_id) and not graph.tasks[task_id]["done"]])
         except ValueError:
             print("Нужно ввести числа через запятую.")
 
     def mark_subtask(self):
-        """Отмечает подзадачу."""
-        num = self.get_task_number("Номер задачи: ")
-        if num is not None:
-            task = self.tasks[num]
+        """Отмечает подзадачу (в том числе вложенную, по номеру вида 1.2)."""
+        task = self.choose_task("Номер задачи: ")
+        if task is not None:
             if not task["subtasks"]:
                 print("У задачи нет подзадач.")
                 return
-            print("\nПодзадачи:")
-            for j, subtask in enumerate(task["subtasks"], 1):
-                mark = "[x]" if subtask["done"] else "[ ]"
-                print(f"{j}. {mark} {subtask['text']}")
-            try:
-                sub_num = int(input("Номер подзадачи: ")) - 1
-                if 0 <= sub_num < len(task["subtasks"]):
-                    task["subtasks"][sub_num]["done"] = not task["subtasks"][sub_num]["done"]
-                    self.save_tasks(FILENAME, self.tasks)
-                    print("Подзадача обновлена!")
-                else:
-                    print("Неверный номер подзадачи.")
-            except ValueError:
-                print("Нужно ввести число.")
+            tree = self.subtask_tree(task)
+            numbered = {}
+            print(f"\nПодзадачи (выполнено {tree.progress():.0%}):")
+            for number, depth, node in iter_numbered(task["subtasks"]):
+                numbered[number] = node
+                mark = "[x]" if node["done"] else "[ ]"
+                progress = f" — {tree.progress(node['id']):.0%}" if node.get("subtasks") else ""
+                print(f"{'   ' * depth}{number}. {mark} {node['text']}{progress}")
+            node = numbered.get(input("Номер подзадачи (например, 2 или 2.1): ").strip().rstrip("."))
+            if node is None:
+                print("Неверный номер подзадачи.")
+                return
+            self.toggle_subtask(task, node["id"])
+            print("Подзадача обновлена!")
+
+    def subtask_tree(self, task):
+        """Индекс дерева подзадач задачи (узлы по id, родители, прогресс)."""
+        tree = self._subtrees.get(task["id"])
+        if tree is None or tree.roots is not task["subtasks"]:
+            tree = self._subtrees[task["id"]] = SubtaskTree(task)
+        return tree
+
+    def toggle_subtask(self, task, subtask_id, save=True):
+        """Переключает отметку подзадачи с id subtask_id."""
+        node = self.subtask_tree(task).node(subtask_id)
+        if node is None:
+            raise ValueError(f"подзадача не найдена: {subtask_id}")
+        self.set_subtask_done(task, subtask_id, not node["done"], save)
+
+    def set_subtask_done(self, task, subtask_id, done=True, save=True):
+        """Отмечает подзадачу (внутреннюю — вместе с поддеревом), поправляя прогресс вверх по дереву.
+
+        С save=True отметка дописывается в журнал, а файл задач не перезаписывается.
+        """
+        tree = self.subtask_tree(task)
+        if tree.node(subtask_id) is None:
+            raise ValueError(f"подзадача не найдена: {subtask_id}")
+        if not tree.set_done(subtask_id, done):
+            return
+        if self._stats is not None:
+            self._stats.update(task)
+        if save:
+            self._append_journal([(task["id"], subtask_id, done)])
+        else:
+            self._touch(task)
+
+    def add_subtask(self, task, text, parent_id=None, save=True):
+        """Добавляет подзадачу (под parent_id или на верхний уровень); возвращает её узел."""
+        text = self._check_field(text, "подзадача")
+        if not text:
+            raise ValueError("подзадача не может быть пустой")
+        tree = self.subtask_tree(task)
+        if parent_id is not None and tree.node(parent_id) is None:
+            raise ValueError(f"подзадача не найдена: {parent_id}")
+        node = tree.add(text, parent_id)
+        self._touch(task)
+        if self._stats is not None:
+            self._stats.update(task)
+        if save:
+            self.save()
+        return node
+
+    def remove_subtask(self, task, subtask_id, save=True):
+        """Удаляет подзадачу вместе с вложенными."""
+        tree = self.subtask_tree(task)
+        if tree.node(subtask_id) is None:
+            raise ValueError(f"подзадача не найдена: {subtask_id}")
+        tree.remove(subtask_id)
+        self._touch(task)
+        if self._stats is not None:
+            self._stats.update(task)
+        if save:
+            self.save()
+
+    def _append_journal(self, entries):
+        """Дописывает отметки подзадач в журнал под блокировкой (вместо перезаписи файла задач)."""
+        with self._file_lock:
+            stale = self.disk_changed()
+            position = append_journal(self.filename, entries)
+            generation = self._file_lock.bump_generation()
+            if not stale:
+                # Журнал до нашей записи уже прочитан: сдвигаемся за свои строки
+                self._generation = generation
+                self._journal = position
+
+    def _replay_journal(self, from_start=False):
+        """Применяет непрочитанные отметки журнала к задачам; возвращает изменённые задачи."""
+        entries, position, restarted = read_journal(self.filename, None if from_start else self._journal)
+        self._journal = position
+        if not entries:
+            return []
+        return self._apply_journal(entries, self._id_index(), self._subtrees)
+
+    def _apply_journal(self, entries, by_id, trees):
+        """Применяет отметки (id задачи, id подзадачи, выполнена) к задачам by_id."""
+        changed = {}
+        for task_id, node_id, done in entries:
+            task = by_id.get(task_id)
+            if task is None or task_id in self._changed:
+                continue  # задача удалена или изменена локально: её запишем целиком
+            tree = trees.get(task_id)
+            if tree is None or tree.roots is not task["subtasks"]:
+                tree = trees[task_id] = SubtaskTree(task)
+            if tree.node(node_id) is not None and tree.set_done(node_id, done):
+                changed[task_id] = task
+        if trees is self._subtrees:
+            for task in changed.values():
+                self._index_update(task)
+        return list(changed.values())
 
     def delete_task(self):
         """Удаляет задачу."""
-        num = self.get_task_number("Номер задачи для удаления: ")
-        if num is not None:
-            removed = self.tasks.pop(num)
-            self.save_tasks(FILENAME, self.tasks)
+        removed = self.choose_task("Номер задачи для удаления: ")
+        if removed is not None:
+            self.remove_task(removed)
             print(f"Удалено: {removed['text']}")
 
     def edit_task(self):
         """Редактирует задачу."""
-        num = self.get_task_number("Номер задачи для редактирования: ")
-        if num is not None:
-            task = self.tasks[num]
+        task = self.choose_task("Номер задачи для редактирования: ")
+        if task is not None:
             new_text = input("Новый текст задачи (Enter для того же): ").strip() or task["text"]
-            if new_text != task["text"] and any(t["text"] == new_text for t in self.tasks if t != task):
+            if new_text != task["text"] and new_text in self._text_index():
                 print("Ошибка: такая задача уже есть!")
                 return
             new_category = input("Новая категория (Enter для той же): ").strip() or task["category"]
-            self.categories.add(new_category)
             new_priority = input("Новый приоритет (Enter для того же): ").strip().lower()
             new_priority = self.get_priority("Новый приоритет: ") if new_priority else task["priority"]
             new_deadline = input("Новый дедлайн (ГГГГ-ММ-ДД или Enter): ").strip()
             new_deadline = self.get_deadline("Новый дедлайн: ") if new_deadline else task["deadline"]
             new_tags = self.get_tags("Новые теги через запятую (Enter для тех же): ") or task["tags"]
-            new_repeat = input("Новое повторение (ежедневно/еженедельно/нет, Enter для того же): ").strip().lower()
+            new_repeat = input("Новое повторение (правило или нет, Enter для того же): ").strip().lower()
             new_repeat = self.get_repeat("Новое повторение: ") if new_repeat else task["repeat"]
             new_subtasks = self.get_subtasks("Новые подзадачи через запятую (Enter для тех же): ") or task["subtasks"]
-            task["text"] = new_text
-            task["category"] = new_category
-            task["priority"] = new_priority
-            task["deadline"] = new_deadline
-            task["tags"] = new_tags
-            task["repeat"] = new_repeat
-            task["subtasks"] = new_subtasks
-            self.save_tasks(FILENAME, self.tasks)
+            try:
+                self.update_task(task, text=new_text, category=new_category, priority=new_priority,
+                                 deadline=new_deadline, tags=new_tags, repeat=new_repeat, subtasks=new_subtasks)
+            except ValueError as e:
+                print(f"Ошибка: {e}!")
+                return
             print("Задача обновлена!")
 
     def show_by_category(self):
         """Показывает задачи по категории."""
         category = input("Введи категорию (или Enter для всех): ").strip()
-        self.show_tasks(category=category or None)
+        self.browse_tasks(category=category or None)
 
     def show_by_priority(self):
         """Показывает задачи по приоритету."""
         priority = self.get_priority("Введи приоритет (высокий/средний/низкий): ")
-        self.show_tasks(priority=priority)
+        self.browse_tasks(priority=priority)
 
     def show_by_tag(self):
         """Показывает задачи по тегу."""
         tag = input("Введи тег: ").strip()
         if tag:
-            self.show_tasks(tag=tag)
+            self.browse_tasks(tag=tag)
 
     def show_by_text(self):
         """Ищет задачи по тексту."""
         search_text = input("Введи текст для поиска: ").strip()
         if search_text:
-            self.show_tasks(search_text=search_text)
+            self.browse_tasks(search_text=search_text)
 
     def show_overdue(self):
         """Показывает просроченные задачи."""
-        self.show_tasks(only_overdue=True)
+        self.browse_tasks(only_overdue=True)
 
     def show_urgent(self):
         """Показывает срочные задачи."""
-        self.show_tasks(only_urgent=True)
+        self.browse_tasks(only_urgent=True)
 
     def clear_done_tasks(self):
         """Архивирует и удаляет выполненные задачи."""
@@ -389,38 +1482,69 @@ class TaskManager:
         if not done_tasks:
             print("Нет выполненных задач.")
             return
-        archive_tasks = self.load_tasks(ARCHIVE_FILENAME)
-        archive_tasks.extend(done_tasks)
-        self.save_tasks(ARCHIVE_FILENAME, archive_tasks)
-        self.tasks[:] = [task for task in self.tasks if not task["done"]]
-        self.save_tasks(FILENAME, self.tasks)
+        with self._file_lock:
+            # Архив только дописывается: его индекс смещений дополняется, а не строится заново
+            self.append_tasks(self.archive_filename, done_tasks)
+            self.history.archived(done_tasks)
+            self.tasks[:] = [task for task in self.tasks if not task["done"]]
+            for task in done_tasks:
+                self._forget(task)
+                if self._stats is not None:
+                    self._stats.remove(task)
+                if self._deps is not None:
+                    self._deps.remove(task)
+            self._invalidate_indexes()
+            self.save()
+        self.write_snapshot()
+        if os.path.exists(trigram_path(self.archive_filename)):
+            with ArchiveReader(self.archive_filename) as archive:
+                archive.build_trigrams()
         print(f"Архивировано и удалено задач: {len(done_tasks)}")
 
-    def show_archive(self):
-        """Показывает архив задач."""
-        archive_tasks = self.load_tasks(ARCHIVE_FILENAME)
-        if not archive_tasks:
-            print("Архив пуст.")
-            return
-        print("\nАрхивированные задачи:")
-        for i, task in enumerate(archive_tasks, 1):
-            deadline = f", до {task['deadline']}" if task["deadline"] else ""
-            tags = f", теги: {', '.join(task['tags'])}" if task["tags"] else ""
-            repeat = f", повтор: {task['repeat']}" if task["repeat"] else ""
-            line = f"{i}. [x] {task['text']} ({task['category']}, {task['priority']}{deadline}{tags}{repeat})"
-            print(line)
-            for j, subtask in enumerate(task["subtasks"], 1):
-                sub_mark = "[x]" if subtask["done"] else "[ ]"
-                print(f"   {i}.{j}. {sub_mark} {subtask['text']}")
+    def archive_page(self, archive, numbers, page, page_size):
+        """Разбирает строки архива только для одной страницы."""
+        tasks = []
+        for i in numbers[(page - 1) * page_size:page * page_size]:
+            line = archive.line(i)
+            try:
+                tasks.append((i + 1, parse_task_line(line)))
+            except Exception as e:
+                log_error(f"Ошибка загрузки строки: {line.strip()}, {str(e)}")
+        return tasks
+
+    def show_archive(self, page_size=None, search_text=None):
+        """Показывает архив задач постранично (через mmap, без загрузки всего архива)."""
+        with ArchiveReader(self.archive_filename) as archive:
+            numbers = archive.search(search_text) if search_text else range(len(archive))
+            if not numbers:
+                print("Архив пуст." if not search_text else "В архиве ничего не найдено.")
+                return
+            page_size = page_size or get_page_size()
+            pages = -(-len(numbers) // page_size)
+            title = "Архивированные задачи" + (f" (поиск: {search_text})" if search_text else "")
+
+            def render(page):
+                with Output() as out:
+                    out.line(f"\n{title}:")
+                    for i, task in self.archive_page(archive, numbers, page, page_size):
+                        render_task(out, i, task, None, archived=True)
+                    if pages > 1:
+                        out.line(f"Страница {page} из {pages} (всего: {len(numbers)})")
+                return page, pages
+
+            self._paged_prompt(render)
+
+    def search_archive(self):
+        """Ищет задачи в архиве по тексту."""
+        search_text = input("Введи текст для поиска в архиве: ").strip()
+        if search_text:
+            self.show_archive(search_text=search_text)
 
     def show_stats(self):
         """Показывает статистику с прогресс-баром."""
-        total = len(self.tasks)
-        done = sum(1 for task in self.tasks if task["done"])
-        overdue = sum(1 for task in self.tasks if self.is_overdue(task["deadline"]))
-        urgent = sum(1 for task in self.tasks if self.is_urgent(task["deadline"]) and not task["done"])
-        sub_total = sum(len(task["subtasks"]) for task in self.tasks)
-        sub_done = sum(sum(1 for st in task["subtasks"] if st["done"]) for task in self.tasks)
+        stats = self.stats()
+        total, done, overdue, urgent = stats["total"], stats["done"], stats["overdue"], stats["urgent"]
+        sub_total, sub_done = stats["sub_total"], stats["sub_done"]
         
         # Прогресс-бар
         bar_length = 20
@@ -439,99 +1563,203 @@ class TaskManager:
         print(f"Выполнено подзадач: {sub_done}")
         print(f"Прогресс: {progress}")
 
-    def export_to_json(self):
-        """Экспортирует задачи в JSON."""
-        with open("tasks.json", "w", encoding="utf-8") as f:
-            json.dump(self.tasks, f, ensure_ascii=False, indent=2)
-        print("Задачи экспортированы в tasks.json")
+    def render_trends(self, out, period="week", dimension="all", value="", last=8):
+        """Добавляет в out таблицу динамики выполнения из сводных таблиц истории."""
+        rows = self.history.report(period, dimension, value, last)
+        title = TREND_PERIODS[period] + ("" if dimension == "all" else f", {TREND_DIMENSIONS[dimension]}: {value}")
+        out.line(f"\nДинамика выполнения ({title}):")
+        out.line(f"{'Интервал':<12} {'Выполнено':>9} {'Срок, дн.':>9} {'С опозданием':>12}")
+        for row in rows:
+            lead = "—" if row["lead_time"] is None else f"{row['lead_time']:.1f}"
+            out.line(f"{row['bucket']:<12} {row['completed']:>9} {lead:>9} {row['overdue_rate']:>12.0%}")
+
+    def show_trends(self):
+        """Показывает отчёт о продуктивности по дням, неделям или месяцам."""
+        answer = input("Период (день/неделя/месяц, Enter — неделя): ").strip().lower() or "неделя"
+        period = {name: key for key, name in TREND_PERIODS.items()}.get(answer)
+        if period is None:
+            print("Неверный период.")
+            return
+        answer = input("Срез (категория/приоритет/тег или Enter — все задачи): ").strip().lower()
+        dimension = {name: key for key, name in TREND_DIMENSIONS.items()}.get(answer, "all")
+        values = [""] if dimension == "all" else self.history.values(dimension)
+        if not values:
+            print("Выполненных задач пока нет.")
+            return
+        with Output() as out:
+            for value in values:
+                self.render_trends(out, period, dimension, value)
+
+    def render_dependencies(self, out, task=None):
+        """Добавляет в out сводку зависимостей и критический путь (до task или до ближайшего дедлайна)."""
+        out.line(f"\nМожно начинать: {len(self.ready_tasks())}, заблокировано: {self.blocked_count()}")
+        path = self.critical_path(task)
+        if len(path) > 1:
+            out.line("Критический путь: " + " → ".join(
+                f"{t['text']} (до {t['deadline']})" if t["deadline"] else t["text"] for t in path))
 
-    def import_from_json(self):
-        """Импортирует задачи из JSON."""
-        if not os.path.exists("tasks.json"):
-            print("Файл tasks.json не найден.")
+    def show_dependencies(self):
+        """Показывает сводку зависимостей и позволяет добавить или убрать зависимость."""
+        with Output() as out:
+            self.render_dependencies(out)
+        action = input("Добавить зависимость (+), убрать (-) или Enter — назад: ").strip()
+        if action not in ("+", "-"):
+            return
+        task = self.choose_task("Номер задачи, которая ждёт: ")
+        if task is None:
+            return
+        blocker = self.choose_task("Номер задачи, которую нужно выполнить раньше: ")
+        if blocker is None:
             return
         try:
-            with open("tasks.json", "r", encoding="utf-8") as f:
-                imported_tasks = json.load(f)
-            for task in imported_tasks:
-                if not isinstance(task, dict) or "text" not in task:
-                    raise ValueError("Неверный формат задачи")
-                task.setdefault("done", False)
-                task.setdefault("category", "Без категории")
-                task.setdefault("priority", "средний")
-                task.setdefault("deadline", "")
-                task.setdefault("tags", [])
-                task.setdefault("repeat", "")
-                task.setdefault("subtasks", [])
-                if task["text"] not in (t["text"] for t in self.tasks):
-                    self.tasks.append(task)
-                    self.categories.add(task["category"])
-            self.save_tasks(FILENAME, self.tasks)
-            print("Задачи импортированы из tasks.json")
-        except Exception as e:
-            logging.error(f"Ошибка импорта JSON: {str(e)}")
-            print("Ошибка при импорте задач.")
-
-    def export_to_ics(self):
-        """Экспортирует задачи с дедлайнами в iCalendar (.ics) файл."""
-        ics_content = [
-            "BEGIN:VCALENDAR",
-            "VERSION:2.0",
-            "PRODID:-//LegendaryTaskManager//Grok3//EN",
-            "CALSCALE:GREGORIAN"
-        ]
-        
-        for task in self.tasks:
-            if task["deadline"]:  # Экспортируем только задачи с дедлайнами
-                try:
-                    deadline = datetime.strptime(task["deadline"], DATE_FORMAT)
-                    uid = f"{task['text'].replace(' ', '_')}_{deadline.strftime('%Y%m%d')}@legendarytaskmanager"
-                    description = f"Категория: {task['category']}\\nПриоритет: {task['priority']}"
-                    if task["tags"]:
-                        description += f"\\nТеги: {', '.join(task['tags'])}"
-                    if task["repeat"]:
-                        description += f"\\nПовтор: {task['repeat']}"
-                    if task["subtasks"]:
-                        subtask_list = "\\nПодзадачи:\\n" + "\\n".join(f"- {'[x]' if st['done'] else '[ ]'} {st['text']}" for st in task["subtasks"])
-                        description += subtask_list
-                    
-                    ics_content.extend([
-                        "BEGIN:VEVENT",
-                        f"UID:{uid}",
-                        f"DTSTAMP:{datetime.now().strftime('%Y%m%dT%H%M%SZ')}",
-                        f"DTSTART;VALUE=DATE:{deadline.strftime('%Y%m%d')}",
-                        f"DTEND;VALUE=DATE:{deadline.strftime('%Y%m%d')}",
-                        f"SUMMARY:{task['text']}",
-                        f"DESCRIPTION:{description}",
-                        "STATUS:CONFIRMED",
-                        "END:VEVENT"
-                    ])
-                except ValueError:
-                    logging.error(f"Неверный формат даты для задачи: {task['text']}")
-        
-        ics_content.append("END:VCALENDAR")
-        
-        with open("tasks.ics", "w", encoding="utf-8") as f:
-            f.write("\n".join(ics_content))
-        print("Задачи экспортированы в tasks.ics")
+            if action == "+":
+                self.add_dependency(task, blocker)
+            else:
+                self.remove_dependency(task, blocker)
+        except ValueError as e:
+            print(f"Ошибка: {e}!")
+            return
+        print("Зависимость добавлена!" if action == "+" else "Зависимость убрана!")
+
+    @timed("export_json")
+    def export_to_json(self, path="tasks.json", fmt="json", compression="auto", **filters):
+        """Экспортирует задачи в JSON потоково.
+
+        fmt: json (компактный массив), jsonl (JSON-строки) или pretty (с отступами);
+        compression: auto (по расширению .gz/.zst), gzip, zstd или None;
+        filters — те же критерии, что у filter_tasks: сериализуются только подходящие задачи.
+        """
+        count = export_json(self.iter_filtered(**filters), path, fmt, compression)
+        print(f"Задачи экспортированы в {path} ({count})")
+        return count
+
+    @timed("import_json")
+    def import_from_json(self, path="tasks.json", batch_size=IMPORT_BATCH_SIZE, progress=None):
+        """Импортирует задачи из JSON-массива или JSON-строк потоково.
+
+        Записи читаются по одной, проверяются и дописываются в файл задач пачками
+        по batch_size; дубликаты отсекаются по индексу текстов за O(1).
+        Возвращает словарь со счётчиками или None, если файла нет.
+        """
+        if not os.path.exists(path):
+            print(f"Файл {path} не найден.")
+            return None
+        if progress is None:
+            def progress(stats):
+                print(f"\rОбработано: {stats['read']}, импортировано: {stats['imported']}", end="", flush=True)
+        stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+        batch = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for record in iter_json_records(f):
+                    stats["read"] += 1
+                    try:
+                        task = normalize_task(record)
+                        task["deadline"] = self._check_deadline(task["deadline"])
+                        task["priority"] = self._check_priority(task["priority"])
+                        task["repeat"] = self._check_repeat(task["repeat"])
+                    except ValueError as e:
+                        stats["invalid"] += 1
+                        log_error(f"Ошибка импорта записи {stats['read']}: {str(e)}")
+                        continue
+                    if task["text"] in self._text_index():
+                        stats["duplicates"] += 1
+                        continue
+                    self._append_task(task)
+                    batch.append(task)
+                    stats["imported"] += 1
+                    if len(batch) >= batch_size:
+                        self._append_batch(batch)
+                        batch.clear()
+                        progress(stats)
+        except (ValueError, OSError) as e:
+            log_error(f"Ошибка импорта JSON: {str(e)}")
+            print("\nОшибка при импорте задач, уже проверенные пачки сохранены.")
+        finally:
+            if batch:
+                self._append_batch(batch)
+        progress(stats)
+        print(f"\nЗадачи импортированы из {path}: новых {stats['imported']}, "
+              f"дубликатов {stats['duplicates']}, с ошибками {stats['invalid']}")
+        return stats
+
+    @timed("export_ics")
+    def export_to_ics(self, path="tasks.ics", delta_path=None):
+        """Экспортирует задачи с дедлайнами в iCalendar (.ics) инкрементально.
+
+        UID события строится по постоянному id задачи; файл переписывается только
+        при изменениях. delta_path — файл только с добавленными/изменёнными/отменёнными событиями.
+        """
+        if self._ids_assigned:
+            # Новые id должны попасть в файл, иначе UID событий изменятся при следующем запуске
+            self.save()
+        stats = export_incremental(
+            self.tasks, path, parse_date,
+            delta_path=delta_path,
+            on_error=lambda task: log_error(f"Неверный формат даты для задачи: {task['text']}"))
+        print(f"Задачи экспортированы в {path}: новых {stats['added']}, изменено {stats['updated']}, "
+              f"отменено {stats['cancelled']}, без изменений {stats['unchanged']}")
+        return stats
+
+    def start_notifications(self, notifiers=None):
+        """Запускает планировщик уведомлений (каналы и время — из [notifications] в config.ini)."""
+        if self.scheduler is None:
+            from task_notify import NotificationScheduler, make_notifiers
+            config = get_config()
+            if notifiers is None:
+                channels = config.get("notifications", "channels", fallback="console")
+                notifiers = make_notifiers([c.strip() for c in channels.split(",") if c.strip()],
+                                           config.get("notifications", "log", fallback="notifications.log"))
+            notify_at = config.get("notifications", "notify_at", fallback="00:00")
+            hour, _, minute = notify_at.partition(":")
+            self.scheduler = NotificationScheduler(self, notifiers, time(int(hour), int(minute or 0)))
+        return self.scheduler
 
     def show_notifications(self):
-        """Показывает уведомления о срочных и просроченных задачах."""
-        urgent = [t for t in self.tasks if self.is_urgent(t["deadline"]) and not t["done"]]
-        overdue = [t for t in self.tasks if self.is_overdue(t["deadline"]) and not t["done"]]
-        if urgent or overdue:
+        """Показывает наступившие уведомления о дедлайнах (вершина кучи планировщика, без просмотра задач)."""
+        scheduler = self.start_notifications()
+        notifications = scheduler.due()
+        if notifications:
             print("\nУведомления:")
-            for task in urgent:
-                print(f"Срочная задача: {task['text']} (до {task['deadline']})")
-            for task in overdue:
-                line = f"Просрочена: {task['text']} (было до {task['deadline']})"
-                if COLORAMA_AVAILABLE:
-                    line = Fore.RED + line + Style.RESET_ALL
-                print(line)
-
-def main():
-    """Основной цикл программы."""
-    manager = TaskManager()
+            scheduler.send(notifications)
+
+def main(argv=None):
+    """Основной цикл программы (с аргументами — неинтерактивный режим)."""
+    argv = sys.argv[1:] if argv is None else argv
+    if "--no-color" in argv:
+        argv = [arg for arg in argv if arg != "--no-color"]
+        set_color(False)
+    if argv:
+        from task_cli import run
+        return run(argv)
+    manager = TaskManager(background=True)
+    notified = False
+    actions = {
+        "1": ("show_tasks", manager.browse_tasks),
+        "2": ("show_by_category", manager.show_by_category),
+        "3": ("show_by_priority", manager.show_by_priority),
+        "4": ("show_by_tag", manager.show_by_tag),
+        "5": ("show_by_text", manager.show_by_text),
+        "6": ("show_overdue", manager.show_overdue),
+        "7": ("show_urgent", manager.show_urgent),
+        "8": ("add_task", manager.add_task),
+        "9": ("mark_done", lambda: manager.mark_task(done=True)),
+        "10": ("mark_undone", lambda: manager.mark_task(done=False)),
+        "11": ("mark_multiple_tasks", manager.mark_multiple_tasks),
+        "12": ("mark_subtask", manager.mark_subtask),
+        "13": ("delete_task", manager.delete_task),
+        "14": ("edit_task", manager.edit_task),
+        "15": ("clear_done_tasks", manager.clear_done_tasks),
+        "16": ("show_archive", manager.show_archive),
+        "17": ("show_stats", manager.show_stats),
+        "18": ("export_to_json", manager.export_to_json),
+        "19": ("import_from_json", manager.import_from_json),
+        "20": ("export_to_ics", manager.export_to_ics),
+        "22": ("show_most_urgent", manager.show_most_urgent),
+        "23": ("search_archive", manager.search_archive),
+        "24": ("show_trends", manager.show_trends),
+        "25": ("show_dependencies", manager.show_dependencies),
+    }
     
     while True:
         print("\n=== Список дел ===")
@@ -556,54 +1784,33 @@ def main():
         print("19. Импортировать из JSON")
         print("20. Экспортировать в iCalendar")
         print("21. Выйти")
+        print("22. Самые срочные задачи")
+        print("23. Поиск в архиве")
+        print("24. Отчёт о продуктивности")
+        print("25. Зависимости задач")
         
-        choice = input("Твой выбор (1-21): ").strip()
+        choice = input("Твой выбор (1-25): ").strip()
         
-        if choice == "1":
-            manager.show_tasks()
-        elif choice == "2":
-            manager.show_by_category()
-        elif choice == "3":
-            manager.show_by_priority()
-        elif choice == "4":
-            manager.show_by_tag()
-        elif choice == "5":
-            manager.show_by_text()
-        elif choice == "6":
-            manager.show_overdue()
-        elif choice == "7":
-            manager.show_urgent()
-        elif choice == "8":
-            manager.add_task()
-        elif choice == "9":
-            manager.mark_task(done=True)
-        elif choice == "10":
-            manager.mark_task(done=False)
-        elif choice == "11":
-            manager.mark_multiple_tasks()
-        elif choice == "12":
-            manager.mark_subtask()
-        elif choice == "13":
-            manager.delete_task()
-        elif choice == "14":
-            manager.edit_task()
-        elif choice == "15":
-            manager.clear_done_tasks()
-        elif choice == "16":
-            manager.show_archive()
-        elif choice == "17":
-            manager.show_stats()
-        elif choice == "18":
-            manager.export_to_json()
-        elif choice == "19":
-            manager.import_from_json()
-        elif choice == "20":
-            manager.export_to_ics()
-        elif choice == "21":
+        if choice == "21":
+            manager.write_snapshot()
             print("Пока! Все задачи сохранены.")
             break
-        else:
+        if not notified:
+            notified = True
+        elif manager.refresh():
+            print("Файл задач изменён другим процессом — список обновлён.")
+        # Перед каждым действием — только наступившие пороги (первый раз — после загрузки)
+        manager.show_notifications()
+        action = actions.get(choice)
+        if action is None:
             print("Неверный выбор, попробуй снова.")
+            continue
+        name, func = action
+        with METRICS.timed(f"action:{name}"):
+            if METRICS.profile:
+                run_profiled(name, func)
+            else:
+                func()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -1,174 +1,17 @@
-import os
-import json
-import logging
-from datetime import datetime, timedelta
-import configparser
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-
-# Настройка логирования
-logging.basicConfig(filename="errors.log", level=logging.ERROR, encoding="utf-8")
-
-# Конфигурация
-CONFIG_FILE = "config.ini"
-FILENAME = "todo.txt"
-ARCHIVE_FILENAME = "archive.txt"
-
-def load_config():
-    """Загружает конфигурацию из config.ini."""
-    config = configparser.ConfigParser(interpolation=None)
-    config.read(CONFIG_FILE)
-    config.set("DEFAULT", "date_format", "%Y-%m-%d")
-    return config
-
-CONFIG = load_config()
-DATE_FORMAT = CONFIG["DEFAULT"]["date_format"]
-
-class TaskManager:
-    def __init__(self):
-        self.tasks = self.load_tasks(FILENAME)
-        self.categories = set(task["category"] for task in self.tasks if task["category"])
-
-    def load_tasks(self, filename):
-        tasks = []
-        if os.path.exists(filename):
-            with open(filename, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        parts = line.strip().split("|")
-                        if len(parts) < 4:
-                            raise ValueError("Неверный формат строки")
-                        status, category, text, priority = parts[:4]
-                        deadline = parts[4] if len(parts) > 4 else ""
-                        tags = parts[5].split(",") if len(parts) > 5 and parts[5] else []
-                        repeat = parts[6] if len(parts) > 6 else ""
-                        subtasks = json.loads(parts[7]) if len(parts) > 7 and parts[7] else []
-                        tasks.append({
-                            "done": status == "1",
-                            "category": category,
-                            "text": text,
-                            "priority": priority,
-                            "deadline": deadline,
-                            "tags": tags,
-                            "repeat": repeat,
-                            "subtasks": subtasks
-                        })
-                    except Exception as e:
-                        logging.error(f"Ошибка загрузки строки: {line.strip()}, {str(e)}")
-        return tasks
-
-    def save_tasks(self, filename, tasks):
-        with open(filename, "w", encoding="utf-8") as f:
-            for task in tasks:
-                status = "1" if task["done"] else "0"
-                tags = ",".join(task["tags"])
-                subtasks = json.dumps(task["subtasks"], ensure_ascii=False)
-                f.write(f"{status}|{task['category']}|{task['text']}|{task['priority']}|{task['deadline']}|{tags}|{task['repeat']}|{subtasks}\n")
-
-    def is_overdue(self, deadline):
-        if not deadline:
-            return False
-        try:
-            deadline_date = datetime.strptime(deadline, DATE_FORMAT).date()
-            today = datetime.now().date()
-            return deadline_date < today
-        except ValueError:
-            return False
-
-    def is_urgent(self, deadline):
-        if not deadline:
-            return False
-        try:
-            deadline_date = datetime.strptime(deadline, DATE_FORMAT).date()
-            today = datetime.now().date()
-            tomorrow = today + timedelta(days=1)
-            return deadline_date in [today, tomorrow]
-        except ValueError:
-            return False
-
-    def filter_tasks(self, category=None, priority=None, tag=None, only_overdue=False, only_urgent=False, search_text=None):
-        filtered = self.tasks
-        if category:
-            filtered = [t for t in filtered if t["category"] == category]
-        if priority:
-            filtered = [t for t in filtered if t["priority"] == priority]
-        if tag:
-            filtered = [t for t in filtered if tag in t["tags"]]
-        if only_overdue:
-            filtered = [t for t in filtered if self.is_overdue(t["deadline"])]
-        if only_urgent:
-            filtered = [t for t in filtered if self.is_urgent(t["deadline"])]
-        if search_text:
-            search_text = search_text.lower()
-            filtered = [t for t in filtered if search_text in t["text"].lower() or any(search_text in st["text"].lower() for st in t["subtasks"])]
-        return filtered
+from tkinter import ttk, messagebox
+from task_manager import TaskManager
+from task_dates import normalize_date
 
-    def export_to_ics(self):
-        ics_content = [
-            "BEGIN:VCALENDAR",
-            "VERSION:2.0",
-            "PRODID:-//LegendaryTaskManager//Grok3//EN",
-            "CALSCALE:GREGORIAN"
-        ]
-        for task in self.tasks:
-            if task["deadline"]:
-                try:
-                    deadline = datetime.strptime(task["deadline"], DATE_FORMAT)
-                    uid = f"{task['text'].replace(' ', '_')}_{deadline.strftime('%Y%m%d')}@legendarytaskmanager"
-                    description = f"Категория: {task['category']}\\nПриоритет: {task['priority']}"
-                    if task["tags"]:
-                        description += f"\\nТеги: {', '.join(task['tags'])}"
-                    if task["repeat"]:
-                        description += f"\\nПовтор: {task['repeat']}"
-                    if task["subtasks"]:
-                        subtask_list = "\\nПодзадачи:\\n" + "\\n".join(f"- {'[x]' if st['done'] else '[ ]'} {st['text']}" for st in task["subtasks"])
-                        description += subtask_list
-                    ics_content.extend([
-                        "BEGIN:VEVENT",
-                        f"UID:{uid}",
-                        f"DTSTAMP:{datetime.now().strftime('%Y%m%dT%H%M%SZ')}",
-                        f"DTSTART;VALUE=DATE:{deadline.strftime('%Y%m%d')}",
-                        f"DTEND;VALUE=DATE:{deadline.strftime('%Y%m%d')}",
-                        f"SUMMARY:{task['text']}",
-                        f"DESCRIPTION:{description}",
-                        "STATUS:CONFIRMED",
-                        "END:VEVENT"
-                    ])
-                except ValueError:
-                    logging.error(f"Неверный формат даты для задачи: {task['text']}")
-        ics_content.append("END:VCALENDAR")
-        with open("tasks.ics", "w", encoding="utf-8") as f:
-            f.write("\n".join(ics_content))
-
-    def export_to_json(self):
-        with open("tasks.json", "w", encoding="utf-8") as f:
-            json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+# Как часто проверять, не изменили ли файл задач CLI или веб-приложение (мс).
+# Проверка — один os.stat, файл читается только при реальном изменении.
+WATCH_INTERVAL_MS = 1000
+MAX_NOTIFY_DELAY_MS = 24 * 60 * 60 * 1000  # after() не рассчитан на очень долгие ожидания
+NOTIFY_POPUP_LINES = 15
 
 def parse_date(date_str):
     """Парсит дату из строки в разных форматах и возвращает в формате %Y-%m-%d."""
-    if not date_str:
-        return ""
-    
-    # Список поддерживаемых форматов
-    date_formats = [
-        "%Y-%m-%d",    # 2025-04-09
-        "%d.%m.%Y",    # 09.04.2025
-        "%d-%m-%Y",    # 09-04-2025
-        "%Y/%m/%d",    # 2025/04/09
-        "%d/%m/%Y",    # 09/04/2025
-        "%Y.%m.%d",    # 2025.04.09
-    ]
-    
-    for fmt in date_formats:
-        try:
-            parsed_date = datetime.strptime(date_str.strip(), fmt)
-            return parsed_date.strftime("%Y-%m-%d")
-        except ValueError:
-            continue
-    
-    # Если ни один формат не подошёл
-    examples = "Примеры: 2025-04-09, 09.04.2025, 09-04-2025, 2025/04/09"
-    raise ValueError(f"Неверный формат даты! {examples}")
+    return normalize_date(date_str)
 
 class AddTaskDialog(tk.Toplevel):
     def __init__(self, parent, manager):
@@ -204,7 +47,7 @@ class AddTaskDialog(tk.Toplevel):
         if not text:
             messagebox.showerror("Ошибка", "Текст задачи не может быть пустым!")
             return
-        if any(task["text"] == text for task in self.manager.tasks):
+        if self.manager.find_task(text) is not None:
             messagebox.showerror("Ошибка", "Такая задача уже существует!")
             return
 
@@ -220,18 +63,11 @@ class AddTaskDialog(tk.Toplevel):
                 messagebox.showerror("Ошибка", str(e))
                 return
 
-        self.manager.tasks.append({
-            "done": False,
-            "category": category,
-            "text": text,
-            "priority": priority,
-            "deadline": deadline,
-            "tags": [],
-            "repeat": "",
-            "subtasks": []
-        })
-        self.manager.save_tasks(FILENAME, self.manager.tasks)
-        self.manager.categories.add(category)
+        try:
+            self.manager.create_task(text, category, priority, deadline)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
         self.destroy()
 
 class TaskManagerApp:
@@ -301,7 +137,20 @@ class TaskManagerApp:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
 
+        self.filters = {}
         self.update_task_list()
+        self.root.after(WATCH_INTERVAL_MS, self.watch_file)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Уведомления: один after() до ближайшего порога в куче планировщика
+        self.notifications = self.manager.start_notifications(notifiers=[])
+        self.notify_job = None
+        self.plan_notifications()
+
+    def close(self):
+        # Снимок ускоряет следующий запуск; устаревший снимок просто игнорируется
+        self.manager.write_snapshot()
+        self.root.destroy()
 
     def update_task_list(self):
         for item in self.task_tree.get_children():
@@ -310,61 +159,112 @@ class TaskManagerApp:
         category = self.category_var.get() if self.category_var.get() != "Все" else None
         priority = self.priority_var.get() if self.priority_var.get() != "Все" else None
         search_text = self.search_var.get() if self.search_var.get() else None
+        self.filters = {"category": category, "priority": priority, "search_text": search_text}
 
-        filtered_tasks = self.manager.filter_tasks(category=category, priority=priority, search_text=search_text)
+        filtered_tasks = self.manager.filter_tasks(**self.filters)
         
         for task in filtered_tasks:
-            done_mark = "[x]" if task["done"] else "[ ]"
-            text = task["text"]
-            if self.manager.is_overdue(task["deadline"]):
-                text += " [Просрочено]"
-            elif self.manager.is_urgent(task["deadline"]) and not task["done"]:
-                text += " [Срочно]"
-            self.task_tree.insert("", "end", values=(done_mark, text, task["category"], task["priority"], task["deadline"] or ""))
+            self.task_tree.insert("", "end", iid=task["id"], values=self.task_row(task))
+
+    def task_row(self, task):
+        done_mark = "[x]" if task["done"] else "[ ]"
+        text = task["text"]
+        if self.manager.is_overdue(task["deadline"]):
+            text += " [Просрочено]"
+        elif self.manager.is_urgent(task["deadline"]) and not task["done"]:
+            text += " [Срочно]"
+        return (done_mark, text, task["category"], task["priority"], task["deadline"] or "")
+
+    def matches_filters(self, task):
+        return any(True for _ in self.manager.iter_filtered(**self.filters, tasks=[task]))
+
+    def show_task(self, task):
+        """Обновляет одну строку списка: вставляет, перерисовывает или убирает её по фильтрам."""
+        if not self.matches_filters(task):
+            if self.task_tree.exists(task["id"]):
+                self.task_tree.delete(task["id"])
+        elif self.task_tree.exists(task["id"]):
+            self.task_tree.item(task["id"], values=self.task_row(task))
+        else:
+            self.task_tree.insert("", "end", iid=task["id"], values=self.task_row(task))
+
+    def plan_notifications(self):
+        """Переставляет таймер уведомлений на ближайший порог (после любых изменений задач)."""
+        if self.notify_job is not None:
+            self.root.after_cancel(self.notify_job)
+            self.notify_job = None
+        delay = self.notifications.delay()
+        if delay is not None:
+            self.notify_job = self.root.after(min(int(delay * 1000) + 1, MAX_NOTIFY_DELAY_MS), self.fire_notifications)
+
+    def fire_notifications(self):
+        self.notify_job = None
+        due = self.notifications.due()
+        if due:
+            lines = [n.message for n in due[:NOTIFY_POPUP_LINES]]
+            if len(due) > NOTIFY_POPUP_LINES:
+                lines.append(f"... и ещё {len(due) - NOTIFY_POPUP_LINES}")
+            for notification in due:
+                if self.task_tree.exists(notification.task["id"]):
+                    self.task_tree.item(notification.task["id"], values=self.task_row(notification.task))
+            messagebox.showwarning("Уведомления", "\n".join(lines))
+        self.plan_notifications()
+
+    def watch_file(self):
+        """Периодически подтягивает изменения файла, сделанные другими программами."""
+        self.apply_external_changes()
+        self.root.after(WATCH_INTERVAL_MS, self.watch_file)
+
+    def apply_external_changes(self):
+        """Переносит в список только изменения, сделанные в файле другими программами."""
+        try:
+            delta = self.manager.sync_from_disk()
+        except (OSError, TimeoutError):
+            delta = None  # файл занят или недоступен — попробуем в следующий раз
+        if delta is not None:
+            added, updated, removed = delta
+            for task in removed:
+                if self.task_tree.exists(task["id"]):
+                    self.task_tree.delete(task["id"])
+            for task in added + updated:
+                self.show_task(task)
+            if added or updated:
+                self.category_combo["values"] = ["Все"] + list(self.manager.categories)
+                self.plan_notifications()
+
+    def selected_task(self):
+        # Сначала подтягиваем чужие изменения, чтобы действие применялось к актуальной задаче
+        self.apply_external_changes()
+        selected = self.task_tree.selection()
+        if not selected:
+            messagebox.showwarning("Предупреждение", "Выбери задачу!")
+            return None
+        task = self.manager.get_task(selected[0])
+        if task is None:
+            messagebox.showerror("Ошибка", "Не удалось определить задачу!")
+        return task
 
     def add_task(self):
+        self.apply_external_changes()
         dialog = AddTaskDialog(self.root, self.manager)
         self.root.wait_window(dialog)
         self.category_combo["values"] = ["Все"] + list(self.manager.categories)
         self.update_task_list()
+        self.plan_notifications()
 
     def mark_task(self):
-        selected = self.task_tree.selection()
-        if not selected:
-            messagebox.showwarning("Предупреждение", "Выбери задачу!")
-            return
-        
-        item = self.task_tree.item(selected[0])
-        values = item["values"]
-        if not values or len(values) < 2:
-            messagebox.showerror("Ошибка", "Не удалось определить задачу!")
-            return
-        
-        task_text = str(values[1]).split(" [")[0]
-        for task in self.manager.tasks:
-            if task["text"] == task_text:
-                task["done"] = not task["done"]
-                break
-        self.manager.save_tasks(FILENAME, self.manager.tasks)
-        self.update_task_list()
+        task = self.selected_task()
+        if task is not None:
+            self.manager.set_done(task, not task["done"])
+            self.show_task(task)
+            self.plan_notifications()
 
     def delete_task(self):
-        selected = self.task_tree.selection()
-        if not selected:
-            messagebox.showwarning("Предупреждение", "Выбери задачу!")
-            return
-        
-        item = self.task_tree.item(selected[0])
-        values = item["values"]
-        if not values or len(values) < 2:
-            messagebox.showerror("Ошибка", "Не удалось определить задачу!")
-            return
-        
-        task_text = str(values[1]).split(" [")[0]
-        self.manager.tasks = [task for task in self.manager.tasks if task["text"] != task_text]
-        self.manager.save_tasks(FILENAME, self.manager.tasks)
-        self.update_task_list()
-        messagebox.showinfo("Успех", f"Удалено: {task_text}")
+        task = self.selected_task()
+        if task is not None:
+            self.manager.remove_task(task)
+            self.task_tree.delete(task["id"])
+            messagebox.showinfo("Успех", f"Удалено: {task['text']}")
 
     def export_to_ics(self):
         self.manager.export_to_ics()
@@ -376,7 +276,7 @@ class TaskManagerApp:
 
 def main():
     root = tk.Tk()
-    app = TaskManagerApp(root)
+    TaskManagerApp(root)
     root.mainloop()
 
 if __name__ == "__main__":
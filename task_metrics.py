@@ -0,0 +1,163 @@
+"""Опциональная инструментация менеджера задач.
+
+Включается через config.ini (секция [metrics]) или переменные окружения:
+    TASK_MANAGER_METRICS=1               — замеры времени и счётчики операций
+    TASK_MANAGER_METRICS_FILE=путь       — куда дописывать метрики при выходе
+    TASK_MANAGER_PROFILE=cprofile|tracemalloc — профилирование действий меню
+Без включения обёртки стоят одну проверку флага на вызов.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+ENV_ENABLED = "TASK_MANAGER_METRICS"
+ENV_OUTPUT = "TASK_MANAGER_METRICS_FILE"
+ENV_PROFILE = "TASK_MANAGER_PROFILE"
+DEFAULT_OUTPUT = "metrics.jsonl"
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+class Metrics:
+    """Собирает количество вызовов и время выполнения по именам операций."""
+
+    def __init__(self):
+        self.enabled = False
+        self.output = DEFAULT_OUTPUT
+        self.profile = ""
+        self.started = time.time()
+        self._ops = {}
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    def record(self, name, seconds, items=None):
+        """Добавляет один замер операции."""
+        with self._lock:
+            op = self._ops.get(name)
+            if op is None:
+                op = self._ops[name] = {"count": 0, "total": 0.0, "min": seconds, "max": seconds, "items": 0}
+            op["count"] += 1
+            op["total"] += seconds
+            op["min"] = min(op["min"], seconds)
+            op["max"] = max(op["max"], seconds)
+            if items is not None:
+                op["items"] += items
+
+    @contextmanager
+    def timed(self, name):
+        """Контекстный менеджер для замера произвольного блока кода."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Возвращает метрики в виде словаря, пригодного для JSON."""
+        with self._lock:
+            operations = {
+                name: {
+                    "count": op["count"],
+                    "total_ms": round(op["total"] * 1000, 3),
+                    "avg_ms": round(op["total"] * 1000 / op["count"], 3),
+                    "min_ms": round(op["min"] * 1000, 3),
+                    "max_ms": round(op["max"] * 1000, 3),
+                    "items": op["items"],
+                }
+                for name, op in sorted(self._ops.items())
+            }
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "operations": operations,
+        }
+
+    def dump(self, path=None):
+        """Дописывает снимок метрик одной JSON-строкой в файл."""
+        if not self._ops:
+            return
+        with open(path or self.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(), ensure_ascii=False) + "\n")
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+        self.started = time.time()
+
+
+METRICS = Metrics()
+
+
+def _is_true(value):
+    return str(value).strip().lower() in ("1", "yes", "true", "on", "да")
+
+
+def configure(config=None):
+    """Настраивает METRICS по секции [metrics] конфигурации и переменным окружения."""
+    section = config["metrics"] if config is not None and config.has_section("metrics") else {}
+    METRICS.enabled = _is_true(os.environ.get(ENV_ENABLED, section.get("enabled", "no")))
+    METRICS.output = os.environ.get(ENV_OUTPUT, section.get("output", DEFAULT_OUTPUT)) or DEFAULT_OUTPUT
+    profile = os.environ.get(ENV_PROFILE, section.get("profile", "")).strip().lower()
+    METRICS.profile = profile if profile in PROFILE_MODES else ""
+    if METRICS.enabled and not METRICS._atexit_registered:
+        atexit.register(METRICS.dump)
+        METRICS._atexit_registered = True
+    return METRICS
+
+
+def timed(name, count_items=False):
+    """Декоратор: замеряет вызовы функции под именем name.
+
+    При count_items=True длина результата добавляется в счётчик items.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            items = len(result) if count_items and result is not None else None
+            METRICS.record(name, time.perf_counter() - start, items)
+            return result
+        return wrapper
+    return decorator
+
+
+def run_profiled(name, func, mode=None, out=None):
+    """Выполняет действие меню под cProfile или tracemalloc и печатает сводку."""
+    mode = METRICS.profile if mode is None else mode
+    out = out or sys.stderr
+    if mode == "cprofile":
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func)
+        finally:
+            path = f"profile_{name}.prof"
+            profiler.dump_stats(path)
+            print(f"\n[профиль {name}] сохранён в {path}", file=out)
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+    if mode == "tracemalloc":
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            return func()
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"\n[память {name}] текущая: {current / 1024:.1f} КБ, пик: {peak / 1024:.1f} КБ", file=out)
+            for stat in snapshot.statistics("lineno")[:10]:
+                print(f"  {stat}", file=out)
+    return func()
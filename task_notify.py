@@ -0,0 +1,225 @@
+"""Планировщик уведомлений о дедлайнах на куче ближайших срабатываний.
+
+У невыполненной задачи с дедлайном D три порога (в час notify_at):
+    накануне D        — «срок завтра»
+    в день D          — «срок сегодня»
+    на следующий день — «просрочено»
+В куче (heapq) лежит только ближайший ещё не сработавший порог каждой задачи;
+после срабатывания туда кладётся следующий. Планировщик спит до вершины
+кучи (Event.wait в режиме службы, after() в GUI) и не просматривает задачи.
+Изменённая задача получает новую запись, а старая считается устаревшей и
+отбрасывается при извлечении. Пороги, прошедшие до запуска, дают одно
+уведомление о текущем состоянии задачи.
+"""
+import heapq
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, time as day_time
+
+from task_dates import try_parse_date
+from task_render import Output
+
+STAGES = (
+    (-1, "tomorrow", "Срок завтра"),
+    (0, "today", "Срок сегодня"),
+    (1, "overdue", "Просрочено"),
+)
+DEFAULT_NOTIFY_AT = day_time(0, 0)
+COMPACT_SLACK = 1024  # сколько устаревших записей терпеть в куче сверх числа актуальных
+
+
+class Notification:
+    """Сработавший порог задачи."""
+
+    __slots__ = ("kind", "task", "message")
+
+    def __init__(self, kind, task, message):
+        self.kind = kind
+        self.task = task
+        self.message = message
+
+
+class NotificationScheduler:
+    """Очередь порогов по задачам manager; notifiers — функции, принимающие Notification."""
+
+    def __init__(self, manager, notifiers=None, notify_at=DEFAULT_NOTIFY_AT, clock=time.time):
+        self.manager = manager
+        self.notifiers = [console_notifier] if notifiers is None else list(notifiers)
+        self.notify_at = notify_at
+        self.clock = clock
+        self._heap = []
+        self._pending = {}  # id задачи -> (дедлайн, этап, номер записи) её актуальной записи в куче
+        self._fired = {}  # id задачи -> (дедлайн, последний сработавший этап)
+        self._seq = 0
+        self._wakeup = threading.Event()  # будит run() при изменении задач или остановке
+        self._stopped = False
+        self.rebuild()
+
+    def _threshold(self, deadline, stage):
+        day = deadline + timedelta(days=STAGES[stage][0])
+        return datetime.combine(day, self.notify_at).timestamp()
+
+    def _push(self, task_id, deadline_text, stage, at):
+        self._seq += 1
+        self._pending[task_id] = (deadline_text, stage, self._seq)
+        heapq.heappush(self._heap, (at, self._seq, task_id, deadline_text, stage))
+        if len(self._heap) > 2 * len(self._pending) + COMPACT_SLACK:
+            # Частые правки оставляют много устаревших записей: выбрасываем их разом
+            pending = self._pending
+            self._heap = [entry for entry in self._heap if pending.get(entry[2]) == (entry[3], entry[4], entry[1])]
+            heapq.heapify(self._heap)
+
+    def _schedule(self, task, now):
+        """Кладёт в кучу ближайший порог задачи; прошедшие пороги сворачиваются в один текущий."""
+        task_id = task.get("id")
+        self._pending.pop(task_id, None)
+        if task["done"] or not task["deadline"]:
+            return
+        deadline = try_parse_date(task["deadline"])
+        if deadline is None:
+            return
+        fired_deadline, fired_stage = self._fired.get(task_id, (None, -1))
+        first = fired_stage + 1 if fired_deadline == task["deadline"] else 0
+        passed = first
+        while passed < len(STAGES) and self._threshold(deadline, passed) <= now:
+            passed += 1
+        if passed > first:
+            self._push(task_id, task["deadline"], passed - 1, now)  # уже наступило: уведомить сразу
+        elif first < len(STAGES):
+            self._push(task_id, task["deadline"], first, self._threshold(deadline, first))
+
+    def rebuild(self):
+        """Строит кучу заново по всем задачам (при запуске или после полной перезагрузки)."""
+        now = self.clock()
+        self._heap = []
+        self._pending = {}
+        for task in self.manager.tasks:
+            self._schedule(task, now)
+        self._wakeup.set()
+
+    def task_changed(self, task):
+        """Задача добавлена или изменена (дедлайн, статус): её запись в куче заменяется."""
+        self._schedule(task, self.clock())
+        self._wakeup.set()
+
+    def next_time(self):
+        """Время ближайшего порога (timestamp) или None, если ждать нечего."""
+        heap = self._heap
+        while heap:
+            at, seq, task_id, deadline, stage = heap[0]
+            if self._pending.get(task_id) == (deadline, stage, seq):
+                return at
+            heapq.heappop(heap)  # устаревшая запись
+        return None
+
+    def due(self, now=None):
+        """Извлекает все наступившие пороги и возвращает уведомления (не отправляя их)."""
+        now = self.clock() if now is None else now
+        result = []
+        while True:
+            at = self.next_time()
+            if at is None or at > now:
+                return result
+            _, _, task_id, deadline_text, stage = heapq.heappop(self._heap)
+            del self._pending[task_id]
+            task = self.manager.get_task(task_id)
+            if task is None or task["done"] or task["deadline"] != deadline_text:
+                continue
+            self._fired[task_id] = (deadline_text, stage)
+            _, kind, label = STAGES[stage]
+            result.append(Notification(kind, task, f"{label}: {task['text']} (до {deadline_text})"))
+            if stage + 1 < len(STAGES):
+                self._push(task_id, deadline_text, stage + 1,
+                           max(self._threshold(try_parse_date(deadline_text), stage + 1), now))
+
+    def fire(self, now=None):
+        """Отправляет наступившие уведомления всем получателям; возвращает их число."""
+        notifications = self.due(now)
+        self.send(notifications)
+        return len(notifications)
+
+    def send(self, notifications):
+        for notification in notifications:
+            for notifier in self.notifiers:
+                try:
+                    notifier(notification)
+                except Exception as e:  # один сломанный получатель не должен останавливать остальных
+                    print(f"Ошибка уведомления: {e}", file=sys.stderr)
+
+    def delay(self):
+        """Сколько секунд спать до ближайшего порога (None — до изменения задач)."""
+        at = self.next_time()
+        return None if at is None else max(0.0, at - self.clock())
+
+    def run(self, refresh_interval=None):
+        """Режим службы: спит до ближайшего порога, не тратя процессор между событиями.
+
+        refresh_interval — как часто (в секундах) подтягивать изменения файла другими процессами;
+        изменения доходят до кучи через task_changed. Останавливается вызовом stop().
+        """
+        self._stopped = False
+        while not self._stopped:
+            self._wakeup.clear()
+            self.fire()
+            timeout = self.delay()
+            if refresh_interval is not None:
+                timeout = refresh_interval if timeout is None else min(timeout, refresh_interval)
+            if not self._wakeup.wait(timeout) and refresh_interval is not None:
+                self.manager.refresh()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+
+def console_notifier(notification, stream=None):
+    """Уведомление в консоль (просроченные — красным, если вывод в терминал)."""
+    with Output(stream) as out:
+        if notification.kind == "overdue":
+            out.red(notification.message)
+        else:
+            out.line(notification.message)
+
+
+def log_notifier(path):
+    """Получатель, дописывающий уведомления с отметкой времени в файл path."""
+    def notify(notification):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"{datetime.now().isoformat(timespec='seconds')} {notification.message}\n")
+    return notify
+
+
+def desktop_notifier(notification):
+    """Уведомление на рабочий стол: plyer, если установлен, иначе notify-send / osascript."""
+    import shutil
+    import subprocess
+    title = "Список дел"
+    try:
+        from plyer import notification as plyer_notification
+    except ImportError:
+        plyer_notification = None
+    if plyer_notification is not None:
+        plyer_notification.notify(title=title, message=notification.message)
+    elif sys.platform.startswith("linux") and shutil.which("notify-send"):
+        subprocess.run(["notify-send", title, notification.message], check=False)
+    elif sys.platform == "darwin":
+        message = notification.message.replace('"', '\\"')
+        subprocess.run(["osascript", "-e", f'display notification "{message}" with title "{title}"'], check=False)
+    else:
+        console_notifier(notification)
+
+
+def make_notifiers(channels, log_path="notifications.log"):
+    """Получатели по списку каналов: console, log, desktop."""
+    notifiers = []
+    for channel in channels:
+        if channel == "console":
+            notifiers.append(console_notifier)
+        elif channel == "log":
+            notifiers.append(log_notifier(log_path))
+        elif channel == "desktop":
+            notifiers.append(desktop_notifier)
+        else:
+            raise ValueError(f"неизвестный канал уведомлений: {channel}")
+    return notifiers
@@ -0,0 +1,250 @@
+"""Правила повторения задач.
+
+Повторяющаяся задача хранится в одном экземпляре: поле repeat содержит
+правило, а дедлайн — ближайшее невыполненное повторение. Выполнение
+повторения сдвигает дедлайн на следующее (advance), копии задачи не
+создаются. Будущие повторения генерируются лениво (iter_occurrences).
+
+Поддерживаемые правила:
+    ежедневно, еженедельно, ежемесячно, ежегодно
+    каждые N дней / недель / месяцев / лет (каждый день, каждую неделю, ...)
+    подмножество RRULE: FREQ=DAILY|WEEKLY|MONTHLY|YEARLY, INTERVAL, COUNT,
+        UNTIL=ГГГГММДД, BYDAY=MO,TU,... (для WEEKLY), BYMONTHDAY=N (для
+        MONTHLY и YEARLY), а также EXDATE=ГГГГММДД,... — пропущенные
+        повторения (исключения)
+COUNT хранит число оставшихся повторений, включая текущее, а из EXDATE
+удаляются прошедшие даты, поэтому правило не растёт со временем.
+Ежемесячное и ежегодное повторение с 29-го числа и позже запоминает
+число в BYMONTHDAY: иначе после короткого месяца (31.01 -> 28.02) все
+следующие даты съехали бы на 28-е.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+
+FREQS = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+WORDS = {"ежедневно": "DAILY", "еженедельно": "WEEKLY", "ежемесячно": "MONTHLY", "ежегодно": "YEARLY"}
+UNIT_WORDS = {
+    "DAILY": ("день", "дня", "дней"),
+    "WEEKLY": ("неделю", "недели", "недель"),
+    "MONTHLY": ("месяц", "месяца", "месяцев"),
+    "YEARLY": ("год", "года", "лет"),
+}
+EXAMPLES = "ежедневно, еженедельно, ежемесячно, каждые 3 дня, FREQ=WEEKLY;BYDAY=MO,TH"
+
+_EVERY_RE = re.compile(r"кажд\w*\s+(?:(\d+)\s+)?(д|н|м|г|л)\w*\Z")
+_UNITS = {"д": "DAILY", "н": "WEEKLY", "м": "MONTHLY", "г": "YEARLY", "л": "YEARLY"}
+
+
+class Rule:
+    """Разобранное правило повторения."""
+
+    __slots__ = ("freq", "interval", "count", "until", "byday", "exdates", "bymonthday")
+
+    def __init__(self, freq, interval=1, count=None, until=None, byday=(), exdates=(), bymonthday=None):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.byday = tuple(sorted(set(byday)))
+        self.exdates = tuple(sorted(set(exdates)))
+        self.bymonthday = bymonthday
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def next_after(self, day, anchor=None):
+        """Ближайшая дата сетки правила после day (без учёта COUNT, UNTIL и EXDATE).
+
+        anchor — дата, от которой отсчитывается INTERVAL (по умолчанию day).
+        """
+        anchor = anchor or day
+        if self.freq == "DAILY":
+            return day + timedelta(days=self.interval)
+        if self.freq == "WEEKLY":
+            if not self.byday:
+                return day + timedelta(weeks=self.interval)
+            weekdays = {WEEKDAYS.index(code) for code in self.byday}
+            anchor_week = anchor - timedelta(days=anchor.weekday())
+            candidate = day + timedelta(days=1)
+            while True:
+                week = (candidate - anchor_week).days // 7
+                if week % self.interval == 0 and candidate.weekday() in weekdays:
+                    return candidate
+                candidate += timedelta(days=1)
+        months = self.interval * (12 if self.freq == "YEARLY" else 1)
+        # Число месяца — из BYMONTHDAY или anchor: 31-е в коротком месяце становится последним днём
+        total = day.year * 12 + day.month - 1 + months
+        year, month = divmod(total, 12)
+        return date(year, month + 1, min(self.bymonthday or anchor.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def parse_rule(text):
+    """Разбирает правило; пустая строка или "нет" — None. При ошибке бросает ValueError."""
+    text = (text or "").strip()
+    lowered = text.lower()
+    if not lowered or lowered == "нет":
+        return None
+    if lowered in WORDS:
+        return Rule(WORDS[lowered])
+    match = _EVERY_RE.match(lowered)
+    if match:
+        interval = int(match.group(1) or 1)
+        if interval < 1:
+            raise ValueError(f"Неверное правило повторения: {text}")
+        return Rule(_UNITS[match.group(2)], interval)
+    return _parse_rrule(text)
+
+
+def _parse_ics_date(value):
+    try:
+        value = value.replace("-", "")[:8]
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    except ValueError:
+        raise ValueError(f"Неверная дата в правиле повторения: {value}")
+
+
+def _parse_rrule(text):
+    body = text.upper()
+    if body.startswith("RRULE:"):
+        body = body[len("RRULE:"):]
+    fields = {}
+    for part in body.split(";"):
+        key, sep, value = part.strip().partition("=")
+        if not sep or not value:
+            raise ValueError(f"Неверное правило повторения. Примеры: {EXAMPLES}")
+        fields[key] = value
+    freq = fields.pop("FREQ", None)
+    if freq not in FREQS:
+        raise ValueError(f"Неверное правило повторения. Примеры: {EXAMPLES}")
+    try:
+        interval = int(fields.pop("INTERVAL", "1"))
+        count = int(fields.pop("COUNT")) if "COUNT" in fields else None
+    except ValueError:
+        raise ValueError("INTERVAL и COUNT должны быть числами")
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("INTERVAL и COUNT должны быть положительными")
+    until = _parse_ics_date(fields.pop("UNTIL")) if "UNTIL" in fields else None
+    byday = fields.pop("BYDAY").split(",") if "BYDAY" in fields else []
+    if any(code not in WEEKDAYS for code in byday) or (byday and freq != "WEEKLY"):
+        raise ValueError("BYDAY поддерживается только для FREQ=WEEKLY (MO,TU,WE,TH,FR,SA,SU)")
+    try:
+        bymonthday = int(fields.pop("BYMONTHDAY")) if "BYMONTHDAY" in fields else None
+    except ValueError:
+        raise ValueError("BYMONTHDAY должно быть числом")
+    if bymonthday is not None and (not 1 <= bymonthday <= 31 or freq not in ("MONTHLY", "YEARLY")):
+        raise ValueError("BYMONTHDAY (1-31) поддерживается только для FREQ=MONTHLY и FREQ=YEARLY")
+    exdates = [_parse_ics_date(value) for value in fields.pop("EXDATE").split(",")] if "EXDATE" in fields else []
+    if fields:
+        raise ValueError(f"Неподдерживаемые поля правила: {', '.join(sorted(fields))}")
+    return Rule(freq, interval, count, until, byday, exdates, bymonthday)
+
+
+def format_rule(rule):
+    """Каноническая запись правила: словами, если можно, иначе RRULE."""
+    if rule is None:
+        return ""
+    if rule.count is None and rule.until is None and not rule.byday and not rule.exdates and rule.bymonthday is None:
+        if rule.interval == 1:
+            return next(word for word, freq in WORDS.items() if freq == rule.freq)
+        return f"каждые {rule.interval} {_plural(rule.interval, UNIT_WORDS[rule.freq])}"
+    return rrule_text(rule, exdates=True)
+
+
+def _plural(n, forms):
+    if n % 10 == 1 and n % 100 != 11:
+        return forms[0]
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+def rrule_text(rule, exdates=False):
+    """Правило в виде RRULE (EXDATE — только по запросу: в iCalendar это отдельное свойство)."""
+    parts = [f"FREQ={rule.freq}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    if rule.until is not None:
+        parts.append(f"UNTIL={rule.until.strftime('%Y%m%d')}")
+    if rule.byday:
+        parts.append("BYDAY=" + ",".join(sorted(rule.byday, key=WEEKDAYS.index)))
+    if rule.bymonthday is not None:
+        parts.append(f"BYMONTHDAY={rule.bymonthday}")
+    if exdates and rule.exdates:
+        parts.append("EXDATE=" + ",".join(day.strftime("%Y%m%d") for day in rule.exdates))
+    return ";".join(parts)
+
+
+def ics_rrule(rule, start):
+    """RRULE для iCalendar с DTSTART=start.
+
+    В RFC 5545 BYMONTHDAY=31 пропускает короткие месяцы, а у нас повторение
+    переносится на последний день, поэтому 29-31 записываются как
+    «последний из дней 28..N» (BYSETPOS=-1).
+    """
+    rule = _anchored(rule, start)
+    text = rrule_text(Rule(rule.freq, rule.interval, rule.count, rule.until, rule.byday))
+    if rule.bymonthday is None:
+        return text
+    if rule.bymonthday <= 28:
+        text += f";BYMONTHDAY={rule.bymonthday}"
+    else:
+        text += ";BYMONTHDAY=" + ",".join(map(str, range(28, rule.bymonthday + 1))) + ";BYSETPOS=-1"
+    if rule.freq == "YEARLY":
+        text += f";BYMONTH={start.month}"
+    return text
+
+
+def iter_occurrences(rule, start, end=None):
+    """Лениво перебирает повторения, начиная с start (текущего дедлайна), до end включительно."""
+    remaining = rule.count
+    excluded = set(rule.exdates)
+    day = start
+    rule = _anchored(rule, start)
+    while (end is None or day <= end) and (rule.until is None or day <= rule.until):
+        if remaining is not None:
+            if remaining <= 0:
+                return
+            remaining -= 1
+        if day not in excluded:
+            yield day
+        day = rule.next_after(day, start)
+
+
+def advance(rule, current):
+    """Завершает повторение current; возвращает (следующая дата или None, обновлённое правило)."""
+    rule = _anchored(rule, current)
+    count = rule.count
+    day = current
+    while True:
+        if count is not None:
+            count -= 1
+            if count <= 0:
+                return None, rule
+        day = rule.next_after(day, current)
+        if rule.until is not None and day > rule.until:
+            return None, rule
+        if day not in rule.exdates:
+            break
+    exdates = [d for d in rule.exdates if d > day]
+    return day, Rule(rule.freq, rule.interval, count, rule.until, rule.byday, exdates, rule.bymonthday)
+
+
+def _anchored(rule, start):
+    """Правило с числом месяца start в BYMONTHDAY, если короткий месяц может его обрезать."""
+    if rule.freq in ("MONTHLY", "YEARLY") and rule.bymonthday is None and start.day > 28:
+        return Rule(rule.freq, rule.interval, rule.count, rule.until, rule.byday, rule.exdates, start.day)
+    return rule
+
+
+def restart(rule):
+    """Правило серии, начатой заново (дедлайн изменён вручную): число месяца возьмётся из нового дедлайна."""
+    return Rule(rule.freq, rule.interval, rule.count, rule.until, rule.byday, rule.exdates)
+
+
+def skip(rule, day):
+    """Добавляет исключение (пропуск повторения day)."""
+    return Rule(rule.freq, rule.interval, rule.count, rule.until, rule.byday, rule.exdates + (day,), rule.bymonthday)
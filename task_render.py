@@ -0,0 +1,119 @@
+"""Буферизованный вывод задач в терминал.
+
+Строки копятся в буфере и пишутся в поток одним вызовом write() (большие
+списки — пачками по FLUSH_LINES строк), а не print() на каждую строку.
+Цвет включается, только если вывод идёт в терминал и не отключён флагом
+--no-color или переменной окружения NO_COLOR; управляющие
+последовательности — готовые константы, без обёрток colorama на каждую строку.
+"""
+import os
+import sys
+from datetime import timedelta
+
+from task_dates import try_parse_date
+from task_subtasks import iter_numbered, leaf_counts
+
+RED = "\x1b[31m"
+RESET = "\x1b[0m"
+FLUSH_LINES = 4096
+
+_color = None  # None — определять по потоку, True/False — задано явно
+_ansi_ready = False
+
+
+def set_color(enabled):
+    """Принудительно включает/выключает цвет (None — снова определять автоматически)."""
+    global _color
+    _color = enabled
+
+
+def color_enabled(stream):
+    """Нужен ли цвет для вывода в stream."""
+    if _color is not None:
+        return _color
+    if os.environ.get("NO_COLOR"):
+        return False
+    isatty = getattr(stream, "isatty", None)
+    return bool(isatty and isatty())
+
+
+def _enable_ansi():
+    """Консоль Windows понимает ANSI-последовательности только после настройки colorama."""
+    global _ansi_ready
+    if _ansi_ready or os.name != "nt":
+        return
+    _ansi_ready = True
+    try:
+        import colorama
+    except ImportError:
+        return
+    fix = getattr(colorama, "just_fix_windows_console", None)
+    fix() if fix else colorama.init()
+
+
+class Output:
+    """Буфер строк вывода; используется как контекстный менеджер и сбрасывается при выходе."""
+
+    def __init__(self, stream=None, color=None):
+        self.stream = stream or sys.stdout
+        self.color = color_enabled(self.stream) if color is None else color
+        if self.color:
+            _enable_ansi()
+        self.lines = []
+
+    def line(self, text=""):
+        self.lines.append(text)
+        if len(self.lines) >= FLUSH_LINES:
+            self.flush()
+
+    def red(self, text):
+        self.line(RED + text + RESET if self.color else text)
+
+    def flush(self):
+        if self.lines:
+            self.stream.write("\n".join(self.lines) + "\n")
+            self.lines.clear()
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def render_task(out, number, task, today, archived=False):
+    """Добавляет в out строку задачи и строки её подзадач.
+
+    today передаётся снаружи, чтобы не вызывать date.today() на каждую задачу.
+    """
+    deadline_date = try_parse_date(task["deadline"]) if task["deadline"] else None
+    overdue = urgent = ""
+    if deadline_date is not None and not archived:
+        if deadline_date < today:
+            overdue = "[Просрочено]"
+        elif deadline_date <= today + timedelta(days=1) and not task["done"]:
+            urgent = "[Срочно]"
+    parts = [task["category"], ", ", task["priority"]]
+    if task["deadline"]:
+        parts += [", до ", task["deadline"]]
+    if task["tags"]:
+        parts += [", теги: ", ", ".join(task["tags"])]
+    if task["repeat"]:
+        parts += [", повтор: ", task["repeat"]]
+    if task.get("blocked_by"):
+        parts += [", после задач: ", str(len(task["blocked_by"]))]
+    mark = "[x]" if archived or task["done"] else "[ ]"
+    text = f"{number}. {mark} {task['text']} ({''.join(parts)})"
+    if archived:
+        out.line(text)
+    elif overdue:
+        out.red(f"{text} {overdue}")
+    else:
+        out.line(f"{text} {urgent}")
+    for sub_number, depth, subtask in iter_numbered(task["subtasks"], f"{number}."):
+        line = f"{'   ' * depth}{sub_number}. {'[x]' if subtask['done'] else '[ ]'} {subtask['text']}"
+        if subtask.get("subtasks"):
+            done, total = leaf_counts(subtask["subtasks"])
+            line += f" ({done}/{total})"
+        out.line(line)
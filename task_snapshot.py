@@ -0,0 +1,101 @@
+"""Двоичный снимок файла задач для быстрого запуска.
+
+Снимок <файл>.snap пишется при штатном завершении программы и содержит те же
+задачи, что и текстовый файл, но в виде, который почти не нужно разбирать:
+
+    заголовок (struct): сигнатура, версия формата, inode/mtime/размер текстового файла
+    тело (marshal):     (таблица строк, записи)
+
+Категории, приоритеты, дедлайны, теги и правила повторения хранятся один раз
+в таблице строк, а в записях — их номера. Снимок читается через mmap и
+используется, только если текстовый файл не менялся после его записи;
+иначе задачи загружаются из текста как обычно.
+"""
+import gc
+import marshal
+import mmap
+import os
+import struct
+
+MAGIC = b"TMSNAP"
+FORMAT_VERSION = 2
+_HEADER = struct.Struct("<6sHQqQ")  # сигнатура, версия, inode, mtime_ns, размер
+
+
+def snapshot_path(path):
+    return path + ".snap"
+
+
+def write_snapshot(path, tasks, source_version):
+    """Пишет снимок задач; source_version — file_version() текстового файла, который он повторяет."""
+    strings, index = [], {}
+
+    def ref(value):
+        i = index.get(value)
+        if i is None:
+            i = index[value] = len(strings)
+            strings.append(value)
+        return i
+
+    rows = [
+        (task["done"], ref(task["category"]), task["text"], ref(task["priority"]), ref(task["deadline"]),
+         tuple(ref(tag) for tag in task["tags"]), ref(task["repeat"]), task["subtasks"] or None, task.get("id", ""),
+         tuple(task.get("blocked_by", ())))
+        for task in tasks
+    ]
+    inode, mtime_ns, size = source_version
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, inode, mtime_ns, size)
+    body = marshal.dumps((strings, rows), 4)
+    target = snapshot_path(path)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp, target)
+
+
+def load_snapshot(path, source_version):
+    """Загружает задачи из снимка или возвращает None, если снимка нет, он устарел или повреждён."""
+    try:
+        with open(snapshot_path(path), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if len(mm) < _HEADER.size:
+                    return None
+                magic, version, inode, mtime_ns, size = _HEADER.unpack_from(mm)
+                if magic != MAGIC or version != FORMAT_VERSION or (inode, mtime_ns, size) != source_version:
+                    return None
+                view = memoryview(mm)[_HEADER.size:]
+                try:
+                    strings, rows = marshal.loads(view)
+                finally:
+                    view.release()
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    # Сборщик мусора не нужен, пока создаются сотни тысяч словарей без циклов
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        tasks = []
+        append = tasks.append
+        for done, category, text, priority, deadline, tags, repeat, subtasks, task_id, blocked_by in rows:
+            task = {
+                "done": done,
+                "category": strings[category],
+                "text": text,
+                "priority": strings[priority],
+                "deadline": strings[deadline],
+                "tags": [strings[tag] for tag in tags],
+                "repeat": strings[repeat],
+                "subtasks": subtasks or [],
+            }
+            if task_id:
+                task["id"] = task_id
+            if blocked_by:
+                task["blocked_by"] = list(blocked_by)
+            append(task)
+        return tasks
+    except (IndexError, TypeError, ValueError):
+        return None
+    finally:
+        if gc_was_enabled:
+            gc.enable()
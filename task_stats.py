@@ -0,0 +1,94 @@
+"""Счётчики статистики задач, которые обновляются при каждом изменении.
+
+Для каждой задачи запоминается её вклад (выполнена, подзадач, выполнено
+подзадач, дедлайн; у вложенных подзадач считаются листья), поэтому изменение
+задачи — это вычитание старого вклада и прибавление нового, а показ
+статистики не требует прохода по задачам.
+Просроченные и срочные задачи зависят от текущей даты: они считаются по
+гистограмме дедлайнов (дата -> число задач) и пересчитываются только при
+смене дня.
+"""
+from datetime import date
+
+from task_dates import try_parse_date
+from task_subtasks import leaf_counts
+
+FIELDS = ("total", "done", "overdue", "urgent", "sub_total", "sub_done")
+ROLL_DAYS = 366  # на сколько дней вперёд сдвигать счётчики, а не пересчитывать их по гистограмме
+
+
+class TaskStats:
+    """Текущие суммы по задачам; today задаёт день для просроченных и срочных."""
+
+    def __init__(self, tasks=(), today=None):
+        self.total = self.done = self.sub_total = self.sub_done = 0
+        self.deadlines = {}  # порядковый номер даты -> число задач с таким дедлайном
+        self.open_deadlines = {}  # то же для невыполненных задач
+        self.contribution_of = {}
+        self.day = None
+        self.overdue = self.urgent = 0
+        for task in tasks:
+            self.add(task)
+        self.roll(today or date.today())
+
+    @staticmethod
+    def contribution(task):
+        deadline = try_parse_date(task["deadline"]) if task["deadline"] else None
+        sub_done, sub_total = leaf_counts(task["subtasks"]) if task["subtasks"] else (0, 0)
+        return task["done"], sub_total, sub_done, deadline.toordinal() if deadline else None
+
+    def _apply(self, contribution, sign):
+        done, sub_total, sub_done, deadline = contribution
+        self.total += sign
+        self.done += sign if done else 0
+        self.sub_total += sign * sub_total
+        self.sub_done += sign * sub_done
+        if deadline is None:
+            return
+        self.deadlines[deadline] = self.deadlines.get(deadline, 0) + sign
+        if not done:
+            self.open_deadlines[deadline] = self.open_deadlines.get(deadline, 0) + sign
+        if self.day is not None:
+            if deadline < self.day:
+                self.overdue += sign
+            elif deadline <= self.day + 1 and not done:
+                self.urgent += sign
+
+    def add(self, task):
+        contribution = self.contribution(task)
+        self.contribution_of[id(task)] = contribution
+        self._apply(contribution, 1)
+
+    def remove(self, task):
+        contribution = self.contribution_of.pop(id(task), None)
+        if contribution is not None:
+            self._apply(contribution, -1)
+
+    def update(self, task):
+        """Учитывает изменение задачи (статуса, дедлайна, подзадач)."""
+        contribution = self.contribution(task)
+        old = self.contribution_of.get(id(task))
+        if old != contribution:
+            if old is not None:
+                self._apply(old, -1)
+            self.contribution_of[id(task)] = contribution
+            self._apply(contribution, 1)
+
+    def roll(self, today):
+        """Пересчитывает просроченные и срочные для дня today по гистограмме дедлайнов."""
+        day = today.toordinal()
+        if day == self.day:
+            return
+        if self.day is not None and 0 < day - self.day <= ROLL_DAYS:
+            # Новый день: просроченными становятся дедлайны между прошлым и текущим днём
+            deadlines = self.deadlines
+            self.overdue += sum(deadlines.get(d, 0) for d in range(self.day, day))
+        else:
+            self.overdue = sum(count for d, count in self.deadlines.items() if d < day)
+        self.urgent = self.open_deadlines.get(day, 0) + self.open_deadlines.get(day + 1, 0)
+        self.day = day
+
+    def snapshot(self, today=None):
+        """Статистика на день today (по умолчанию сегодня) в виде словаря."""
+        self.roll(today or date.today())
+        return dict(zip(FIELDS, (self.total, self.done, self.overdue, self.urgent, self.sub_total, self.sub_done)))
@@ -0,0 +1,275 @@
+"""Вложенные подзадачи: дерево с id, ссылками на родителя и кэшем прогресса.
+
+В строке файла подзадачи по-прежнему хранятся JSON-списком, но узел может
+содержать свои подзадачи:
+
+    {"id": "3f2a9c1b", "text": "Отчёт", "done": false, "subtasks": [{"id": ..., "text": ..., "done": ...}]}
+
+Старые плоские списки читаются как есть; недостающие id выдаются
+детерминированно (по id задачи, положению и тексту узла), поэтому все
+процессы получают одинаковые id без перезаписи файла. Id с '|' или
+пробельными символами (их не записать в журнал) выдаются заново так же.
+
+SubtaskTree строится для задачи при первом обращении: узлы по id, родитель
+каждого узла и для каждого узла число выполненных и всех листьев в его
+поддереве. Отметка узла меняет листья его поддерева и поправляет счётчики
+вверх по цепочке родителей, не пересчитывая соседние ветви. Отметка
+внутреннего узла — это «выполнено всё поддерево»; сам он выполнен, когда
+выполнены все его листья.
+"""
+import hashlib
+import os
+import re
+import uuid
+
+_NODE_ID = re.compile(r"[^|\s]+")
+
+
+def new_subtask_id():
+    return uuid.uuid4().hex[:8]
+
+
+def _derived_id(task_id, path, text):
+    return hashlib.sha1(f"{task_id}/{path}/{text}".encode("utf-8")).hexdigest()[:8]
+
+
+def valid_subtask_id(node_id):
+    """Годится ли id для строки журнала «id задачи|id подзадачи|0/1»."""
+    return isinstance(node_id, str) and _NODE_ID.fullmatch(node_id) is not None
+
+
+def normalize_subtasks(items):
+    """Приводит подзадачи (строки или словари, возможно вложенные) к узлам дерева."""
+    if items and not isinstance(items, list):
+        raise ValueError("подзадачи должны быть списком")
+    nodes = []
+    for item in items or []:
+        if isinstance(item, dict) and isinstance(item.get("text"), str):
+            text = item["text"]
+        elif isinstance(item, str):
+            text = item
+        else:
+            raise ValueError("подзадача должна быть строкой или объектом с полем text")
+        if "|" in text:
+            raise ValueError("подзадача не может содержать '|'")
+        if isinstance(item, str):
+            nodes.append({"text": item, "done": False})
+            continue
+        node = {"text": text, "done": bool(item.get("done", False))}
+        if item.get("id") and valid_subtask_id(str(item["id"])):
+            # Непригодный id не копируем: SubtaskTree выдаст новый
+            node["id"] = str(item["id"])
+        children = normalize_subtasks(item.get("subtasks"))
+        if children:
+            node["subtasks"] = children
+        nodes.append(node)
+    return nodes
+
+
+def iter_nodes(subtasks):
+    """Все узлы дерева подзадач в порядке обхода (сначала родитель)."""
+    stack = list(reversed(subtasks))
+    while stack:
+        node = stack.pop()
+        yield node
+        children = node.get("subtasks")
+        if children:
+            stack.extend(reversed(children))
+
+
+def leaf_counts(subtasks):
+    """(выполнено, всего) листьев дерева; у плоского списка листья — все подзадачи."""
+    done = total = 0
+    for node in iter_nodes(subtasks):
+        if not node.get("subtasks"):
+            total += 1
+            done += node["done"]
+    return done, total
+
+
+def iter_numbered(subtasks, prefix=""):
+    """(номер вида 1.2.3, глубина, узел) для вывода дерева."""
+    for i, node in enumerate(subtasks, 1):
+        number = f"{prefix}{i}"
+        yield number, number.count("."), node
+        if node.get("subtasks"):
+            yield from iter_numbered(node["subtasks"], number + ".")
+
+
+def reset_subtasks(subtasks):
+    """Снимает отметки со всех узлов (новое повторение задачи)."""
+    for node in iter_nodes(subtasks):
+        node["done"] = False
+
+
+class SubtaskTree:
+    """Индекс дерева подзадач одной задачи; roots — сам список task["subtasks"]."""
+
+    def __init__(self, task):
+        self.task_id = task.get("id", "")
+        self.roots = task["subtasks"]
+        self.nodes = {}
+        self.parent = {}
+        self.counts = {}  # id узла -> [выполнено листьев, всего листьев] в поддереве
+        self.done = self.total = 0
+        for i, node in enumerate(self.roots):
+            self._index(node, None, str(i))
+            done, total = self.counts[node["id"]]
+            self.done += done
+            self.total += total
+
+    def _index(self, node, parent_id, path):
+        if not valid_subtask_id(node.get("id")) or node["id"] in self.nodes:
+            node["id"] = _derived_id(self.task_id, path, node["text"])
+            while node["id"] in self.nodes:
+                node["id"] = new_subtask_id()
+        node_id = node["id"]
+        self.nodes[node_id] = node
+        self.parent[node_id] = parent_id
+        children = node.get("subtasks")
+        if children:
+            done = total = 0
+            for i, child in enumerate(children):
+                self._index(child, node_id, f"{path}.{i}")
+                child_done, child_total = self.counts[child["id"]]
+                done += child_done
+                total += child_total
+            node["done"] = done == total
+        else:
+            done, total = int(node["done"]), 1
+        self.counts[node_id] = [done, total]
+
+    def node(self, node_id):
+        return self.nodes.get(node_id)
+
+    def ancestors(self, node_id):
+        """id родителей узла от ближайшего к корню."""
+        parent = self.parent.get(node_id)
+        while parent is not None:
+            yield parent
+            parent = self.parent[parent]
+
+    def progress(self, node_id=None):
+        """Доля выполненных листьев узла (или всей задачи) от 0 до 1."""
+        done, total = self.counts[node_id] if node_id else (self.done, self.total)
+        return done / total if total else 0.0
+
+    def _propagate(self, node_id, delta_done, delta_total=0):
+        """Поправляет счётчики родителей узла и их отметки выполненности."""
+        for parent_id in self.ancestors(node_id):
+            counts = self.counts[parent_id]
+            counts[0] += delta_done
+            counts[1] += delta_total
+            self.nodes[parent_id]["done"] = counts[0] == counts[1]
+        self.done += delta_done
+        self.total += delta_total
+
+    def set_done(self, node_id, done):
+        """Отмечает узел (внутренний — вместе с поддеревом); возвращает True, если что-то изменилось."""
+        node = self.nodes[node_id]
+        before = self.counts[node_id][0]
+        for inner in iter_nodes([node]):
+            inner["done"] = done
+            counts = self.counts[inner["id"]]
+            counts[0] = counts[1] if done else 0
+        delta = self.counts[node_id][0] - before
+        if delta:
+            self._propagate(node_id, delta)
+        return bool(delta)
+
+    def add(self, text, parent_id=None, done=False):
+        """Добавляет подзадачу в конец списка родителя (или верхнего уровня); возвращает узел."""
+        node_id = new_subtask_id()
+        while node_id in self.nodes:
+            node_id = new_subtask_id()
+        node = {"text": text, "done": bool(done), "id": node_id}
+        if parent_id is None:
+            self.roots.append(node)
+        else:
+            parent = self.nodes[parent_id]
+            if not parent.get("subtasks"):
+                # Лист становится внутренним узлом: его собственная отметка больше не лист
+                self._propagate(parent_id, -self.counts[parent_id][0], -1)
+                self.counts[parent_id] = [0, 0]
+                parent["subtasks"] = []
+            parent["subtasks"].append(node)
+        self.nodes[node_id] = node
+        self.parent[node_id] = parent_id
+        self.counts[node_id] = [int(node["done"]), 1]
+        if parent_id is not None:
+            self.counts[parent_id][0] += int(node["done"])
+            self.counts[parent_id][1] += 1
+            self.nodes[parent_id]["done"] = self.counts[parent_id][0] == self.counts[parent_id][1]
+            self._propagate(parent_id, int(node["done"]), 1)
+        else:
+            self.done += int(node["done"])
+            self.total += 1
+        return node
+
+    def remove(self, node_id):
+        """Удаляет узел вместе с поддеревом."""
+        node = self.nodes[node_id]
+        parent_id = self.parent[node_id]
+        done, total = self.counts[node_id]
+        siblings = self.roots if parent_id is None else self.nodes[parent_id]["subtasks"]
+        siblings.remove(node)
+        for inner in iter_nodes([node]):
+            del self.nodes[inner["id"]], self.parent[inner["id"]], self.counts[inner["id"]]
+        if parent_id is None:
+            self.done -= done
+            self.total -= total
+            return
+        counts = self.counts[parent_id]
+        counts[0] -= done
+        counts[1] -= total
+        self._propagate(parent_id, -done, -total)
+        if not siblings:
+            # У родителя не осталось детей: он снова лист со своей отметкой
+            parent = self.nodes[parent_id]
+            del parent["subtasks"]
+            self.counts[parent_id] = [int(parent["done"]), 1]
+            self._propagate(parent_id, int(parent["done"]), 1)
+        else:
+            self.nodes[parent_id]["done"] = counts[0] == counts[1]
+
+
+# Журнал отметок: "id задачи|id подзадачи|1" на строку. Отметка подзадачи
+# дописывает одну строку вместо перезаписи файла задач; журнал применяется
+# поверх файла при загрузке и синхронизации и очищается при полной записи.
+
+def journal_path(path):
+    return path + ".journal"
+
+
+def append_journal(path, entries):
+    """Дописывает в журнал отметки (id задачи, id подзадачи, выполнена); возвращает позицию его конца."""
+    with open(journal_path(path), "a", encoding="utf-8") as f:
+        f.writelines(f"{task_id}|{node_id}|{int(done)}\n" for task_id, node_id, done in entries)
+        f.flush()
+        return os.fstat(f.fileno()).st_ino, f.tell()
+
+
+def read_journal(path, position=None):
+    """Читает журнал с позиции position = (inode, смещение) или с начала, если журнал сменился.
+
+    Возвращает (отметки, новая позиция, журнал перечитан с начала).
+    """
+    try:
+        f = open(journal_path(path), "rb")
+    except FileNotFoundError:
+        return [], None, True
+    with f:
+        inode = os.fstat(f.fileno()).st_ino
+        from_start = position is None or position[0] != inode
+        if not from_start:
+            f.seek(position[1])
+        data = f.read()
+        start = 0 if from_start else position[1]
+    # Недописанную последнюю строку оставляем до следующего чтения
+    complete = data.rfind(b"\n") + 1
+    entries = []
+    for line in data[:complete].decode("utf-8").splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2] in ("0", "1"):
+            entries.append((parts[0], parts[1], parts[2] == "1"))
+    return entries, (inode, start + complete), from_start
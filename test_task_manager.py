@@ -1,6 +1,16 @@
 from task_manager import TaskManager
 import os
 
+# Служебные файлы, которые менеджер создаёт рядом с файлом задач, архивом или ICS
+SIDE_SUFFIXES = ("", ".lock", ".snap", ".journal", ".history", ".rollup.json", ".idx", ".tri", ".state.json")
+
+def remove_files(*paths):
+    """Удаляет файлы теста вместе со служебными файлами рядом с ними."""
+    for path in paths:
+        for suffix in SIDE_SUFFIXES:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
 def test_add_task():
     manager = TaskManager()
     initial_len = len(manager.tasks)
@@ -24,7 +34,645 @@ def test_save_tasks():
     assert os.path.exists("test_todo.txt")
     os.remove("test_todo.txt")
 
+def test_tasks_loaded_on_demand():
+    manager = TaskManager(filename="test_lazy.txt")
+    assert manager._tasks is None
+    try:
+        manager.save_tasks("test_lazy.txt", [{"done": False, "category": "Тест", "text": "Лениво", "priority": "средний", "deadline": "", "tags": [], "repeat": "", "subtasks": []}])
+        assert manager.tasks[0]["text"] == "Лениво"
+        assert manager.categories == {"Тест"}
+    finally:
+        remove_files("test_lazy.txt")
+
+def test_batch_operations_single_save():
+    import io
+    from task_cli import run_batch
+    manager = TaskManager(filename="test_batch.txt")
+    manager.tasks = []
+    lines = [
+        '{"op": "add", "text": "Первая", "priority": "высокий"}',
+        '{"op": "add", "text": "Вторая"}',
+        '{"op": "done", "text": "Первая"}',
+        '{"op": "edit", "text": "Вторая", "new_text": "Третья", "tags": ["x"]}',
+        '{"op": "add", "text": "Первая"}',
+        '{"op": "add", "text": "Четвёртая", "deadline": 5}',
+        '{"op": "add", "text": "Пятая", "tags": 5}',
+        '{"op": "add", "text": "Шестая", "subtasks": [{"text": "a", "subtasks": 5}]}',
+    ]
+    err = io.StringIO()
+    applied, errors = run_batch(manager, lines, err=err)
+    assert (applied, errors) == (4, 4)
+    assert "строка 6: поле 'deadline' должно быть строкой" in err.getvalue()
+    assert not os.path.exists("test_batch.txt")
+    assert manager.find_task("Первая")["done"]
+    assert manager.find_task("Третья")["tags"] == ["x"]
+    assert manager.find_task("Вторая") is None
+
+def test_streaming_import_dedup():
+    import io
+    import json
+    from task_io import iter_json_records
+    records = [{"text": f"Задача {i}", "tags": ["a"]} for i in range(50)]
+    assert list(iter_json_records(io.StringIO(json.dumps(records)), chunk_size=7)) == records
+    try:
+        with open("test_import.jsonl", "w", encoding="utf-8") as f:
+            invalid = [{"text": ""}, {"text": "Трубы", "category": "a|b"}, {"text": "Теги", "tags": ["x,y"]},
+                       {"text": "Важно", "priority": "срочно"}, {"text": "Повтор", "repeat": "иногда"},
+                       {"text": "Разрыв", "id": "a|b"}, {"text": "Перенос", "id": "a\nb"}]
+            records[0]["id"], records[1]["note"] = "imported0", "лишнее поле"
+            for record in records + records[:10] + invalid:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        manager = TaskManager(filename="test_import.txt")
+        manager.tasks = []
+        stats = manager.import_from_json("test_import.jsonl", batch_size=16, progress=lambda stats: None)
+        assert stats == {"read": 67, "imported": 50, "duplicates": 10, "invalid": 7}
+        loaded = manager.load_tasks("test_import.txt")
+        assert len(loaded) == 50 and loaded[0]["id"] == "imported0" and "note" not in manager.find_task("Задача 1")
+    finally:
+        remove_files("test_import.jsonl", "test_import.txt")
+
+def test_streaming_export_filters_and_gzip():
+    import gzip
+    from task_io import iter_json_records
+    manager = TaskManager(filename="test_export.txt")
+    manager.tasks = [
+        {"done": False, "category": "Работа", "text": f"Задача {i}", "priority": "средний", "deadline": "", "tags": [], "repeat": "", "subtasks": []}
+        for i in range(30)
+    ] + [{"done": False, "category": "Личное", "text": "Дом", "priority": "низкий", "deadline": "", "tags": [], "repeat": "", "subtasks": []}]
+    try:
+        assert manager.export_to_json("test_export.json.gz", "jsonl", category="Работа") == 30
+        with gzip.open("test_export.json.gz", "rt", encoding="utf-8") as f:
+            assert list(iter_json_records(f)) == manager.tasks[:30]
+    finally:
+        remove_files("test_export.json.gz")
+
+def test_incremental_ics_export():
+    manager = TaskManager(filename="test_ics.txt")
+    manager.tasks = []
+    try:
+        first = manager.create_task("Отчёт", deadline="2025-04-09", save=False)
+        manager.create_task("Звонок", deadline="2025-04-10", save=False)
+        assert manager.export_to_ics("test.ics")["added"] == 2
+        with open("test.ics", encoding="utf-8") as f:
+            content = f.read()
+        assert f"UID:{first['id']}@legendarytaskmanager" in content
+        assert manager.export_to_ics("test.ics")["written"] is False
+        manager.update_task(first, text="Отчёт за квартал", save=False)
+        manager.remove_task(manager.find_task("Звонок"), save=False)
+        stats = manager.export_to_ics("test.ics", delta_path="test_delta.ics")
+        assert (stats["updated"], stats["cancelled"]) == (1, 1)
+        with open("test_delta.ics", encoding="utf-8") as f:
+            delta = f.read()
+        assert "SEQUENCE:1" in delta and "STATUS:CANCELLED" in delta
+    finally:
+        remove_files("test.ics", "test_delta.ics")
+
+def test_date_parser_formats():
+    from datetime import date
+    from task_dates import parse_date, normalize_date
+    for text in ("2025-04-09", "09.04.2025", "09-04-2025", "2025/04/09", "09/04/2025", "2025.04.09"):
+        assert parse_date(text) == date(2025, 4, 9)
+    assert normalize_date("") == ""
+    for text in ("2025-02-30", "2025-04/09", "завтра"):
+        try:
+            parse_date(text)
+            assert False, text
+        except ValueError:
+            pass
+    manager = TaskManager(filename="test_dates.txt")
+    manager.tasks = []
+    assert manager.create_task("Дата", deadline="09.04.2025", save=False)["deadline"] == "2025-04-09"
+
+def test_materialized_order_updates_incrementally():
+    manager = TaskManager(filename="test_order.txt")
+    manager.tasks = []
+    late = manager.create_task("Поздно", deadline="2025-05-01", save=False)
+    manager.create_task("Без срока", save=False)
+    early = manager.create_task("Рано", deadline="2025-04-01", priority="низкий", save=False)
+    assert [t["text"] for t in manager.ordered_tasks()] == ["Рано", "Поздно", "Без срока"]
+    order = manager._order
+    manager.create_task("Рано важно", deadline="2025-04-01", priority="высокий", save=False)
+    manager.update_task(late, deadline="2025-03-01", save=False)
+    manager.set_done(early, save=False)
+    assert manager._order is order
+    assert [t["text"] for t in manager.ordered_tasks()] == ["Поздно", "Рано важно", "Рано", "Без срока"]
+    manager.remove_task(late, save=False)
+    assert [t["text"] for t in manager.ordered_tasks()] == ["Рано важно", "Рано", "Без срока"]
+
+def test_metrics_record_operations():
+    from task_metrics import METRICS
+    manager = TaskManager(filename="test_metrics.txt")
+    manager.tasks = []
+    METRICS.enabled = True
+    try:
+        manager.create_task("Задача для метрик", save=False)
+        METRICS.reset()
+        manager.filter_tasks(search_text="задача")
+        manager.save()
+        operations = METRICS.snapshot()["operations"]
+        assert operations["filter"]["count"] == 1
+        assert operations["save"]["count"] == 1
+    finally:
+        METRICS.enabled = False
+        METRICS.reset()
+        remove_files("test_metrics.txt")
+
+def test_paging_and_top_k():
+    import contextlib, io
+    manager = TaskManager(filename="test_paging.txt")
+    manager.tasks = []
+    for day in range(1, 26):
+        manager.create_task(f"Задача {day}", deadline=f"2025-04-{day:02d}", save=False)
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        assert manager.show_tasks(page=2, page_size=10) == (2, 3)
+        out = buffer.getvalue()
+    assert "11. [ ] Задача 11" in out and "Задача 21" not in out
+    assert "Страница 2 из 3 (всего задач: 25)" in out
+    manager.set_done(manager.find_task("Задача 1"), save=False)
+    assert [t["text"] for t in manager.most_urgent(3)] == ["Задача 2", "Задача 3", "Задача 4"]
+
+def test_buffered_rendering_color_detection():
+    import io
+    from datetime import date
+    from task_render import Output, render_task, RED
+    task = {"done": False, "category": "Тест", "text": "Старая", "priority": "средний", "deadline": "2000-01-01",
+            "tags": [], "repeat": "", "subtasks": [{"text": "шаг", "done": True}]}
+    stream = io.StringIO()
+    with Output(stream) as out:
+        render_task(out, 1, task, date.today())
+        assert stream.getvalue() == ""
+    assert stream.getvalue() == "1. [ ] Старая (Тест, средний, до 2000-01-01) [Просрочено]\n   1.1. [x] шаг\n"
+    stream = io.StringIO()
+    with Output(stream, color=True) as out:
+        render_task(out, 1, task, date.today())
+    assert stream.getvalue().startswith(RED)
+
+def test_bulk_update_by_query_and_ids():
+    manager = TaskManager(filename="test_bulk.txt")
+    manager.tasks = []
+    for n in range(5):
+        manager.create_task(f"Задача {n}", category="Работа", deadline="2025-04-10", tags=["a"], save=False)
+    other = manager.create_task("Личная", category="Личное", save=False)
+    manager.ordered_tasks()
+    try:
+        assert manager.bulk_update({"category": "Работа"}, priority="высокий", add_tags=["b"], remove_tags=["a"],
+                                   shift_days=2) == 5
+        assert all(t["tags"] == ["b"] and t["deadline"] == "2025-04-12" for t in manager.tasks[:5])
+        assert manager.ordered_tasks()[0]["priority"] == "высокий"
+        ids = [manager.tasks[0]["id"], other["id"], "нет-такого"]
+        assert manager.bulk_update(ids=ids, done=True) == 2
+        assert manager.bulk_update({"tag": "b"}, delete=True) == 5
+        assert [t["text"] for t in TaskManager(filename="test_bulk.txt").tasks] == ["Личная"]
+    finally:
+        remove_files("test_bulk.txt")
+
+def test_recurring_task_advances_in_place():
+    from datetime import date
+    manager = TaskManager(filename="test_repeat.txt")
+    manager.tasks = []
+    weekly = manager.create_task("Планёрка", deadline="2025-04-07", repeat="FREQ=WEEKLY;BYDAY=MO,TH;COUNT=3",
+                                 subtasks=["повестка"], save=False)
+    monthly = manager.create_task("Счета", deadline="2025-01-31", repeat="ежемесячно", save=False)
+    weekly["subtasks"][0]["done"] = True
+    manager.set_done(weekly, save=False)
+    assert len(manager.tasks) == 2 and not weekly["done"]
+    assert weekly["deadline"] == "2025-04-10" and weekly["repeat"] == "FREQ=WEEKLY;COUNT=2;BYDAY=MO,TH"
+    assert not weekly["subtasks"][0]["done"]
+    manager.skip_occurrence(weekly, save=False)
+    manager.set_done(weekly, save=False)
+    assert weekly["done"] and weekly["deadline"] == "2025-04-14"
+    manager.set_done(monthly, save=False)
+    assert monthly["deadline"] == "2025-02-28" and not monthly["done"]
+    assert [d.isoformat() for d, _ in manager.occurrences(date(2025, 2, 1), date(2025, 6, 30))] == [
+        "2025-02-28", "2025-03-31", "2025-04-30", "2025-05-31", "2025-06-30"]
+    yearly = manager.create_task("Годовщина", deadline="2024-02-29", repeat="ежегодно", save=False)
+    dates = []
+    for _ in range(4):
+        manager.set_done(yearly, save=False)
+        dates.append(yearly["deadline"])
+    assert dates == ["2025-02-28", "2026-02-28", "2027-02-28", "2028-02-29"]
+    from task_ics import event_body
+    assert "RRULE:FREQ=YEARLY;BYMONTHDAY=28,29;BYSETPOS=-1;BYMONTH=2" in event_body(yearly, date(2028, 2, 29))
+    undated = manager.create_task("Зарядка", repeat="ежедневно", save=False)
+    manager.set_done(undated, save=False)
+    assert undated["deadline"] == "" and not undated["done"]
+    manager.update_task(monthly, done=True, deadline="2025-03-10", save=False)
+    assert monthly["deadline"] == "2025-04-10" and not monthly["done"]
+    manager.update_task(monthly, deadline="2025-02-28", save=False)
+    agenda = [(d.isoformat(), t["text"]) for d, t in manager.occurrences(date(2025, 3, 1), date(2025, 4, 30))]
+    assert agenda == [("2025-03-28", "Счета"), ("2025-04-28", "Счета")]
+    try:
+        manager.update_task(monthly, repeat="каждую среду")
+        assert False, "неверное правило должно отклоняться"
+    except ValueError:
+        pass
+
+def test_concurrent_saves_merge_instead_of_clobbering():
+    first = TaskManager(filename="test_shared.txt")
+    first.tasks = []
+    shared = first.create_task("Общая")
+    first.create_task("Удаляемая")
+    second = TaskManager(filename="test_shared.txt")
+    try:
+        assert len(second.tasks) == 2 and not second.refresh()
+        first.create_task("От первого")
+        second.set_done(second.find_task("Общая"))
+        second.remove_task(second.find_task("Удаляемая"))
+        assert first.refresh()
+        assert first.find_task("Общая")["done"] and first.find_task("Удаляемая") is None
+        assert sorted(t["text"] for t in TaskManager(filename="test_shared.txt").tasks) == ["Общая", "От первого"]
+        assert first.get_task(shared["id"]) is not None
+    finally:
+        remove_files("test_shared.txt")
+
+def test_sync_from_disk_applies_only_delta():
+    watcher = TaskManager(filename="test_watch.txt")
+    watcher.tasks = []
+    kept = watcher.create_task("Без изменений", save=False)
+    edited = watcher.create_task("Будет изменена", save=False)
+    watcher.create_task("Будет удалена")
+    writer = TaskManager(filename="test_watch.txt")
+    try:
+        assert watcher.sync_from_disk() is None
+        writer.update_task(writer.find_task("Будет изменена"), priority="высокий", save=False)
+        writer.remove_task(writer.find_task("Будет удалена"), save=False)
+        writer.create_task("Новая")
+        added, updated, removed = watcher.sync_from_disk()
+        assert [t["text"] for t in added] == ["Новая"]
+        assert updated == [edited] and edited["priority"] == "высокий"
+        assert [t["text"] for t in removed] == ["Будет удалена"]
+        assert watcher.tasks[0] is kept and watcher.find_task("Будет удалена") is None
+        assert [t["text"] for t in watcher.ordered_tasks()][0] == "Будет изменена"
+        assert watcher.sync_from_disk() is None
+    finally:
+        remove_files("test_watch.txt")
+
+def test_binary_snapshot_roundtrip_and_staleness():
+    from task_lock import file_version
+    from task_snapshot import load_snapshot
+    manager = TaskManager(filename="test_snap.txt")
+    manager.tasks = []
+    manager.create_task("С подзадачами", category="Работа", tags=["a", "b"], subtasks=["шаг"], save=False)
+    manager.create_task("Повтор", deadline="2025-04-09", repeat="каждые 2 дня")
+    try:
+        assert manager.write_snapshot()
+        assert load_snapshot("test_snap.txt", file_version("test_snap.txt")) == manager.tasks
+        assert TaskManager(filename="test_snap.txt").tasks == manager.tasks
+        manager.set_done(manager.find_task("С подзадачами"))
+        assert load_snapshot("test_snap.txt", file_version("test_snap.txt")) is None
+        assert TaskManager(filename="test_snap.txt").find_task("С подзадачами")["done"]
+    finally:
+        remove_files("test_snap.txt")
+
+def test_archive_reader_index_and_search():
+    from task_archive import ArchiveReader
+    manager = TaskManager(filename="test_arch_todo.txt", archive_filename="test_archive.txt")
+    manager.tasks = []
+    for n in range(3):
+        manager.set_done(manager.create_task(f"Отчёт {n}", save=False), save=False)
+    manager.create_task("Остаётся", subtasks=["найти отчёт"])
+    try:
+        manager.clear_done_tasks()
+        with ArchiveReader("test_archive.txt") as archive:
+            assert len(archive) == 3 and archive.search("ОТЧЁТ 1") == [1]
+        manager.set_done(manager.find_task("Остаётся"))
+        manager.clear_done_tasks()
+        with ArchiveReader("test_archive.txt") as archive:
+            assert len(archive) == 4
+            assert archive.search("найти") == [3]
+            assert archive.search("text") == archive.search("false") == []
+            archive.build_trigrams()
+        with ArchiveReader("test_archive.txt") as archive:
+            assert archive.search("отчёт") == [0, 1, 2, 3] and archive.search("нет такого") == []
+            assert archive.search("done") == archive.search("text") == []
+    finally:
+        remove_files("test_arch_todo.txt", "test_archive.txt")
+
+def test_parallel_load_matches_serial():
+    import task_parallel
+    from task_manager import parse_task_line
+    lines = [f"0|Работа|Задача {n}|средний|2024-01-0{n % 9 + 1}|||[]|id{n}\r\n" for n in range(40)]
+    lines[7] = "битая строка\n"
+    lines[20] = "1|Дом|Старая запись|низкий\n"
+    with open("test_parallel.txt", "w", encoding="utf-8", newline="") as f:
+        f.writelines(lines)
+    chunk_size = task_parallel.MIN_CHUNK_SIZE
+    task_parallel.MIN_CHUNK_SIZE = 64
+    try:
+        ranges = task_parallel.split_ranges("test_parallel.txt", 4)
+        assert len(ranges) == 4 and ranges[0][0] == 0 and ranges[-1][1] == os.path.getsize("test_parallel.txt")
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        chunks = list(task_parallel.parse_file("test_parallel.txt", parse_task_line, workers=4))
+        assert len(chunks) == 4
+        assert [error[0] for chunk in chunks for error in chunk[2]] == ["битая строка\n"]
+        manager = TaskManager(filename="test_parallel.txt")
+        serial = manager.load_tasks("test_parallel.txt")
+        assert manager._load_tasks_parallel("test_parallel.txt") == serial
+        assert len(serial) == 39 and serial[19]["text"] == "Старая запись" and serial[19]["id"]
+    finally:
+        task_parallel.MIN_CHUNK_SIZE = chunk_size
+        os.remove("test_parallel.txt")
+
+def test_parallel_filter_and_stats_match_serial():
+    from datetime import date, timedelta
+    manager = TaskManager(filename="test_shards.txt")
+    manager.tasks = []
+    today = date.today()
+    for n in range(30):
+        deadline = (today + timedelta(days=n % 5 - 2)).isoformat()
+        task = manager.create_task(f"Задача {n}", category="Работа" if n % 3 else "Дом", deadline=deadline,
+                                   subtasks=[{"text": f"шаг {n}", "done": n % 2 == 0}], save=False)
+        if n % 4 == 0:
+            manager.set_done(task, save=False)
+    filters = {"category": "Работа", "priority": None, "tag": None, "only_overdue": False,
+               "only_urgent": True, "search_text": "шаг 1"}
+    serial = list(manager.iter_filtered(**filters))
+    assert serial and manager.parallel_filter(manager.tasks, today, filters, workers=3, min_size=5) == serial
+    assert manager.count_stats(workers=3, min_size=5) == manager.count_stats()
+    assert manager.count_stats()["sub_total"] == 30 and manager.count_stats()["done"] == 8
+
+def test_stats_counters_follow_every_change():
+    from datetime import date, timedelta
+    from task_stats import TaskStats
+    manager = TaskManager(filename="test_stats.txt", archive_filename="test_stats_archive.txt")
+    manager.tasks = []
+    today = date.today()
+    assert manager.stats()["total"] == 0
+    a = manager.create_task("A", deadline=(today - timedelta(days=1)).isoformat(), subtasks=["x", "y"], save=False)
+    b = manager.create_task("B", deadline=today.isoformat(), save=False)
+    c = manager.create_task("C", deadline=(today + timedelta(days=3)).isoformat(), repeat="ежедневно", save=False)
+    manager.set_done(b, save=False)
+    manager.toggle_subtask(a, next(iter(manager.subtask_tree(a).nodes)), save=False)
+    manager.update_task(c, deadline=(today + timedelta(days=1)).isoformat(), save=False)
+    manager.set_done(c, save=False)  # повторение: дедлайн сдвигается, задача остаётся невыполненной
+    manager.bulk_update(ids=[a["id"]], shift_days=5, save=False)
+    assert manager.stats() == manager.count_stats()
+    manager.remove_task(a, save=False)
+    assert manager.stats() == manager.count_stats() == {
+        "total": 2, "done": 1, "overdue": 0, "urgent": 0, "sub_total": 0, "sub_done": 0}
+    # Смена дня пересчитывает только просроченные и срочные
+    counters = TaskStats(manager.tasks, today)
+    later = counters.snapshot(today + timedelta(days=2))
+    assert later["overdue"] == 1 and later == TaskStats(manager.tasks, today + timedelta(days=2)).snapshot(today + timedelta(days=2))
+
+def test_completion_history_rollups():
+    from datetime import date, timedelta
+    manager = TaskManager(filename="test_hist.txt", archive_filename="test_hist_archive.txt")
+    manager.tasks = []
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    try:
+        a = manager.create_task("A", category="Работа", deadline=yesterday, tags=["отчёт"], save=False)
+        b = manager.create_task("B", category="Дом", save=False)
+        c = manager.create_task("C", category="Работа", repeat="ежедневно", deadline=date.today().isoformat(), save=False)
+        manager.save()
+        manager.set_done(a)
+        manager.bulk_update(ids=[b["id"], c["id"]], done=True)
+        manager.set_done(b, done=False)  # снятая отметка вычитается из сводок
+        week = manager.history.report("week", last=1)[0]
+        assert (week["completed"], week["lead_time"]) == (2, 0.0) and week["overdue_rate"] == 0.5
+        assert manager.history.report("day", "category", "Работа", last=1)[0]["completed"] == 2
+        assert manager.history.report("month", "tag", "отчёт", last=1)[0]["completed"] == 1
+        assert sorted(manager.history.values("category")) == ["Дом", "Работа"]
+        # Задача, отмеченная в обход истории, учитывается при архивации
+        b["done"] = True
+        manager.clear_done_tasks()
+        assert manager.history.report("week", last=1)[0]["completed"] == 3
+        assert manager.history.rebuild() == 3
+        assert manager.history.report("week", last=1)[0]["completed"] == 3
+    finally:
+        remove_files("test_hist.txt", "test_hist_archive.txt")
+
+def test_notification_scheduler_heap():
+    import threading
+    from datetime import date, datetime, timedelta
+    import task_manager
+    from task_notify import NotificationScheduler
+    manager = TaskManager(filename="test_notify.txt")
+    manager.tasks = []
+    today = date.today()
+    overdue = manager.create_task("Старая", deadline=(today - timedelta(days=3)).isoformat(), save=False)
+    soon = manager.create_task("Завтра", deadline=(today + timedelta(days=1)).isoformat(), save=False)
+    later = manager.create_task("Позже", deadline=(today + timedelta(days=5)).isoformat(), save=False)
+    manager.create_task("Без срока", save=False)
+    clock = [datetime.combine(today, datetime.min.time()).timestamp() + 3600]
+    sent = []
+    scheduler = NotificationScheduler(manager, [sent.append], clock=lambda: clock[0])
+    manager.scheduler = scheduler
+    # Прошедшие пороги сворачиваются в одно уведомление на задачу
+    assert sorted((n.kind, n.task["text"]) for n in scheduler.due()) == [("overdue", "Старая"), ("tomorrow", "Завтра")]
+    assert scheduler.due() == [] and scheduler.delay() == 23 * 3600  # следующий порог — завтра в 00:00
+    clock[0] += 24 * 3600
+    assert [(n.kind, n.task["text"]) for n in scheduler.due()] == [("today", "Завтра")]
+    manager.set_done(soon, save=False)  # выполненная задача больше не уведомляет
+    manager.update_task(later, deadline=today.isoformat(), save=False)
+    assert [(n.kind, n.task["text"]) for n in scheduler.due()] == [("overdue", "Позже")]
+    manager.remove_task(overdue, save=False)
+    assert scheduler.delay() is None
+    # Крупные массовые изменения перестраивают кучу целиком
+    threshold = task_manager.BULK_REINDEX_THRESHOLD
+    task_manager.BULK_REINDEX_THRESHOLD = 1
+    try:
+        batch = [manager.create_task(f"Пакет {n}", deadline=(today + timedelta(days=30)).isoformat(), save=False)
+                 for n in range(3)]
+        manager.bulk_update(ids=[task["id"] for task in batch], shift_days=-30, save=False)
+        assert sorted(n.task["text"] for n in scheduler.due()) == ["Пакет 0", "Пакет 1", "Пакет 2"]
+        manager.bulk_update(ids=[task["id"] for task in batch], delete=True, save=False)
+    finally:
+        task_manager.BULK_REINDEX_THRESHOLD = threshold
+    assert scheduler.delay() is None
+    # Режим службы спит без тайм-аута и просыпается при изменении задач
+    runner = threading.Thread(target=scheduler.run)
+    runner.start()
+    manager.create_task("Новая", deadline=(today - timedelta(days=1)).isoformat(), save=False)
+    scheduler.stop()
+    runner.join(2)
+    assert not runner.is_alive()
+
+
+def test_nested_subtasks_progress_and_journal():
+    from task_subtasks import journal_path
+    manager = TaskManager(filename="test_subtasks.txt")
+    manager.tasks = []
+    try:
+        task = manager.create_task("Отчёт", subtasks=["собрать данные", {"text": "написать", "subtasks": ["введение", "выводы"]}])
+        tree = manager.subtask_tree(task)
+        collect, write = task["subtasks"]
+        intro, summary = write["subtasks"]
+        assert (tree.done, tree.total) == (0, 3) and tree.parent[intro["id"]] == write["id"]
+        # Отметка листа поправляет прогресс родителей; отметка ветви — всё поддерево
+        manager.toggle_subtask(task, intro["id"])
+        assert tree.progress(write["id"]) == 0.5 and not write["done"]
+        manager.set_subtask_done(task, write["id"])
+        assert summary["done"] and write["done"] and (tree.done, tree.total) == (2, 3)
+        assert manager.stats()["sub_done"] == 2 and manager.stats() == manager.count_stats()
+        node = manager.add_subtask(task, "проверить", parent_id=summary["id"], save=False)
+        assert not summary["done"] and not write["done"] and tree.total == 3 and tree.done == 1
+        manager.remove_subtask(task, node["id"], save=False)  # снова лист с последней отметкой
+        assert "subtasks" not in summary and (tree.done, tree.total) == (1, 3)
+        manager.set_subtask_done(task, summary["id"], save=False)
+        manager.save()
+        # Отметка подзадачи дописывается в журнал, а файл задач не перезаписывается
+        with open("test_subtasks.txt", "r", encoding="utf-8") as f:
+            before = f.read()
+        manager.toggle_subtask(task, collect["id"])
+        with open("test_subtasks.txt", "r", encoding="utf-8") as f:
+            assert f.read() == before
+        with open(journal_path("test_subtasks.txt"), "r", encoding="utf-8") as f:
+            assert f.read() == f"{task['id']}|{collect['id']}|1\n"
+        # Другой процесс видит отметку при загрузке и при синхронизации
+        other = TaskManager(filename="test_subtasks.txt")
+        assert other.find_task("Отчёт")["subtasks"][0]["done"]
+        manager.set_subtask_done(task, write["id"], False)
+        added, updated, removed = other.sync_from_disk()
+        assert not added and not removed and [t["text"] for t in updated] == ["Отчёт"]
+        assert not other.find_task("Отчёт")["subtasks"][1]["done"] and other.stats()["sub_done"] == 1
+        # Полная запись переносит отметки в файл и очищает журнал
+        other.save()
+        assert not os.path.exists(journal_path("test_subtasks.txt"))
+        assert TaskManager(filename="test_subtasks.txt").stats()["sub_done"] == 1
+        # Id с '|' не попадает в журнал как есть: узел получает новый id, и отметка не теряется
+        piped = other.create_task("Трубы", subtasks=[{"text": "шаг", "id": "a|b"}])
+        node_id = other.subtask_tree(piped).roots[0]["id"]
+        assert "|" not in node_id
+        other.toggle_subtask(piped, node_id)
+        assert TaskManager(filename="test_subtasks.txt").find_task("Трубы")["subtasks"][0]["done"]
+        for bad in ("a|b", "a\nb"):
+            try:
+                other.add_subtask(piped, bad, save=False)
+                assert False, "подзадача с разделителем должна отклоняться"
+            except ValueError:
+                pass
+    finally:
+        remove_files("test_subtasks.txt")
+
+
+def test_dependency_graph_incremental_queries():
+    from datetime import date, timedelta
+    from task_deps import DependencyGraph
+    manager = TaskManager(filename="test_deps.txt")
+    manager.tasks = []
+    try:
+        today = date.today()
+        design = manager.create_task("Дизайн", deadline=(today + timedelta(days=2)).isoformat(), save=False)
+        backend = manager.create_task("Бэкенд", save=False)
+        frontend = manager.create_task("Фронтенд", save=False)
+        release = manager.create_task("Релиз", deadline=(today + timedelta(days=10)).isoformat(), save=False)
+        manager.create_task("Отдельная", save=False)
+        manager.add_dependency(backend, design, save=False)
+        manager.add_dependency(frontend, design, save=False)
+        manager.add_dependency(release, backend, save=False)
+        manager.add_dependency(release, frontend, save=False)
+        try:
+            manager.add_dependency(design, release, save=False)
+            assert False, "цикл должен отклоняться"
+        except ValueError as e:
+            assert "цикл" in str(e)
+        assert "blocked_by" not in design
+        assert manager.blocked_count() == 3
+        assert sorted(t["text"] for t in manager.ready_tasks()) == ["Дизайн", "Отдельная"]
+        assert [t["text"] for t in manager.critical_path()][::2] == ["Дизайн", "Релиз"]
+        assert [t["text"] for t in manager.schedule()][:1] == ["Дизайн"]
+        # Отметка выполнения меняет только счётчики прямых зависимых
+        assert sorted(t["text"] for t in manager.set_done(design, save=False)) == ["Бэкенд", "Фронтенд"]
+        assert manager.blocked_count() == 1 and manager.blockers(release) != []
+        manager.bulk_update(ids=[backend["id"], frontend["id"]], done=True, save=False)
+        assert manager.blocked_count() == 0 and manager.is_blocked(release) is False
+        manager.set_done(frontend, False, save=False)
+        assert [t["text"] for t in manager.blockers(release)] == ["Фронтенд"]
+        graph = manager._dep_index()
+        fresh = DependencyGraph(manager.tasks)
+        assert (graph.blocked, graph.open_blockers) == (fresh.blocked, fresh.open_blockers)
+        # Зависимости сохраняются десятым полем и переживают перезагрузку и снимок
+        manager.save()
+        for snapshot in (False, True):
+            if snapshot:
+                assert manager.write_snapshot()
+            loaded = TaskManager(filename="test_deps.txt")
+            assert loaded.find_task("Релиз")["blocked_by"] == release["blocked_by"]
+            assert [t["text"] for t in loaded.blockers(loaded.find_task("Релиз"))] == ["Фронтенд"]
+        manager.remove_dependency(release, frontend, save=False)
+        assert manager.blocked_count() == 0
+    finally:
+        remove_files("test_deps.txt")
+
+
+def test_ics_feed_state_survives_restart():
+    from task_dates import parse_date
+    from task_ics import IcsFeed
+    tasks = [
+        {"done": False, "category": "Работа", "text": "Отчёт", "priority": "средний", "deadline": "2025-04-09",
+         "tags": [], "repeat": "", "subtasks": [], "id": "a1"},
+        {"done": False, "category": "Дом", "text": "Звонок", "priority": "средний", "deadline": "2025-04-10",
+         "tags": [], "repeat": "", "subtasks": [], "id": "b2"},
+    ]
+    try:
+        feed = IcsFeed(parse_date, state_path="test_feed.ics.state.json")
+        feed.refresh(tasks, 1)
+        body, etag = feed.render()
+        # После перезапуска те же задачи дают те же байты и тот же ETag
+        restarted = IcsFeed(parse_date, state_path="test_feed.ics.state.json")
+        restarted.refresh(tasks, 1)
+        assert restarted.render() == (body, etag)
+        assert restarted.last_modified <= feed.last_modified
+        tasks[0]["text"] = "Отчёт за квартал"
+        restarted = IcsFeed(parse_date, state_path="test_feed.ics.state.json")
+        restarted.refresh(tasks, 2)
+        changed, changed_etag = restarted.render()
+        assert changed_etag != etag and "SEQUENCE:1" in changed and changed.count("SEQUENCE:0") == 1
+        assert restarted.render(category="Дом")[1] != changed_etag
+    finally:
+        remove_files("test_feed.ics")
+
+
+def test_cli_rejects_separators_in_fields():
+    import io
+    from task_cli import run
+    args = ["--file", "test_cli.txt", "--archive", "test_cli_archive.txt", "--no-color"]
+    try:
+        assert run(args + ["add", "Первая"], out=io.StringIO(), err=io.StringIO()) == 0
+        for command in (["edit", "Первая", "--text", "A|B"], ["add", "Вторая", "--category", "X|Y"],
+                        ["add", "Вторая", "--tags", "a|b"], ["edit", "Первая", "--category", "X\nY"]):
+            out, err = io.StringIO(), io.StringIO()
+            assert run(args + command, out=out, err=err) == 1
+            assert "'|' или перевод строки" in err.getvalue() and "ошибок: 1" in out.getvalue()
+        manager = TaskManager(filename="test_cli.txt")
+        assert [(t["text"], t["category"], t["tags"]) for t in manager.tasks] == [("Первая", "Без категории", [])]
+        try:
+            manager.bulk_update({}, category="a|b", save=False)
+            assert False, "bulk_update должен отклонять '|'"
+        except ValueError:
+            pass
+    finally:
+        remove_files("test_cli.txt")
+
+
 if __name__ == "__main__":
     test_add_task()
     test_save_tasks()
+    test_tasks_loaded_on_demand()
+    test_batch_operations_single_save()
+    test_streaming_import_dedup()
+    test_streaming_export_filters_and_gzip()
+    test_incremental_ics_export()
+    test_date_parser_formats()
+    test_materialized_order_updates_incrementally()
+    test_metrics_record_operations()
+    test_paging_and_top_k()
+    test_buffered_rendering_color_detection()
+    test_bulk_update_by_query_and_ids()
+    test_recurring_task_advances_in_place()
+    test_concurrent_saves_merge_instead_of_clobbering()
+    test_sync_from_disk_applies_only_delta()
+    test_binary_snapshot_roundtrip_and_staleness()
+    test_archive_reader_index_and_search()
+    test_parallel_load_matches_serial()
+    test_parallel_filter_and_stats_match_serial()
+    test_stats_counters_follow_every_change()
+    test_completion_history_rollups()
+    test_notification_scheduler_heap()
+    test_nested_subtasks_progress_and_journal()
+    test_dependency_graph_incremental_queries()
+    test_ics_feed_state_survives_restart()
+    test_cli_rejects_separators_in_fields()
     print("Тесты пройдены!")
\ No newline at end of file
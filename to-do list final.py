@@ -3,6 +3,9 @@ import json
 import logging
 from datetime import datetime, timedelta
 from configparser import ConfigParser
+from task_lock import FileLock, file_version, read_generation, write_atomic, merge_tasks
+from task_manager import legacy_task_id, new_task_id
+from task_subtasks import SubtaskTree, read_journal, journal_path
 try:
     from colorama import init, Fore, Style
     init()
@@ -35,13 +38,47 @@ class TaskManager:
     """Класс для управления задачами с поддержкой категорий, приоритетов, дедлайнов, тегов, подзадач и повторений."""
     
     def __init__(self):
-        self.tasks = self.load_tasks(FILENAME)
+        self.lock = FileLock(FILENAME)
+        self.reload()
         self.categories = set(task["category"] for task in self.tasks if task["category"])
         self.show_notifications()
 
+    def reload(self):
+        """Загружает задачи и запоминает версию файла и строки на момент загрузки."""
+        self.version, self.generation = file_version(FILENAME), read_generation(FILENAME)
+        self.tasks = self.load_tasks(FILENAME)
+        self.synced = {self.task_id(task): self.format_task(task) for task in self.tasks}
+
+    @staticmethod
+    def task_id(task):
+        """Постоянный id задачи — первое из полей новых версий (как в task_manager.py)."""
+        return task["extra"][0]
+
+    def _ensure_ids(self, tasks):
+        """Выдаёт новый id задачам без него (добавленные, повторения, импортированные)."""
+        seen = set()
+        for task in tasks:
+            extra = task.get("extra")
+            if not isinstance(extra, list):
+                extra = task["extra"] = []
+            if not extra or not extra[0] or extra[0] in seen:
+                extra[:1] = [new_task_id()]
+            seen.add(extra[0])
+
+    def file_changed(self):
+        return file_version(FILENAME) != self.version or read_generation(FILENAME) != self.generation
+
+    def refresh(self):
+        """Перечитывает файл, если его изменил другой процесс (проверка — только stat)."""
+        if self.file_changed():
+            with self.lock:
+                self.reload()
+            self.categories = set(task["category"] for task in self.tasks if task["category"])
+
     def load_tasks(self, filename):
         """Загружает задачи из текстового файла."""
         tasks = []
+        legacy_ids = set()
         if os.path.exists(filename):
             with open(filename, "r", encoding="utf-8") as f:
                 for line in f:
@@ -54,6 +91,10 @@ class TaskManager:
                         tags = parts[5].split(",") if len(parts) > 5 and parts[5] else []
                         repeat = parts[6] if len(parts) > 6 else ""
                         subtasks = json.loads(parts[7]) if len(parts) > 7 and parts[7] else []
+                        extra = parts[8:]  # поля новых версий (id и т.д.) сохраняем как есть
+                        if not extra or not extra[0]:
+                            # Тот же id по содержимому строки, что выдаёт task_manager.py
+                            extra[:1] = [legacy_task_id(line, legacy_ids)]
                         tasks.append({
                             "done": status == "1",
                             "category": category,
@@ -62,20 +103,59 @@ class TaskManager:
                             "deadline": deadline,
                             "tags": tags,
                             "repeat": repeat,
-                            "subtasks": subtasks
+                            "subtasks": subtasks,
+                            "extra": extra
                         })
                     except Exception as e:
                         logging.error(f"Ошибка загрузки строки: {line.strip()}, {str(e)}")
+        if filename == FILENAME:
+            self.apply_journal(tasks)
         return tasks
 
+    def apply_journal(self, tasks):
+        """Накладывает отметки подзадач, которые task_manager.py дописывает в журнал вместо файла."""
+        entries, _, _ = read_journal(FILENAME)
+        by_id = {self.task_id(task): task for task in tasks}
+        trees = {}
+        for task_id, node_id, done in entries:
+            task = by_id.get(task_id)
+            if task is None:
+                continue
+            try:
+                tree = trees.get(task_id)
+                if tree is None:
+                    tree = trees[task_id] = SubtaskTree({"id": task_id, "subtasks": task["subtasks"]})
+                if tree.node(node_id) is not None:
+                    tree.set_done(node_id, done)
+            except (KeyError, TypeError, AttributeError) as e:
+                logging.error(f"Ошибка применения журнала подзадач: {task['text']}, {str(e)}")
+
+    def format_task(self, task):
+        status = "1" if task["done"] else "0"
+        tags = ",".join(task["tags"])
+        subtasks = json.dumps(task["subtasks"], ensure_ascii=False)
+        extra = "".join("|" + field for field in task.get("extra", []))
+        return f"{status}|{task['category']}|{task['text']}|{task['priority']}|{task['deadline']}|{tags}|{task['repeat']}|{subtasks}{extra}\n"
+
     def save_tasks(self, filename, tasks):
-        """Сохраняет задачи в текстовый файл."""
-        with open(filename, "w", encoding="utf-8") as f:
-            for task in tasks:
-                status = "1" if task["done"] else "0"
-                tags = ",".join(task["tags"])
-                subtasks = json.dumps(task["subtasks"], ensure_ascii=False)
-                f.write(f"{status}|{task['category']}|{task['text']}|{task['priority']}|{task['deadline']}|{tags}|{task['repeat']}|{subtasks}\n")
+        """Сохраняет задачи в текстовый файл под блокировкой, не затирая чужие изменения."""
+        self._ensure_ids(tasks)
+        with FileLock(filename) if filename != FILENAME else self.lock as lock:
+            if filename == FILENAME and self.file_changed():
+                # Файл изменил другой процесс: накладываем свои изменения на его версию (по id,
+                # как task_manager.py: у повторений тот же текст, что и у выполненной задачи)
+                lines = {self.task_id(task): self.format_task(task) for task in tasks}
+                changed = {task_id for task_id, line in lines.items() if self.synced.get(task_id) != line}
+                removed = set(self.synced) - set(lines)
+                tasks[:] = merge_tasks(self.load_tasks(FILENAME), tasks, changed, removed, key=self.task_id)
+            write_atomic(filename, [self.format_task(task) for task in tasks])
+            if filename == FILENAME and os.path.exists(journal_path(FILENAME)):
+                # Отметки из журнала уже в записанном файле: иначе они легли бы поверх наших правок
+                os.remove(journal_path(FILENAME))
+            generation = lock.bump_generation()
+            if filename == FILENAME:
+                self.version, self.generation = file_version(FILENAME), generation
+                self.synced = {self.task_id(task): self.format_task(task) for task in tasks}
 
     def is_overdue(self, deadline):
         """Проверяет, просрочена ли задача."""
@@ -392,9 +472,11 @@ class TaskManager:
         if not done_tasks:
             print("Нет выполненных задач.")
             return
-        archive_tasks = self.load_tasks(ARCHIVE_FILENAME)
-        archive_tasks.extend(done_tasks)
-        self.save_tasks(ARCHIVE_FILENAME, archive_tasks)
+        self._ensure_ids(done_tasks)
+        # Архив только дописывается, как и в task_manager.py (его индекс смещений остаётся верным)
+        with FileLock(ARCHIVE_FILENAME):
+            with open(ARCHIVE_FILENAME, "a", encoding="utf-8") as f:
+                f.writelines(self.format_task(task) for task in done_tasks)
         self.tasks[:] = [task for task in self.tasks if not task["done"]]
         self.save_tasks(FILENAME, self.tasks)
         print(f"Архивировано и удалено задач: {len(done_tasks)}")
@@ -517,6 +599,7 @@ def main():
         print("20. Выйти")
         
         choice = input("Твой выбор (1-20): ").strip()
+        manager.refresh()
         
         if choice == "1":
             manager.show_tasks()